@@ -0,0 +1,126 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Benchmarks N sequential `utils.syscall("gcloud ...")` calls with and without a warm gcloud worker
+(`utils.enable_gcloud_worker`). Uses a fake Cloud SDK whose CLI takes `--startup` seconds to load (the real SDK
+typically needs 0.5-1.5s), so no cloud account or SDK installation is needed.
+
+Usage:
+    python benchmarks/bench_gcloud_worker.py [-n 20] [--startup 0.8]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import tensorforce_client.utils as util  # noqa: E402
+
+
+FAKE_GCLOUD_MAIN = '''
+# Fake `googlecloudsdk.gcloud_main`: loading the CLI takes $FAKE_GCLOUD_STARTUP seconds.
+import json, os, sys, time
+
+time.sleep(float(os.environ.get("FAKE_GCLOUD_STARTUP", "0.8")))
+
+
+class CLI(object):
+    def Execute(self, args):
+        if args and args[0] == "fail":
+            sys.stderr.write("ERROR: (gcloud) failing as requested\\n")
+            sys.exit(2)
+        sys.stdout.write(json.dumps({"args": args, "account": "bench@example.com"}) + "\\n")
+
+
+def CreateCLI(surfaces):
+    return CLI()
+
+
+def main():
+    CreateCLI([]).Execute(sys.argv[1:])
+'''
+
+FAKE_GCLOUD = '''#!{python}
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from googlecloudsdk import gcloud_main
+gcloud_main.main()
+'''
+
+
+def create_fake_sdk(sdk_root):
+    os.makedirs(os.path.join(sdk_root, "lib", "googlecloudsdk"))
+    os.makedirs(os.path.join(sdk_root, "bin"))
+    open(os.path.join(sdk_root, "lib", "googlecloudsdk", "__init__.py"), "w").close()
+    with open(os.path.join(sdk_root, "lib", "googlecloudsdk", "gcloud_main.py"), "w") as f:
+        f.write(FAKE_GCLOUD_MAIN)
+    gcloud = os.path.join(sdk_root, "bin", "gcloud")
+    with open(gcloud, "w") as f:
+        f.write(FAKE_GCLOUD.format(python=sys.executable))
+    os.chmod(gcloud, os.stat(gcloud).st_mode | stat.S_IEXEC)
+
+
+def run_calls(num):
+    outputs = []
+    start = time.time()
+    for i in range(num):
+        outputs.append(util.syscall("gcloud config list --format json --index {}".format(i), return_outputs="as_str"))
+    return time.time() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-calls", type=int, default=20, help="The number of sequential gcloud calls.")
+    parser.add_argument("--startup", type=float, default=0.8, help="The (fake) SDK's start-up time in sec.")
+    args = parser.parse_args()
+
+    sdk_root = tempfile.mkdtemp()
+    try:
+        create_fake_sdk(sdk_root)
+        os.environ["PATH"] = os.path.join(sdk_root, "bin") + os.pathsep + os.environ["PATH"]
+        os.environ["FAKE_GCLOUD_STARTUP"] = str(args.startup)
+
+        plain_time, plain_outputs = run_calls(args.num_calls)
+        pool = util.enable_gcloud_worker(1, sdk_root=sdk_root, python=sys.executable)
+        worker_time, worker_outputs = run_calls(args.num_calls)
+        assert not pool.disabled, "gcloud worker could not be started"
+        assert plain_outputs == worker_outputs, "Outputs differ:\n{}\n{}".format(plain_outputs[0], worker_outputs[0])
+        # errors (exit codes and stderr) must come through as well
+        result = util.syscall("gcloud fail", return_outputs="as_result")
+        assert result.returncode == 2 and "failing as requested" in result.output, result.output
+        pool.close()
+
+        print("{} sequential gcloud calls (start-up time {:.2f}s):".format(args.num_calls, args.startup))
+        print("{: >20s}{: >12s}{: >16s}".format("", "Total (s)", "Per call (ms)"))
+        print("{: >20s}{: >12.2f}{: >16.1f}".format("subprocess", plain_time, plain_time / args.num_calls * 1000))
+        print("{: >20s}{: >12.2f}{: >16.1f}".format("gcloud worker", worker_time,
+                                                    worker_time / args.num_calls * 1000))
+        print("Speedup: {:.1f}x".format(plain_time / worker_time))
+    finally:
+        shutil.rmtree(sdk_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
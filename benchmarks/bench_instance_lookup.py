@@ -0,0 +1,170 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Benchmarks `utils.get_compute_instance_specs` (server-side filtered, streamed) against the former implementation
+(full json list of all instances in the project, filtered locally) for different numbers of compute instances
+in the project. Uses a fake `gcloud` executable, so no cloud account is needed.
+
+Usage:
+    python benchmarks/bench_instance_lookup.py [-n 10 100 1000 5000] [-r 3]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import json
+import os
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import tensorforce_client.utils as util  # noqa: E402
+
+
+FAKE_GCLOUD = '''#!{python}
+# Fake `gcloud compute instances list`: emits $FAKE_GCLOUD_NUM_INSTANCES instances, 3 of which belong to
+# the cluster $FAKE_GCLOUD_CLUSTER.
+import json, os, re, sys
+
+num = int(os.environ["FAKE_GCLOUD_NUM_INSTANCES"])
+cluster = os.environ["FAKE_GCLOUD_CLUSTER"]
+project = "https://www.googleapis.com/compute/v1/projects/some-project"
+
+def instance(i):
+    owner = cluster if i < 3 else "other-team-cluster-{{}}".format(i % 50)
+    name = "gke-{{}}-default-pool-1a2b3c4d-{{:04d}}".format(owner[:20], i)
+    return {{
+        "name": name, "id": str(1000000 + i), "status": "RUNNING", "kind": "compute#instance",
+        "zone": project + "/zones/europe-west1-d",
+        "machineType": project + "/zones/europe-west1-d/machineTypes/n1-standard-1",
+        "labels": {{"goog-gke-node": "", "goog-k8s-cluster-name": owner}},
+        "networkInterfaces": [{{
+            "network": project + "/global/networks/default", "networkIP": "10.132.0.{{}}".format(i % 250),
+            "accessConfigs": [{{"kind": "compute#accessConfig", "name": "external-nat",
+                                "natIP": "35.0.{{}}.{{}}".format(i // 250 % 250, i % 250),
+                                "type": "ONE_TO_ONE_NAT"}}]
+        }}],
+        "disks": [{{"boot": True, "deviceName": "persistent-disk-0", "diskSizeGb": "100",
+                    "licenses": [project + "/global/licenses/cos"] * 3,
+                    "source": project + "/zones/europe-west1-d/disks/" + name}}],
+        "metadata": {{"items": [{{"key": "cluster-name", "value": owner}},
+                                {{"key": "kube-env", "value": "X" * 2000}}]}},
+        "serviceAccounts": [{{"email": "default", "scopes": ["https://www.googleapis.com/auth/compute"] * 5}}],
+        "tags": {{"items": ["gke-" + owner + "-node"]}},
+    }}
+
+args = " ".join(sys.argv[1:])
+if "--format json" in args:
+    json.dump([instance(i) for i in range(num)], sys.stdout, indent=2)
+else:
+    # server-side filter -> only emit our cluster's instances
+    for i in range(num):
+        inst = instance(i)
+        if inst["labels"]["goog-k8s-cluster-name"] != cluster:
+            continue
+        net = inst["networkInterfaces"][0]
+        print("\\t".join([inst["name"], "europe-west1-d", "n1-standard-1", net["networkIP"],
+                         net["accessConfigs"][0]["natIP"], inst["status"], cluster]))
+'''
+
+
+def legacy_get_compute_instance_specs(cluster):
+    """
+    The former implementation: loads all instances of the project and filters them locally by name.
+    """
+    nodes = {}
+    primary_name = None
+    out = util.syscall("gcloud compute instances list --format json", return_outputs="as_str")
+    json_out = json.loads(out)
+    for c in json_out:
+        name = c.get("name")
+        if not re.search(r'-{}-'.format(cluster[:20]), name):
+            continue
+        network = c.get("networkInterfaces")[0]
+        nodes[name] = {
+            "name": name,
+            "name_hyphenated": name,
+            "zone": re.sub(r'^.+/', "", c.get("zone")),
+            "machine_type": re.sub(r'^.+/', "", c.get("machineType")),
+            "internal-ip": network.get("networkIP"),
+            "external-ip": network.get("accessConfigs")[0].get("natIP"),
+            "status": c.get("status"),
+        }
+        if not primary_name:
+            primary_name = c.get("name")
+    return None if len(nodes) == 0 else nodes, primary_name
+
+
+def measure(func, cluster, repeats):
+    times = []
+    peak = 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.time()
+        nodes, _ = func(cluster)
+        times.append(time.time() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert nodes and len(nodes) == 3, "Expected 3 nodes, got {}".format(nodes)
+    return min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-instances", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="The numbers of instances in the (fake) project to benchmark with.")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="Repetitions per measurement (best is taken).")
+    args = parser.parse_args()
+
+    cluster = "benchmark-cluster"
+    fake_dir = tempfile.mkdtemp()
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        gcloud = os.path.join(fake_dir, "gcloud")
+        with open(gcloud, "w") as f:
+            f.write(FAKE_GCLOUD.format(python=sys.executable))
+        os.chmod(gcloud, os.stat(gcloud).st_mode | stat.S_IEXEC)
+        os.environ["PATH"] = fake_dir + os.pathsep + os.environ["PATH"]
+        os.environ["FAKE_GCLOUD_CLUSTER"] = cluster
+        # no project dir and no cached values (every lookup goes to the fake gcloud)
+        os.chdir(work_dir)
+        util.inventory_cache.ttls["instances"] = -1
+
+        print("{: >10s}{: >14s}{: >14s}{: >16s}{: >16s}".
+              format("Instances", "Legacy (ms)", "New (ms)", "Legacy mem (kB)", "New mem (kB)"))
+        for num in args.num_instances:
+            os.environ["FAKE_GCLOUD_NUM_INSTANCES"] = str(num)
+            legacy_time, legacy_mem = measure(legacy_get_compute_instance_specs, cluster, args.repeats)
+            new_time, new_mem = measure(util.get_compute_instance_specs, cluster, args.repeats)
+            print("{: >10d}{: >14.1f}{: >14.1f}{: >16.1f}{: >16.1f}".
+                  format(num, legacy_time * 1000, new_time * 1000, legacy_mem / 1024, new_mem / 1024))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(fake_dir, ignore_errors=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Benchmarks tfcli's end-to-end orchestration (number and wall time of external commands) offline by replaying
+cassettes (`tfcli --record/--replay`).
+
+Without arguments, sets up a temporary project, records `experiment start` (on a new 3-node cluster) and
+`experiment stop` against fake `gcloud`/`kubectl`/`ssh` executables and then replays both with a fixed latency
+per executable (default: 1.5s per gcloud, 0.5s per kubectl and 0.1s per other (ssh/scp) call, roughly what
+they take for real).
+With `--cassette`, replays a cassette recorded against a real cloud project instead (run this from within the
+project dir the cassette was recorded in).
+
+Usage:
+    python benchmarks/bench_orchestration.py [--latency gcloud=1.5,kubectl=0.5,*=0.1]
+    python benchmarks/bench_orchestration.py --cassette [file] [--latency recorded] -- experiment start -e [name]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import argparse
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+import tensorforce_client  # noqa: E402
+import tensorforce_client.utils as util  # noqa: E402
+
+
+FAKE_HEADER = r'''#!{python}
+import base64, json, os, re, sys
+
+
+def fake_remote_script(cmd):
+    # a batched remote script: report success for all of its steps (w/o running anything)
+    encoded = re.search(r"echo (\S+) \| base64 -d", cmd)
+    if encoded:
+        for step in re.findall(r"__TFCLI_STEP__ (\d+) start", base64.b64decode(encoded.group(1)).decode("utf-8")):
+            print("__TFCLI_STEP__ {{0}} start 0\n__TFCLI_STEP__ {{0}} exit 0 0".format(step))
+
+
+'''
+
+FAKE_GCLOUD = FAKE_HEADER + '''
+# Fake `gcloud`: knows just enough to create, list and delete a single cluster (state in $FAKE_CLOUD_STATE).
+state_file = os.environ["FAKE_CLOUD_STATE"]
+state = json.load(open(state_file)) if os.path.isfile(state_file) else {{}}
+args = [a for a in sys.argv[1:]]
+cmd = " ".join(args)
+cluster = state.get("cluster")
+
+if cmd.startswith("container clusters create"):
+    state["cluster"] = args[3]
+    json.dump(state, open(state_file, "w"))
+elif cmd.startswith("container clusters delete"):
+    state.pop("cluster", None)
+    json.dump(state, open(state_file, "w"))
+elif cmd.startswith("container clusters list"):
+    json.dump([{{"name": cluster, "zone": "europe-west1-d", "currentMasterVersion": "1.9.7-gke.1",
+                "endpoint": "35.1.2.3", "currentNodeCount": 3, "status": "RUNNING",
+                "nodeConfig": {{"machineType": "n1-standard-1"}}}}] if cluster else [], sys.stdout)
+elif cmd.startswith("compute ssh"):
+    # leave a (fake) ssh master connection behind
+    control_path = re.search(r"ControlPath=(\\S+)", cmd)
+    if control_path:
+        open(control_path.group(1), "w").close()
+    fake_remote_script(cmd)
+elif cmd.startswith("compute instances list"):
+    for i in range(3 if cluster else 0):
+        print("\\t".join(["gke-{{}}-default-pool-1a2b-{{}}".format(cluster[:20], i), "europe-west1-d",
+                         "n1-standard-1", "10.132.0.{{}}".format(i), "35.0.0.{{}}".format(i), "RUNNING", cluster]))
+'''
+
+FAKE_SSH = FAKE_HEADER + '''
+# Fake `ssh`/`scp` through a master connection.
+cmd = " ".join(sys.argv[1:])
+if "-O exit" in cmd:
+    os.remove(re.search(r"ControlPath=(\\S+)", cmd).group(1))
+fake_remote_script(cmd)
+'''
+
+FAKE_KUBECTL = '''#!{python}
+import json, sys
+cmd = " ".join(sys.argv[1:])
+if "get nodes -o json" in cmd:
+    # 3 Ready nodes
+    json.dump({{"items": [{{"metadata": {{"name": "node-{{}}".format(i)}},
+                           "status": {{"conditions": [{{"type": "Ready", "status": "True"}}]}}}} for i in range(3)]}},
+              sys.stdout)
+else:
+    print("fake kubectl: " + cmd)
+'''
+
+
+def tfcli(args, cwd, env=None):
+    subprocess.check_call([sys.executable, "-m", "tensorforce_client.tfcli"] + args, cwd=cwd, env=env,
+                          stdout=subprocess.DEVNULL)
+
+
+def summarize(profile_file):
+    with open(profile_file) as f:
+        profile = json.load(f)
+    commands = profile["commands"]
+    groups = {}
+    for c in commands:
+        calls, total = groups.get(c["group"], (0, 0.0))
+        groups[c["group"]] = (calls + 1, total + c["duration"])
+    return profile["total_duration"], len(commands), sum(c["duration"] for c in commands), groups
+
+
+def print_summary(title, profile_file):
+    total, num, command_time, groups = summarize(profile_file)
+    print("{}: {} commands, {:.2f}s wall time, {:.2f}s summed command time".format(title, num, total, command_time))
+    for name, (calls, group_total) in sorted(groups.items(), key=lambda i: -i[1][1]):
+        print("    {: <40s}{: >6d}{: >10.2f}s".format(name, calls, group_total))
+
+
+def create_fake_project(project_dir, bin_dir):
+    for name, script in [("gcloud", FAKE_GCLOUD), ("ssh", FAKE_SSH), ("scp", FAKE_SSH), ("kubectl", FAKE_KUBECTL)]:
+        executable = os.path.join(bin_dir, name)
+        with open(executable, "w") as f:
+            f.write(script.format(python=sys.executable))
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    shutil.copytree(os.path.join(tensorforce_client.__path__[0], "configs"), os.path.join(project_dir, "configs"))
+    os.makedirs(os.path.join(project_dir, "experiments"))
+    os.makedirs(os.path.join(project_dir, "clusters"))
+    cwd = os.getcwd()
+    os.chdir(project_dir)
+    try:
+        util.write_project_file("bench", "bench", "bench-project")
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", default="gcloud=1.5,kubectl=0.5,*=0.1",
+                        help="The time (in sec) each replayed command takes, 'recorded' or per executable "
+                             "(default: gcloud=1.5,kubectl=0.5,*=0.1).")
+    parser.add_argument("--cassette", default=None, help="A cassette (recorded against a real project) to replay.")
+    parser.add_argument("tfcli_args", nargs="*", help="With --cassette: The tfcli command line to replay.")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        if args.cassette:
+            profile = os.path.join(work_dir, "profile.json")
+            tfcli(["--replay", args.cassette, "--replay-latency", args.latency, "--profile-json", profile] +
+                  args.tfcli_args, os.getcwd(), env)
+            print_summary("Replay of {}".format(" ".join(args.tfcli_args)), profile)
+            return
+
+        project_dir = os.path.join(work_dir, "project")
+        bin_dir = os.path.join(work_dir, "bin")
+        os.makedirs(project_dir)
+        os.makedirs(bin_dir)
+        create_fake_project(project_dir, bin_dir)
+        env["PATH"] = bin_dir + os.pathsep + env["PATH"]
+        env["FAKE_CLOUD_STATE"] = os.path.join(work_dir, "cloud.json")
+
+        tfcli(["experiment", "new", "-f", "simple_a3c.json"], project_dir, env)
+        for sub_command in ["start", "stop"]:
+            cassette = os.path.join(work_dir, "{}.cassette.json".format(sub_command))
+            profile = os.path.join(work_dir, "{}.profile.json".format(sub_command))
+            extra_args = ["--no-download"] if sub_command == "stop" else []
+            # record against the fake cloud, then replay the cassette with the given latency (from the same
+            # local experiment state)
+            experiments_dir = os.path.join(project_dir, "experiments")
+            shutil.copytree(experiments_dir, experiments_dir + ".bak")
+            tfcli(["--record", cassette, "experiment", sub_command, "-e", "simple_a3c"] + extra_args, project_dir, env)
+            shutil.rmtree(experiments_dir)
+            shutil.move(experiments_dir + ".bak", experiments_dir)
+            tfcli(["--replay", cassette, "--replay-latency", args.latency, "--profile-json", profile,
+                   "experiment", sub_command, "-e", "simple_a3c"] + extra_args, project_dir, env)
+            print_summary("experiment {} (latency: {})".format(sub_command, args.latency), profile)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,9 @@ def main():
     parser.add_argument('--summary-dir', help="The root dir where all tensorboard summary data should go.")
     parser.add_argument('-L', '--load', action="store_true", help="Load model from a previous or paused "
                                                                   "run of this experiment.")
+    parser.add_argument('--gpu-memory-fraction', type=float, default=None,
+                        help="The share of the GPU's memory this task may use (when sharing a GPU with other "
+                             "workers).")
     # helpers for debugging
     parser.add_argument('--remote-env-host', default="localhost",
                         help="The host IP for a possible remote-env connection (instead of localhost).")
@@ -165,6 +168,10 @@ def main():
                 task_index=args.task_index,
                 parameter_server=(args.job == "ps"),
                 device=('/job:{}/task:{}'.format(args.job, args.task_index)),  # '/cpu:0'
+                # (the server owns the GPU, so this is where its memory share is set)
+                session_config=tf.ConfigProto(
+                    gpu_options=tf.GPUOptions(per_process_gpu_memory_fraction=args.gpu_memory_fraction)
+                ) if args.gpu_memory_fraction else None
             ) if run_mode == "distributed" else None,
             # Model saver spec (only 1st worker will ever save).
             # - don't save for multi-threaded (ThreadedRunner will take care of this)
@@ -186,8 +193,11 @@ def main():
         )
     )
     # TODO: test for run-type=distributed
-    if args.load:
+    # (in distributed mode only the chief worker's saver dir holds checkpoints, see tfcli's recovery of lost tasks)
+    if args.load and tf.train.latest_checkpoint(args.saver_dir):
         agent.restore_model(args.saver_dir)
+    elif args.load:
+        logger.warning("No checkpoint found in {}. Starting from scratch.".format(args.saver_dir))
 
     agents = [agent]
 
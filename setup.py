@@ -20,7 +20,7 @@ from tensorforce_client import __version__ as version
 setup(
     name='tensorforce-client',
     version=version,
-    packages=find_packages(exclude=['docs', 'examples', 'docker']),
+    packages=find_packages(exclude=['docs', 'examples', 'docker', 'tests']),
     #package_dir={'tensorforce_client': 'tensorforce_client'},
     package_data={'tensorforce_client': ['configs/*']},
     url='https://github.com/reinforceio/tensorforce-client',
@@ -39,7 +39,8 @@ setup(
     install_requires=["jinja2", "six"],
     #setup_requires=[],
     extras_require={
-        "tf": ["tensorflow>=1.4.0"]  # if tensorboard needed to look at summaries locally
+        "tf": ["tensorflow>=1.4.0"],  # if tensorboard needed to look at summaries locally
+        "test": ["pytest"]  # to run the tests (`python -m pytest tests`)
     }
 )
 
@@ -0,0 +1,132 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import os
+import threading
+import time
+
+
+class InventoryCache(object):
+    """
+    A project-local cache for cloud inventory lookups (clusters, compute instances, disks and projects).
+    Entries are held in memory for the lifetime of the tfcli process and - if we are inside a project
+    directory - also written next to the project's .tensorforce.json file, so that back-to-back tfcli commands
+    don't have to ask the cloud for the same information again.
+    """
+
+    # default time-to-live (in sec) per resource type
+    DEFAULT_TTLS = {
+        "clusters": 30,
+        "instances": 60,
+        "disks": 300,
+        "projects": 3600,
+        "sdk": 86400
+    }
+
+    def __init__(self, file=".tensorforce.cache.json", ttls=None):
+        """
+        Args:
+            file (str): The cache file to use (relative to the project dir).
+            ttls (dict): Time-to-live values (in sec) by resource type. Overwrites the defaults in DEFAULT_TTLS.
+        """
+        self.file = file
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        # if False, never read from or write to the cache file (only cache in memory)
+        self.persistent = True
+        # entries by resource, then by key: {"time": [time stored], "value": [the cached value]}
+        self.entries = None
+        self.lock = threading.RLock()
+
+    def get(self, resource, key=""):
+        """
+        Returns the cached value for the given resource type and key or None if there is no (or only an expired)
+        entry.
+
+        Args:
+            resource (str): The resource type (e.g. "clusters").
+            key (str): An additional key to distinguish different lookups of the same resource type.
+        """
+        with self.lock:
+            self._load()
+            entry = self.entries.get(resource, {}).get(key)
+            if entry is None or time.time() - entry["time"] > self.ttls.get(resource, 0):
+                return None
+            return entry["value"]
+
+    def set(self, resource, key, value):
+        """
+        Stores a (json serializable) value in the cache.
+
+        Args:
+            resource (str): The resource type (e.g. "clusters").
+            key (str): An additional key to distinguish different lookups of the same resource type.
+            value (any): The value to store.
+        """
+        with self.lock:
+            self._load()
+            self.entries.setdefault(resource, {})[key] = {"time": time.time(), "value": value}
+            self._save()
+
+    def invalidate(self, *resources):
+        """
+        Removes all entries of the given resource types from the cache (all types if none given).
+
+        Args:
+            resources (str): The resource types to invalidate.
+        """
+        with self.lock:
+            self._load()
+            if len(resources) == 0:
+                self.entries = {}
+            else:
+                for resource in resources:
+                    self.entries.pop(resource, None)
+            self._save()
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if self._is_persistent() and os.path.isfile(self.file):
+            try:
+                with open(self.file) as f:
+                    self.entries = json.load(f)
+            # a broken cache file is simply ignored (and overwritten with the next store)
+            except (ValueError, IOError, OSError):
+                self.entries = {}
+
+    def _save(self):
+        if not self._is_persistent():
+            return
+        tmp_file = self.file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.file)
+
+    def _is_persistent(self):
+        # only write to disk if we are in a project dir
+        return self.persistent and os.path.isfile(".tensorforce.json")
+
+
+# the cache used by all inventory lookups in utils
+inventory_cache = InventoryCache()
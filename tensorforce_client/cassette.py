@@ -0,0 +1,162 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Record/replay of external commands. In record mode (`tfcli --record [file] ...`), every command the syscall engine
+executes is stored in a cassette file together with its exit code, outputs and duration. In replay mode
+(`tfcli --replay [file] ...`), no command is executed at all; the engine answers each command from the cassette
+instead (after waiting for the recorded or a fixed latency). This allows benchmarking and regression-testing
+tfcli's orchestration logic (e.g. `experiment start`) offline.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from collections import deque
+import json
+import os
+import re
+import threading
+import time
+
+from tensorforce_client.engine import SyscallResult
+
+# the (random) control directory of multiplexed ssh connections, e.g. "/tmp/tfcli-ssh-k2x_9a0f"
+_CONTROL_DIR = re.compile(r'[^\s"\'=]*tfcli-ssh-\w+')
+
+
+class CassetteError(Exception):
+    pass
+
+
+class Cassette(object):
+    """
+    A recorded sequence of external commands and their results.
+    """
+
+    def __init__(self, file, mode="record", latency=None):
+        """
+        Args:
+            file (str): The cassette (json) file to record to or replay from.
+            mode (str): Either "record" or "replay".
+            latency (Optional[Union[float,dict]]): Replay mode only: The time (in sec) each command should take.
+                Can also be given per executable (e.g. {"gcloud": 1.0, "ssh": 0.05, "*": 0.5}, where "*" is the
+                default for all other executables). None for using each command's recorded duration.
+        """
+        if mode not in ["record", "replay"]:
+            raise ValueError("Cassette mode must be one of record|replay!")
+        self.file = file
+        self.mode = mode
+        self.latency = latency
+        # the recorded commands (in order of completion)
+        self.entries = []
+        # replay mode: the not yet replayed entries by command (each a deque in recorded order) and the last
+        # replayed entry per command (used once the command's entries are used up, e.g. for polling commands)
+        self.queues = {}
+        self.last = {}
+        self.lock = threading.Lock()
+        if self.replaying:
+            self.load()
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(command):
+        # whitespace differences don't make a different command, neither do the random ssh control directories
+        # (see `ssh.SSHConnectionManager`)
+        return _CONTROL_DIR.sub("<tfcli-ssh>", " ".join(command.split()))
+
+    def record(self, result, stdout=None):
+        """
+        Adds a finished command to the cassette.
+
+        Args:
+            result (SyscallResult): The result of the command.
+            stdout (Optional[bytes]): The command's stdout, if it's not contained in `result` (streamed commands).
+        """
+        stdout = result.stdout if stdout is None else stdout
+        with self.lock:
+            self.entries.append({
+                "command": self.key(result.command),
+                "returncode": result.returncode,
+                "stdout": None if stdout is None else stdout.decode("latin-1"),
+                "stderr": None if result.stderr is None else result.stderr.decode("latin-1"),
+                "duration": result.duration,
+                "timed_out": result.timed_out,
+                "time": time.time()
+            })
+
+    def replay(self, command):
+        """
+        Looks up the next recorded result of a command.
+        Identical commands are answered in the order in which they were recorded.
+
+        Args:
+            command (str): The command to look up.
+
+        Returns: Tuple of the recorded SyscallResult and the time (in sec) the command should take.
+
+        Raises:
+            CassetteError: If the command was never recorded.
+        """
+        key = self.key(command)
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue:
+                entry = queue.popleft()
+                self.last[key] = entry
+            elif key in self.last:
+                entry = self.last[key]
+            else:
+                raise CassetteError("Command not found in cassette {}: {}".format(self.file, key))
+        stdout = None if entry["stdout"] is None else entry["stdout"].encode("latin-1")
+        stderr = None if entry["stderr"] is None else entry["stderr"].encode("latin-1")
+        result = SyscallResult(command, entry["returncode"], stdout, stderr, duration=entry["duration"],
+                               timed_out=entry["timed_out"])
+        return result, self._latency(key, entry["duration"])
+
+    def _latency(self, command, recorded):
+        if self.latency is None:
+            return recorded
+        elif isinstance(self.latency, dict):
+            latency = self.latency.get(command.split(" ")[0], self.latency.get("*"))
+            return recorded if latency is None else latency
+        return self.latency
+
+    def unused(self):
+        """
+        Returns: List of the recorded commands (str) that have not been replayed (yet).
+        """
+        with self.lock:
+            return [e["command"] for q in self.queues.values() for e in q]
+
+    def load(self):
+        with open(self.file) as f:
+            self.entries = json.load(f)["commands"]
+        self.queues = {}
+        for entry in self.entries:
+            self.queues.setdefault(entry["command"], deque()).append(entry)
+
+    def save(self):
+        if self.replaying:
+            return
+        tmp_file = self.file + ".tmp"
+        with self.lock:
+            with open(tmp_file, "w") as f:
+                json.dump({"commands": self.entries}, f, indent=1)
+        os.replace(tmp_file, self.file)
@@ -18,9 +18,15 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import os
 import re
-import threading
+import time
 import tensorforce_client.utils as util
+from tensorforce_client.profiling import profiler
+from tensorforce_client import merge, transfer
+from tensorforce_client.remote_script import RemoteScript
 
 
 class Cluster(object):
@@ -45,11 +51,23 @@ class Cluster(object):
                 tensorforce-client will automatically create the correct machine-type.
             cpus_per_node (int): The number of vCPUs per node.
             gpus_per_node (int): The number of (physical) GPUs per node.
-            gpu_type (str): The GPU type to use. Supported are only 'nvidia-tesla-k80' and 'nvidia-tesla-p100'.
+            gpu_type (str): The GPU type to use, e.g. 'nvidia-tesla-k80' (default), 'nvidia-tesla-p100' or
+                'nvidia-tesla-v100'.
             memory_per_node (int): The memory (in Gb) per node.
             num_nodes (int): The number of nodes for the cluster.
+            min_nodes (int): The min. number of nodes the provider's autoscaler may shrink the cluster to. Setting
+                `min_nodes` and/or `max_nodes` turns on autoscaling (default: off).
+            max_nodes (int): The max. number of nodes the provider's autoscaler may grow the cluster to (default:
+                `num_nodes`).
             disk_size (int): The amount of disk space per node in Gb.
             location (str): The location of the cluster. Default us the gcloud/project set default zone.
+            preemptible (bool): Whether to use (cheaper) preemptible VMs for all nodes (default: False).
+            node_pools (List[dict]): Alternative to the single node type given by the settings above: Several named
+                node pools, each with its own `machine_type` (or `cpus_per_node` and `memory_per_node`),
+                `num_nodes`, `min_nodes`, `max_nodes`, `gpus_per_node`, `gpu_type` and `preemptible` settings.
+                A pool's `jobs` (list of 'worker' and/or 'ps') are the jobs of experiments pinned onto the pool.
+                Without `jobs` settings, workers go to the first pool with GPUs and parameter servers to the first
+                pool without.
         """
 
         self.file = kwargs.get("file")
@@ -63,22 +81,34 @@ class Cluster(object):
         if not self.name:
             raise util.TFCliError("ERROR: Cluster requires a name!")
         self.name_hyphenated = re.sub(r'_', '-', self.name)
-        self.machine_type = kwargs.get("machine_type") or from_json.get("machine_type")
-        # alternative to machine_type -> provide `cpus_per_node` and `memory_per_node`
-        if not self.machine_type:
-            cpus = kwargs.get("cpus_per_node") or from_json.get("cpus_per_node")
-            mem = kwargs.get("memory_per_node") or from_json.get("memory_per_node")
-            if not cpus or not mem:
-                raise util.TFCliError("ERROR: no vCPUs_per_node OR no memory_per_node given for cluster {}".
-                                      format(self.name))
-            self.machine_type = "custom-{}-{}".format(cpus, mem * 1024)
-        self.num_nodes = kwargs.get("num_nodes") or from_json.get("num_nodes", 3)
-        self.num_gpus = 0
-        self.gpu_type = None
-        self.gpus_per_node = kwargs.get("gpus_per_node") or from_json.get("gpus_per_node", 0)
-        if self.gpus_per_node > 0:
-            self.gpu_type = kwargs.get("gpu_type") or from_json.get("gpu_type", "nvidia-tesla-k80")
-            self.num_gpus = self.gpus_per_node * self.num_nodes
+
+        def setting(key, default=None):
+            return kwargs.get(key) or from_json.get(key, default)
+
+        def bound(key):
+            # node bounds may be 0
+            return kwargs.get(key) if kwargs.get(key) is not None else from_json.get(key)
+
+        node_pools = setting("node_pools")
+        # a homogeneous cluster: one node pool made of the cluster-wide settings
+        if not node_pools:
+            node_pools = [{"name": "default-pool", "machine_type": setting("machine_type"),
+                           "cpus_per_node": setting("cpus_per_node"), "memory_per_node": setting("memory_per_node"),
+                           "num_nodes": setting("num_nodes", 3),
+                           "min_nodes": bound("min_nodes"), "max_nodes": bound("max_nodes"),
+                           "gpus_per_node": setting("gpus_per_node", 0), "gpu_type": setting("gpu_type"),
+                           "preemptible": setting("preemptible", False)}]
+        self.node_pools = [self._get_node_pool(pool, i) for i, pool in enumerate(node_pools)]
+        if len(set(pool["name"] for pool in self.node_pools)) < len(self.node_pools):
+            raise util.TFCliError("ERROR: The node pools of cluster {} don't have unique names!".format(self.name))
+
+        # the cluster-wide settings (the machine type of the first pool, the GPUs of the first pool with GPUs)
+        self.machine_type = self.node_pools[0]["machine_type"]
+        self.num_nodes = sum(pool["num_nodes"] for pool in self.node_pools)
+        gpu_pool = next((pool for pool in self.node_pools if pool["gpus_per_node"] > 0), None)
+        self.gpus_per_node = gpu_pool["gpus_per_node"] if gpu_pool else 0
+        self.gpu_type = gpu_pool["gpu_type"] if gpu_pool else None
+        self.num_gpus = sum(pool["num_nodes"] * pool["gpus_per_node"] for pool in self.node_pools)
         # size of single disks (one per node)
         self.disk_size = kwargs.get("disk_size") or from_json.get("disk_size", 100)
         self.location = kwargs.get("location") or from_json.get("location")
@@ -94,43 +124,223 @@ class Cluster(object):
             self.started = False
 
         self.deleted = False  # is terminated or being shut down right now?
+        # the Operation handle of a running (async) creation (see `create_async`)
+        self.operation = None
+
+    def _get_node_pool(self, pool, index):
+        # a node pool spec with all fields set (see c'tor)
+        name = pool.get("name") or ("default-pool" if index == 0 else "pool-{}".format(index))
+        if not re.match(r'^[a-z][a-z0-9\-]{0,38}$', name):
+            raise util.TFCliError("ERROR: Invalid node pool name {} for cluster {} (only lowercase letters, digits "
+                                  "and hyphens)!".format(name, self.name))
+        machine_type = pool.get("machine_type")
+        # alternative to machine_type -> provide `cpus_per_node` and `memory_per_node`
+        if not machine_type:
+            cpus = pool.get("cpus_per_node")
+            mem = pool.get("memory_per_node")
+            if not cpus or not mem:
+                raise util.TFCliError("ERROR: no vCPUs_per_node OR no memory_per_node given for {}cluster {}".
+                                      format("node pool {} of ".format(name) if index > 0 else "", self.name))
+            machine_type = "custom-{}-{}".format(cpus, mem * 1024)
+        gpus_per_node = pool.get("gpus_per_node") or 0
+        jobs = pool.get("jobs") or []
+        if any(job not in ["worker", "ps"] for job in jobs):
+            raise util.TFCliError("ERROR: Unknown job(s) {} for node pool {} of cluster {} (use 'worker' and/or 'ps')!".
+                                  format(jobs, name, self.name))
+        num_nodes = pool.get("num_nodes") if pool.get("num_nodes") is not None else 3
+        # autoscaling bounds (both None: no autoscaling)
+        min_nodes, max_nodes = pool.get("min_nodes"), pool.get("max_nodes")
+        if min_nodes is not None or max_nodes is not None:
+            min_nodes = int(min_nodes or 0)
+            max_nodes = int(max_nodes) if max_nodes is not None else max(num_nodes, min_nodes)
+            if not min_nodes <= num_nodes <= max_nodes or max_nodes < 1:
+                raise util.TFCliError("ERROR: Node pool {} of cluster {} needs min_nodes ({}) <= num_nodes ({}) <= "
+                                      "max_nodes ({}) and max_nodes > 0!".
+                                      format(name, self.name, min_nodes, num_nodes, max_nodes))
+        return {
+            "name": name,
+            "machine_type": machine_type,
+            "num_nodes": num_nodes,
+            "min_nodes": min_nodes,
+            "max_nodes": max_nodes,
+            "gpus_per_node": gpus_per_node,
+            "gpu_type": (pool.get("gpu_type") or "nvidia-tesla-k80") if gpus_per_node > 0 else None,
+            "preemptible": bool(pool.get("preemptible", False)),
+            "jobs": list(jobs)
+        }
+
+    def get_node_labels(self, pool):
+        """
+        Returns: The Kubernetes labels (dict) to put onto the nodes of the given node pool (empty for clusters with
+            a single node pool, see `util.NODE_POOL_LABEL`).
+
+        Args:
+            pool (dict): One of the cluster's `node_pools`.
+        """
+        if len(self.node_pools) < 2:
+            return {}
+        labels = {util.NODE_POOL_LABEL: pool["name"]}
+        if pool["jobs"]:
+            labels[util.NODE_POOL_JOBS_LABEL] = ".".join(pool["jobs"])
+        return labels
+
+    def get_pool_nodes(self, pool_name):
+        """
+        Returns: The sorted names of the (running) nodes of the given node pool (all nodes if the cluster has only
+            one node pool).
+
+        Args:
+            pool_name (Optional[str]): The name of the node pool.
+        """
+        if not pool_name or len(self.node_pools) < 2:
+            return sorted(self.instances or [])
+        return sorted(n["name"] for n in self.get_node_status(self.get_kubectl_context())
+                      if n.get("pool") == pool_name)
+
+    def get_cloud_pool_name(self, pool):
+        """
+        Returns: The name of the given node pool in the cloud (may differ from the pool's tfcli name, e.g. gcloud
+            always calls a cluster's first pool "default-pool", see `util.get_node_pools`).
+
+        Args:
+            pool (dict): One of the cluster's `node_pools`.
+        """
+        running = util.get_cluster_specs().get(self.name_hyphenated, {})
+        return next((p["cloud_name"] for p in running.get("node_pools") or [] if p["name"] == pool["name"] and
+                     p.get("cloud_name")), pool["name"])
+
+    def scale_to_zero(self):
+        """
+        Shrinks all node pools to zero nodes (and their autoscalers' lower bounds to 0), so that no nodes are billed
+        anymore while the cluster itself (incl. its Kubernetes objects) is kept. Note that the nodes' disks go away
+        with the nodes. See `scale_up` for the way back.
+        """
+        provider = util.cloud_provider()
+        print("+ Scaling cluster {} down to zero nodes ...".format(self.name_hyphenated))
+        with profiler.phase("cluster.scale-to-zero"):
+            for pool in self.node_pools:
+                provider.resize_node_pool(self, pool, 0, min_nodes=0 if pool["max_nodes"] is not None else None)
+        util.inventory_cache.invalidate("clusters", "instances")
+        # (the cluster itself is still started)
+        self.instances, self.primary_name = None, None
+
+    def scale_up(self, timeout=1800):
+        """
+        Grows all node pools back to their `num_nodes` (and restores their autoscalers' lower bounds), e.g. after
+        `scale_to_zero`, and waits until all nodes (and GPUs) are ready.
+
+        Args:
+            timeout (float): The max. number of seconds to wait for the nodes.
+        """
+        provider = util.cloud_provider()
+        print("+ Scaling cluster {} up to {} node(s) ...".format(self.name_hyphenated, self.num_nodes))
+        with profiler.phase("cluster.scale-up"):
+            for pool in self.node_pools:
+                provider.resize_node_pool(self, pool, pool["num_nodes"], min_nodes=pool["min_nodes"])
+            util.inventory_cache.invalidate("clusters", "instances")
+            # (the GPU drivers' daemonsets are still installed and come up on the new nodes by themselves)
+            self.wait_ready(timeout, install_gpu_drivers=False)
 
     def create(self):
         """
-        Create the Kubernetes cluster with the options given in self.
+        Create the Kubernetes cluster with the options given in self and waits until it's ready (see `wait_ready`).
         This also sets up the local kubectl app to point to the new cluster automatically.
         """
+        with profiler.phase("cluster.create"):
+            self.create_async()
+            self.wait_ready()
+
+    def create_async(self):
+        """
+        Starts creating the Kubernetes cluster with the options given in self and returns right away.
+        Use `wait_ready` to wait for the cluster to be usable.
+
+        Returns: The Operation handle of the creation.
+        """
         print("+ Creating cluster: {}. This may take a few minutes ...".format(self.name_hyphenated))
-        if self.num_gpus == 0:
-            out = util.syscall("gcloud container clusters create {} -m {} --disk-size {} --num-nodes {} {}".
-                               format(self.name_hyphenated, self.machine_type, self.disk_size, self.num_nodes,
-                                      "--zone " + self.location if self.location else ""), return_outputs="as_str")
-        else:
-            out = util.syscall("gcloud container clusters create {} --enable-cloud-logging --enable-cloud-monitoring "
-                               "--accelerator type={},count={} {} -m {} --disk-size {} --enable-kubernetes-alpha "
-                               "--image-type UBUNTU --num-nodes {} --cluster-version 1.9.2-gke.1 --quiet".
-                               format(self.name_hyphenated, self.gpu_type, self.gpus_per_node,
-                                      "--zone "+self.location if self.location else "", self.machine_type, self.disk_size,
-                                      self.num_nodes), return_outputs="as_str")
-        # check output of cluster generating code
-        if re.search(r'error', out, re.IGNORECASE):
-            raise util.TFCliError(out)
-        else:
-            print("+ Successfully created cluster.")
-        self.instances, self.primary_name = util.get_compute_instance_specs(self.name_hyphenated)
-        self.started = True
-
-        # install NVIDIA drivers on machines per local kubectl
-        if self.num_gpus > 0:
-            print("+ Installing NVIDIA GPU drivers and k8s device plugins ...")
-            util.syscall("kubectl create -f https://raw.githubusercontent.com/GoogleCloudPlatform/"
-                         "container-engine-accelerators/k8s-1.9/daemonset.yaml")
-            util.syscall("kubectl delete -f https://raw.githubusercontent.com/kubernetes/kubernetes/"
-                         "release-1.9/cluster/addons/device-plugins/nvidia-gpu/daemonset.yaml")
-            util.syscall("kubectl create -f https://raw.githubusercontent.com/kubernetes/kubernetes/"
-                         "release-1.9/cluster/addons/device-plugins/nvidia-gpu/daemonset.yaml")
-
-        print("+ Done. Cluster: {} created.".format(self.name_hyphenated))
+        self.operation = util.cloud_provider().create_cluster_async(self)
+        return self.operation
+
+    def wait_ready(self, timeout=1800, poll_interval=10.0, install_gpu_drivers=True):
+        """
+        Waits until the cluster is usable: Its creation (if started with `create_async`) has finished, all its
+        nodes are registered and Ready in Kubernetes and - for GPU clusters - the NVIDIA drivers and the k8s device
+        plugin are installed and all GPU nodes advertise their GPUs.
+
+        Args:
+            timeout (float): The max. number of seconds to wait in total.
+            poll_interval (float): The number of seconds between two readiness checks.
+            install_gpu_drivers (bool): Whether to install the NVIDIA drivers and device plugins (False if they are
+                already installed, e.g. when scaling the cluster back up).
+        """
+        deadline = time.time() + timeout
+        with profiler.phase("wait-ready"):
+            if self.operation is not None:
+                with profiler.phase("create-cluster"):
+                    self.operation.wait(max(deadline - time.time(), 0))
+                self.operation = None
+                print("+ Successfully created cluster {}.".format(self.name_hyphenated))
+                # our cached view of the cloud inventory is outdated now
+                util.inventory_cache.invalidate("clusters", "instances")
+            with profiler.phase("get-instances"):
+                self.instances, self.primary_name = util.get_compute_instance_specs(self.name_hyphenated)
+            self.started = True
+            context = self.get_kubectl_context()
+
+            with profiler.phase("wait-nodes"):
+                self._wait_for("{} Ready node(s)".format(self.num_nodes), deadline, poll_interval, context,
+                               lambda nodes: sum(1 for n in nodes if n["ready"]) >= self.num_nodes)
+
+            # install NVIDIA drivers on machines per local kubectl
+            if self.num_gpus > 0 and install_gpu_drivers:
+                print("+ Installing NVIDIA GPU drivers and k8s device plugins ...")
+                kubectl = "kubectl" + (" --context " + context if context else "")
+                with profiler.phase("install-gpu-drivers"):
+                    util.syscall_with_retry(kubectl + " create -f https://raw.githubusercontent.com/"
+                                            "GoogleCloudPlatform/container-engine-accelerators/k8s-1.9/daemonset.yaml")
+                    # may not exist (yet)
+                    util.syscall_with_retry(kubectl + " delete -f https://raw.githubusercontent.com/kubernetes/"
+                                            "kubernetes/release-1.9/cluster/addons/device-plugins/nvidia-gpu/"
+                                            "daemonset.yaml", raise_on_error=False)
+                    util.syscall_with_retry(kubectl + " create -f https://raw.githubusercontent.com/kubernetes/"
+                                            "kubernetes/release-1.9/cluster/addons/device-plugins/nvidia-gpu/"
+                                            "daemonset.yaml")
+            if self.num_gpus > 0:
+                with profiler.phase("wait-gpus"):
+                    self._wait_for("{} GPU(s)".format(self.num_gpus), deadline, poll_interval, context,
+                                   lambda nodes: len(nodes) >= self.num_nodes and
+                                   sum(n["gpus"] for n in nodes) >= self.num_gpus)
+
+            print("+ Done. Cluster: {} created.".format(self.name_hyphenated))
+
+    def get_kubectl_context(self):
+        """
+        Returns: The name of the kubectl context pointing to this cluster (None if there is none, in which case
+            kubectl's current context is used).
+        """
+        return util.cloud_provider().get_kubectl_context(self)
+
+    def get_node_status(self, context=None):
+        """
+        Args:
+            context (Optional[str]): The kubectl context to use (see `get_kubectl_context`).
+
+        Returns: List of dicts (fields: name, ready, gpus) for all nodes registered in the cluster's Kubernetes
+            (see `CloudProvider.get_node_status`).
+        """
+        return util.cloud_provider().get_node_status(self, context)
+
+    def _wait_for(self, what, deadline, poll_interval, context, condition):
+        # polls the nodes' status until `condition(nodes)` holds
+        while True:
+            nodes = self.get_node_status(context)
+            if condition(nodes):
+                return
+            if time.time() + poll_interval > deadline:
+                raise util.TFCliError("ERROR: Cluster {} not ready in time (waiting for {}; nodes: {})!".
+                                      format(self.name_hyphenated, what, nodes))
+            print("+ Waiting for {} in cluster {} ...".format(what, self.name_hyphenated))
+            time.sleep(poll_interval)
 
     def delete(self):
         """
@@ -139,11 +349,110 @@ class Cluster(object):
         # delete the named cluster
         # don't wait for operation to finish
         print("+ Deleting cluster {} (async).".format(self.name_hyphenated))
-        util.syscall("gcloud container clusters delete {} --quiet --async".
-                     format(self.name))
+        util.cloud_provider().delete_cluster(self)
+        util.inventory_cache.invalidate("clusters", "instances")
         self.started = False
         self.deleted = True
 
+    def download(self, remote_dir, local_dir, paths=None, compression=None, conflict_dir=None):
+        """
+        Downloads files from all nodes in parallel, each node's files as one (compressed) tar stream into the
+        node's own staging directory. The staging directories are then merged into `local_dir` (see `merge`):
+        Identical files from different nodes are kept only once, of differing ones the most recently modified
+        version wins.
+
+        Args:
+            remote_dir (str): The directory on the nodes.
+            local_dir (str): The local directory to download into.
+            paths (Optional[List[str]]): The paths (relative to `remote_dir`) to download (default: everything).
+            compression (Optional[str]): "zstd", "gzip" or "none" (default: the best one available locally).
+            conflict_dir (Optional[str]): The local directory to keep the other versions of conflicting files in
+                (default: discard them).
+
+        Returns: MergeStats about the downloaded files.
+        """
+        compression = compression or transfer.default_compression()
+        staging = {node: merge.staging_dir(local_dir, node) for node in self.instances}
+        try:
+            with ThreadPoolExecutor(max_workers=util.engine.max_concurrency) as executor:
+                futures = [executor.submit(profiler.in_current_phase(transfer.download), node, remote_dir,
+                                           paths or ["."], staging[node], location=self.location,
+                                           compression=compression)
+                           for node in self.instances]
+                for future in as_completed(futures):
+                    future.result()
+            with profiler.phase("merge"):
+                return merge.merge_directories(list(staging.items()), local_dir, conflict_dir=conflict_dir)
+        finally:
+            merge.remove_staging_dirs(local_dir)
+
+    def broadcast(self, local_path, remote_dir):
+        """
+        Copies a local file or directory into a directory on all nodes. Instead of uploading it once per node, it is
+        uploaded only once (as a gzipped tar archive) to the primary node and then forwarded from node to node over
+        the cluster's internal network (along a binomial tree, see `transfer.broadcast_rounds`), so the upload time
+        hardly grows with the number of nodes. The nodes log into each other with a temporary ssh key, which is
+        removed again at the end (just like the archive), also if the broadcast fails.
+
+        Args:
+            local_path (str): The local file or directory to copy.
+            remote_dir (str): The directory on the nodes to extract it into (created if it doesn't exist).
+        """
+        provider = util.cloud_provider()
+        local_path = os.path.normpath(local_path)
+        if not os.path.exists(local_path):
+            raise util.TFCliError("ERROR: {} does not exist!".format(local_path))
+        # always the same names for the same broadcast (so that commands can be recorded and replayed)
+        tag = "tfcli-broadcast-" + hashlib.md5((os.path.abspath(local_path) + "|" + remote_dir + "|" +
+                                                self.name_hyphenated).encode("utf-8")).hexdigest()[:8]
+        tmp_dir = "/tmp/" + tag
+        archive = tmp_dir + "/data.tar.gz"
+        key = tmp_dir + "/id"
+        num_bytes = transfer.local_size(local_path)
+
+        def set_up_key():
+            # create the key pair on the primary and authorize it on all nodes
+            public_key = provider.ssh(self.primary_name, "mkdir -p -m 700 {d} && rm -f {k} {k}.pub && "
+                                                         "ssh-keygen -q -t ed25519 -N '' -C {t} -f {k} && cat {k}.pub".
+                                      format(d=tmp_dir, k=key, t=tag), location=self.location).output.strip()
+            if not public_key.startswith("ssh-"):
+                raise util.TFCliError("ERROR: Could not create an ssh key on node {}!".format(self.primary_name))
+            self.ssh_parallel("mkdir -p -m 700 {} ~/.ssh && echo '{}' >> ~/.ssh/authorized_keys".
+                              format(tmp_dir, public_key), progress=False)
+
+        with profiler.phase("cluster.broadcast"):
+            try:
+                print("+ Uploading {} to primary node {} ...".format(local_path, self.primary_name))
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [executor.submit(profiler.in_current_phase(set_up_key)),
+                               executor.submit(profiler.in_current_phase(transfer.upload_archive), self.primary_name,
+                                               os.path.dirname(local_path) or ".", [os.path.basename(local_path)],
+                                               archive, location=self.location)]
+                    for future in futures:
+                        future.result()
+
+                rounds = transfer.broadcast_rounds(self.primary_name, sorted(self.instances))
+                for i, pairs in enumerate(rounds):
+                    print("+ Forwarding to {} node(s) (round {}/{}) ...".format(len(pairs), i + 1, len(rounds)))
+                    with ThreadPoolExecutor(max_workers=util.engine.max_concurrency) as executor:
+                        futures = [executor.submit(profiler.in_current_phase(transfer.forward_archive), source,
+                                                   self.instances[target]["internal-ip"], [key, archive],
+                                                   location=self.location, key=key, num_bytes=num_bytes)
+                                   for source, target in pairs]
+                        for future in as_completed(futures):
+                            future.result()
+
+                print("+ Extracting on all nodes ...")
+                self.ssh_parallel(transfer.extract_archive_command(archive, remote_dir))
+            finally:
+                # never leave the temporary key (or its authorization) behind, not even after a failure
+                try:
+                    self.ssh_parallel("sed -i /{}/d ~/.ssh/authorized_keys; rm -rf {}".format(tag, tmp_dir),
+                                      progress=False)
+                except SSHParallelError as e:
+                    print("WARNING: Could not remove the temporary broadcast key from {} node(s)!".
+                          format(len(e.failed)))
+
     def get_spec(self):
         """
         Returns: Dict of the important settings of this Cluster.
@@ -156,48 +465,242 @@ class Cluster(object):
             "num_gpus": self.num_gpus,
             "gpus_per_node": self.gpus_per_node,
             "gpu_type": self.gpu_type,
+            "disk_size": self.disk_size,
             "status": "RUNNING" if self.started else "???",
             "primary_name": self.primary_name,
-            "location": self.location
+            "location": self.location,
+            "node_pools": self.node_pools
         }
 
     def ssh_parallel(self, *items, **kwargs):
         """
-        Runs commands via ssh and/or scp commands on all nodes in the cluster in parallel using multiple threads.
+        Runs commands via ssh and/or scp commands on all nodes in the cluster in parallel (using a bounded pool
+        of threads). The items of one node are executed in the given order; after a failed item, the node's
+        remaining items are skipped.
 
         Args:
             items (List[Union[str,tuple]]): List of commands to execute. Could be either of type str (ssh command)
-                or a tuple/list of two items (`from` and `to`) for an scp command.
+                or a tuple/list of two items (`from` and `to`) for an scp command. Local directories copied into
+                a remote directory (`to` ending in "/") are uploaded as one compressed tar stream.
             kwargs (any):
                 silent (bool): Whether to execute all commands silently (default: True).
+                max_concurrency (int): The max. number of nodes to work on at the same time (default: the
+                    engine's concurrency limit, see `tfcli --max-concurrency`).
+                progress (bool): Whether to print a line for each node that is done (default: True).
+                batch (bool): Whether to compile consecutive ssh commands (and uploads of small local files)
+                    into one remote script per node, which is then executed with a single ssh call
+                    (default: False).
+
+        Returns:
+            Dict of lists of NodeResult objects (one per executed item) by node name.
+
+        Raises:
+            SSHParallelError: If any item failed on any node (after all retries).
         """
-        threads = []
-        # generate and start all threads
-        for node, spec in self.instances.items():
-            t = threading.Thread(target=self._ssh_parallel_target, args=(node, kwargs.get("silent", True), items))
-            threads.append(t)
-            t.start()
-        # wait for all threads to complete
-        for t in threads:
-            t.join()
-
-    def _ssh_parallel_target(self, node, silent, items):
+        silent = kwargs.get("silent", True)
+        max_concurrency = kwargs.get("max_concurrency") or util.engine.max_concurrency
+        progress = kwargs.get("progress", True)
+        batch = kwargs.get("batch", False)
         for item in items:
-            # an ssh command to execute on the node
-            if isinstance(item, str):
-                _ = util.syscall("gcloud compute ssh {} {} --command \"{}\"".
-                                 format(node, "--zone="+self.location if self.location else "", item),
-                                 return_outputs=silent)
-            # an scp command (copy from ... to ...)
-            elif isinstance(item, (list, tuple)) and len(item) == 2:
-                item = list(map(lambda i: re.sub(r'_NODE_', node, i), item))
-                _ = util.syscall("gcloud compute scp {} {} {}".
-                                 format("--zone="+self.location if self.location else "", item[0], item[1]),
-                                 return_outputs=silent)
-            else:
+            if not isinstance(item, str) and not (isinstance(item, (list, tuple)) and len(item) == 2):
                 raise util.TFCliError("ERROR: unknown ssh command structure. Needs to be str (ssh-command) "
                                       "or list/tuple of exactly 2 str (scp).")
 
+        results = {}
+        # (the nodes' commands belong to the caller's phase)
+        target = profiler.in_current_phase(self._ssh_parallel_target)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {executor.submit(target, node, silent, items, batch): node for node in self.instances}
+            for i, future in enumerate(as_completed(futures)):
+                node = futures[future]
+                results[node] = future.result()
+                if progress:
+                    failed = [r for r in results[node] if not r.ok]
+                    print("+ [{}/{}] {} {} ({:.1f}s).".format(
+                        i + 1, len(futures), node, "FAILED: " + failed[0].describe() if failed else "done",
+                        sum(r.duration for r in results[node])))
+
+        if any(not r.ok for node_results in results.values() for r in node_results):
+            raise SSHParallelError(results)
+        return results
+
+    def _ssh_parallel_target(self, node, silent, items, batch=False):
+        provider = util.cloud_provider()
+        results = []
+        for step in self._batch_items(node, items) if batch else items:
+            # a script of several items
+            if isinstance(step, RemoteScript):
+                results.extend(self._run_script(provider, node, step, silent))
+                if not results[-1].ok:
+                    break
+                continue
+            start = time.time()
+            try:
+                # an ssh command to execute on the node
+                if isinstance(step, str):
+                    result = provider.ssh(node, step, location=self.location, capture=silent)
+                # a local directory to upload into a remote directory -> as a compressed tar stream
+                elif re.match(r'^_NODE_:.*/\.?$', step[1]) and os.path.isdir(step[0]):
+                    step = list(map(lambda i: re.sub(r'_NODE_', node, i), step))
+                    result = transfer.upload(node, os.path.dirname(os.path.normpath(step[0])),
+                                             [os.path.basename(os.path.normpath(step[0]))],
+                                             re.sub(r'^[^:]+:', "", step[1]), location=self.location,
+                                             compression=transfer.default_compression())
+                # an scp command (copy from ... to ...)
+                else:
+                    step = list(map(lambda i: re.sub(r'_NODE_', node, i), step))
+                    result = provider.scp(step[0], step[1], location=self.location, capture=silent)
+                results.append(NodeResult(node, step, result.returncode, time.time() - start, result.output))
+            except util.CommandError as e:
+                results.append(NodeResult(node, step, e.result.returncode, time.time() - start,
+                                          e.result.output + e.result.error_output))
+            except util.TFCliError as e:
+                results.append(NodeResult(node, step, None, time.time() - start, error=str(e)))
+            # don't run the node's remaining commands after a failure
+            if not results[-1].ok:
+                break
+        return results
+
+    @staticmethod
+    def _batch_items(node, items):
+        # groups consecutive ssh commands and uploads of small local files into RemoteScripts
+        steps = []
+        script = None
+        for item in items:
+            if isinstance(item, str):
+                size = len(item)
+            elif not re.match(r'^_NODE_:', item[0]) and re.match(r'^_NODE_:', item[1]) and \
+                    RemoteScript.can_upload(item[0]):
+                size = os.path.getsize(item[0])
+            else:
+                script = None
+                steps.append(item)
+                continue
+            if script is None or not script.fits(size):
+                script = RemoteScript()
+                steps.append(script)
+            if isinstance(item, str):
+                script.add_command(item, item)
+            else:
+                item = list(map(lambda i: re.sub(r'_NODE_', node, i), item))
+                script.add_upload(item, item[0], re.sub(r'^[^:]+:', "", item[1]))
+        # a script of a single command is no better than the command itself
+        return [s.items[0] if isinstance(s, RemoteScript) and len(s) == 1 and isinstance(s.items[0], str) else s
+                for s in steps]
+
+    def _run_script(self, provider, node, script, silent):
+        start = time.time()
+        try:
+            result = provider.ssh(node, script.command(), location=self.location, capture=True)
+        except util.CommandError as e:
+            result = e.result
+        except util.TFCliError as e:
+            return [NodeResult(node, script.items[0], None, time.time() - start, error=str(e))]
+        results = []
+        for item, returncode, duration, output in script.parse(result.output + result.error_output,
+                                                              result.returncode):
+            results.append(NodeResult(node, item, returncode, duration, output))
+            if not silent and output:
+                print(output, end="")
+        # the remainder (ssh/connection set up) goes to the first step
+        results[0].duration += max(time.time() - start - sum(r.duration for r in results), 0.0)
+        return results
+
+
+class NodeResult(object):
+    """
+    The outcome of a single ssh or scp item (see `Cluster.ssh_parallel`) on a single node.
+    """
+
+    def __init__(self, node, item, returncode, duration, output=None, error=None):
+        """
+        Args:
+            node (str): The name of the node.
+            item (Union[str,list]): The ssh command or the [from, to] pair of the scp command.
+            returncode (Optional[int]): The exit code (None if the command could not be run at all).
+            duration (float): The wall time (in sec) the item took (incl. retries).
+            output (Optional[str]): The captured outputs (only if run silently or if the command failed).
+            error (Optional[str]): An error message if the command could not be run at all.
+        """
+        self.node = node
+        self.item = item
+        self.returncode = returncode
+        self.duration = duration
+        self.output = output
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and self.error is None
+
+    def describe(self):
+        """
+        Returns: A one-line (str) description of the item and its outcome.
+        """
+        what = "ssh `{}`".format(self.item) if isinstance(self.item, str) else "scp {} {}".format(*self.item)
+        if self.error:
+            return "{}: {}".format(what, self.error.strip().splitlines()[0])
+        return "{} (exit code {})".format(what, self.returncode)
+
+
+class SSHParallelError(util.TFCliError):
+    """
+    Raised by `Cluster.ssh_parallel` if any item failed on any node. Holds all results (also the successful ones).
+    """
+    def __init__(self, results):
+        """
+        Args:
+            results (dict): Lists of NodeResults by node name (see `Cluster.ssh_parallel`).
+        """
+        self.results = results
+        self.failed = [r for node_results in results.values() for r in node_results if not r.ok]
+        super(SSHParallelError, self).__init__("ERROR: ssh/scp failed on {} of {} node(s):\n{}".format(
+            len(self.failed), len(results),
+            "\n".join("  {}: {}{}".format(r.node, r.describe(),
+                                           "\n    " + r.output.strip().replace("\n", "\n    ")
+                                           if r.output and r.output.strip() else "")
+                      for r in sorted(self.failed, key=lambda r: r.node))))
+
+
+def create_clusters(clusters, raise_on_error=True):
+    """
+    Creates several clusters concurrently: All creations are started right away, then all clusters are waited
+    for (see `Cluster.wait_ready`) in parallel. A failing cluster does not stop the others.
+
+    Args:
+        clusters (List[Cluster]): The Cluster objects to create.
+        raise_on_error (bool): Whether to raise a TFCliError if any of the clusters could not be created (after
+            all others are done).
+
+    Returns: Dict of TFCliErrors by the (hyphenated) names of the clusters that could not be created.
+    """
+    with profiler.phase("create-clusters"):
+        errors = {}
+        started = []
+        for cluster in clusters:
+            try:
+                cluster.create_async()
+                started.append(cluster)
+            except util.TFCliError as e:
+                errors[cluster.name_hyphenated] = e
+        parent_phase = profiler.current_phase()
+
+        def wait_ready(cluster):
+            with profiler.phase(cluster.name_hyphenated, parent=parent_phase):
+                cluster.wait_ready()
+
+        with ThreadPoolExecutor(max_workers=max(len(started), 1)) as executor:
+            futures = {executor.submit(wait_ready, c): c for c in started}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except util.TFCliError as e:
+                    errors[futures[future].name_hyphenated] = e
+    if errors and raise_on_error:
+        raise util.TFCliError("ERROR: Could not create {} of {} cluster(s):\n{}".format(
+            len(errors), len(clusters), "\n".join("  {}: {}".format(name, e) for name, e in sorted(errors.items()))))
+    return errors
+
 
 def get_cluster_from_string(cluster, running_clusters=None):
     """
@@ -15,8 +15,15 @@
 
 from tensorforce_client.utils import syscall
 import tensorforce_client.utils as util
-from tensorforce_client.experiment import Experiment, get_experiment_from_string, get_local_experiments
-from tensorforce_client.cluster import Cluster, get_cluster_from_string
+from tensorforce_client.experiment import Experiment, get_experiment_from_string, get_local_experiments, \
+    get_running_experiments
+from tensorforce_client.cluster import Cluster, create_clusters, get_cluster_from_string
+from tensorforce_client.machine_types import load_price_table
+from tensorforce_client.pool import cluster_pool
+from tensorforce_client.recommender import recommend_clusters
+from tensorforce_client.recovery import RecoveryLoop
+from tensorforce_client.scheduler import Scheduler
+import json
 import os
 import re
 import shutil
@@ -94,6 +101,8 @@ def cmd_init(args):
     # kubernetes-account@introkubernetes-191608.iam.gserviceaccount.com
     # l:/programming/privatekeys/MaRLEnE-bbad55cddab1.json
     syscall("gcloud auth activate-service-account {} --key-file={}".format(service_account, key_file))
+    # projects visible to the (new) account may differ from the cached ones
+    util.inventory_cache.invalidate("projects")
 
     remote_projects_by_name, remote_projects_by_id = util.get_remote_projects()
     # if remote given -> only check for that one and exit if doesn't exist
@@ -179,13 +188,50 @@ def cmd_experiment_list():
 def cmd_experiment_start(args, project_id):
     print("+ Loading experiment settings{}.".format(" (from running experiment)" if args.resume else ""))
     experiment = get_experiment_from_string(args.experiment, running=args.resume)
+    if args.plan:
+        print(experiment.get_start_plan(project_id, resume=args.resume, cluster=args.cluster).describe())
+        return
     experiment.start(project_id, resume=args.resume, cluster=args.cluster)
 
 
+def cmd_experiment_schedule(args, project_id):
+    print("+ Loading experiment settings.")
+    experiments = [get_experiment_from_string(e) for e in args.experiments]
+    scheduler = Scheduler(util.get_cluster_specs(), get_running_experiments())
+    placements = scheduler.schedule(experiments)
+    print(scheduler.describe(placements))
+    for p in placements:
+        if not p.fits:
+            print("WARNING: Experiment {} does not even fit onto its own cluster {}. Some of its pods may stay "
+                  "pending!".format(p.experiment.name, p.cluster.name))
+    if args.plan:
+        return
+
+    # create all new clusters at once
+    new_clusters = [Cluster(**dict(p.cluster.spec, name=p.cluster.name)) for p in placements
+                    if p.cluster.owner is p.experiment]
+    if new_clusters:
+        create_clusters(new_clusters)
+    for p in placements:
+        print("+ Starting experiment {} on cluster {}.".format(p.experiment.name, p.cluster.name))
+        # the owner of a new cluster runs on it as on a dedicated cluster (deleted when the experiment is stopped)
+        # (GPUs as planned for its own cluster, not for the whole cluster it gets packed onto)
+        p.experiment.gpu_topology = p.experiment.gpu_topology or {
+            "num_nodes": p.experiment.cluster.get("num_nodes"),
+            "gpus_per_node": p.experiment.cluster.get("gpus_per_node"),
+            "node_pools": p.experiment.cluster.get("node_pools")
+        }
+        if p.cluster.owner is p.experiment:
+            p.experiment.cluster = dict(p.experiment.cluster or {}, name=p.cluster.name)
+            p.experiment.start(project_id)
+        else:
+            p.experiment.start(project_id, cluster=p.cluster.name)
+
+
 def cmd_experiment_pause(args, project_id):
     print("+ Loading experiment settings (from running experiment).")
     experiment = get_experiment_from_string(args.experiment, running=True)
-    experiment.pause(project_id)
+    experiment.pause(project_id, scale_down=False if args.keep_nodes else None)
 
 
 def cmd_experiment_stop(args):
@@ -195,17 +241,33 @@ def cmd_experiment_stop(args):
     experiment.stop(no_download)
 
 
+def cmd_experiment_watch(args, project_id):
+    print("+ Loading experiment settings (from running experiment).")
+    experiment = get_experiment_from_string(args.experiment, running=True)
+    # point kubectl to the experiment's cluster
+    experiment.setup_cluster(cluster=None, project_id=project_id)
+    RecoveryLoop(experiment, interval=args.interval, sync_interval=args.sync_interval).run()
+
+
 def cmd_experiment_download(args):
     print("+ Loading experiment settings.")
     experiment = get_experiment_from_string(args.experiment, running=True)
     print("+ Downloading experiment's results ...")
-    experiment.download()
+    experiment.download(incremental=not args.full, compression=args.compression)
 
 
 def cmd_cluster_create(args):
-    cluster = Cluster(**args.__dict__)
-    cluster.create()
-    return cluster
+    files = args.file or [None]
+    if len(files) > 1 and args.name:
+        raise util.TFCliError("ERROR: Cannot give a cluster name (-n option) when creating several clusters!")
+    clusters = [Cluster(**dict(args.__dict__, file=file)) for file in files]
+    if len(clusters) == 1:
+        clusters[0].create()
+        return clusters[0]
+    # create all clusters at the same time
+    print("+ Creating {} clusters concurrently.".format(len(clusters)))
+    create_clusters(clusters)
+    return clusters
 
 
 def cmd_cluster_delete(args):
@@ -228,11 +290,77 @@ def cmd_cluster_delete(args):
 def cmd_cluster_list():
     print("+ Getting cluster information ...")
     clusters = util.get_cluster_specs()
+    # the GPUs used by our (running) experiments per cluster
+    gpus_used = {}
+    for experiment in get_running_experiments():
+        name = experiment.cluster.get("name", "").replace("_", "-")
+        gpus_used[name] = gpus_used.get(name, 0) + sum(p["gpus"] for p in experiment.get_pods())
     print("LIST OF CLUSTERS:")
-    print("{: >45}{: >15s}{: >16s}{: >8s}{: >10s}{: >10s}".
-          format("Cluster", "Location", "Machine-Type", "Nodes", "GPUs/Node", "Status"))
+    print("{: >45}{: >15s}{: >16s}{: >8s}{: >10s}{: >20s}{: >12s}{: >10s}".
+          format("Cluster", "Location", "Machine-Type", "Nodes", "GPUs/Node", "GPU-Type", "GPUs used", "Status"))
     for name, cluster in clusters.items():
-        print("{: >45}{: >15s}{: >16s}{: >8d}{: >10d}{: >10s}".
+        print("{: >45}{: >15s}{: >16s}{: >8d}{: >10d}{: >20s}{: >12s}{: >10s}".
               format(name, cluster.get("location"), cluster.get("machine_type"), cluster.get("num_nodes"),
-                     cluster.get("gpus_per_node"), cluster.get("status")))
+                     cluster.get("gpus_per_node"), cluster.get("gpu_type") or "-",
+                     "{:g}/{}".format(round(gpus_used.get(name, 0), 2), cluster.get("num_gpus"))
+                     if cluster.get("num_gpus") else "-", cluster.get("status")))
+
+
+def cmd_cluster_recommend(args):
+    if os.path.isfile("experiments/{}/experiment.json".format(args.experiment)):
+        experiment = get_experiment_from_string(args.experiment)
+    else:
+        experiment = Experiment(file=args.experiment)
+    pods = experiment.get_pods()
+    print("+ Experiment {} ({}) has {} pod(s) requesting {:.2f} vCPUs, {:.2f}Gb of memory and {} GPU(s) in total.".
+          format(experiment.name, experiment.run_mode, len(pods), sum(p["cpu"] for p in pods),
+                 sum(p["memory"] for p in pods), sum(p["gpus"] for p in pods)))
+    machine_types, gpu_types = load_price_table(args.prices)
+    gpu_type = experiment.cluster.get("gpu_type") if experiment.cluster.get("gpus_per_node") else None
+    recommendations = recommend_clusters(pods, machine_types, gpu_types, gpu_type=gpu_type, num=args.num)
+    if not recommendations:
+        raise util.TFCliError("ERROR: Experiment {} does not fit onto any cluster of the known machine types!".
+                              format(experiment.name))
+    print("RECOMMENDED CLUSTERS:")
+    print("{: >16s}{: >8s}{: >8s}{: >20s}{: >10s}{: >22s}".
+          format("Machine-Type", "Nodes", "GPUs", "GPU-Type", "USD/h", "vCPUs/Pod (min/avg)"))
+    for r in recommendations:
+        print("{: >16s}{: >8d}{: >8d}{: >20s}{: >10.3f}{: >22s}".
+              format(r.machine_type, r.num_nodes, r.num_nodes * r.gpus_per_node, r.gpu_type or "-", r.price,
+                     "{:.2f}/{:.2f}".format(min(r.cpu_shares), sum(r.cpu_shares) / len(r.cpu_shares))))
+    if args.output:
+        name = os.path.splitext(os.path.basename(args.output))[0]
+        with open(args.output, "w") as f:
+            json.dump(recommendations[0].get_spec(name), f, indent=2)
+        print("+ Wrote cluster spec {}.".format(args.output))
+
+
+def cmd_pool_set(args):
+    cluster_pool.set_config(args.cluster, args.size, args.max_idle)
+    print("+ Cluster pool will keep {} idle cluster(s) of spec {}. Use `pool fill` to create them.".
+          format(args.size, args.cluster))
+
+
+def cmd_pool_list():
+    config = cluster_pool.get_config()
+    print("CLUSTER POOL:")
+    print("{: >30s}{: >8s}{: >14s}".format("Cluster spec", "Size", "Max idle (s)"))
+    for spec, settings in sorted(config.items()):
+        print("{: >30s}{: >8d}{: >14d}".format(spec, settings.get("size", 1), settings.get("max_idle", 0)))
+    print("{: >45s}{: >30s}{: >12s}{: >12s}".format("Cluster", "Spec", "Status", "Since (s)"))
+    for name, entry in sorted(cluster_pool.list().items()):
+        print("{: >45s}{: >30s}{: >12s}{: >12d}".format(name, entry["spec"], entry["status"],
+                                                      int(time.time() - entry["since"])))
+
+
+def cmd_pool_fill(args):
+    clusters = cluster_pool.fill()
+    print("+ Cluster pool filled ({} new cluster(s)).".format(len(clusters)))
+    if args.watch:
+        print("+ Watching the pool for idle clusters to delete ...")
+        cluster_pool.watch()
+
 
+def cmd_pool_drain():
+    names = cluster_pool.drain()
+    print("+ Deleted {} pool cluster(s).".format(len(names)))
@@ -0,0 +1,400 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Asyncio based execution core for all external commands (gcloud, kubectl, etc..) that tfcli runs.
+All commands are executed on one event loop (running in a background thread), and a global semaphore
+limits the number of child processes alive at the same time, no matter how many threads submit commands.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import asyncio
+import os
+import shlex
+import sys
+import threading
+import time
+from six.moves import queue
+from tensorforce_client.profiling import profiler
+
+
+# the default max. number of external commands running at the same time
+DEFAULT_MAX_CONCURRENCY = 8
+# (unquoted) shell operators that make a command a pipeline or list, which has to run in a shell
+SHELL_OPERATORS = {"|", "|&", "||", "&&", "&", ";", "<", ">", ">>"}
+
+
+def is_shell_command(command):
+    """
+    Returns: Whether the given command contains (unquoted) shell operators, e.g. a pipeline like
+        "gcloud compute ssh .. | tar xf -".
+
+    Args:
+        command (str): The command.
+    """
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        return any(token in SHELL_OPERATORS for token in lexer)
+    # unbalanced quotes: fails either way
+    except ValueError:
+        return False
+
+
+class SyscallResult(object):
+    """
+    The outcome of a single external command.
+    """
+
+    def __init__(self, command, returncode, stdout=None, stderr=None, duration=0.0, timed_out=False,
+                 output_bytes=None):
+        """
+        Args:
+            command (str): The command that was executed.
+            returncode (int): The exit code of the command (None if it was killed after a timeout).
+            stdout (Optional[bytes]): The captured stdout (incl. stderr if merged). None if not captured.
+            stderr (Optional[bytes]): The captured stderr. None if not captured or merged into stdout.
+            duration (float): The wall time (in sec) the command took.
+            timed_out (bool): Whether the command was killed because it ran into its timeout.
+            output_bytes (Optional[int]): The number of bytes the command wrote to stdout/stderr (only known
+                for captured outputs). Default: The length of stdout plus stderr.
+        """
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+        self.output_bytes = output_bytes if output_bytes is not None else len(stdout or b"") + len(stderr or b"")
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def output(self):
+        """
+        Returns: The captured stdout as str (empty if nothing was captured).
+        """
+        return (self.stdout or b"").decode("latin-1")
+
+    @property
+    def error_output(self):
+        """
+        Returns: The captured stderr as str (empty if nothing was captured).
+        """
+        return (self.stderr or b"").decode("latin-1")
+
+    def __repr__(self):
+        return "SyscallResult(command={!r}, returncode={}, duration={:.2f}s{})".\
+            format(self.command, self.returncode, self.duration, ", timed out" if self.timed_out else "")
+
+
+class LineStream(object):
+    """
+    The stdout of a running command, consumable line by line (see `SyscallEngine.iter_lines`).
+    After the iteration is done, `result` holds the command's SyscallResult (w/o stdout).
+    """
+
+    END = object()
+
+    def __init__(self, command):
+        self.command = command
+        self.queue = queue.Queue()
+        self.future = None
+        self.result = None
+
+    def __iter__(self):
+        while True:
+            line = self.queue.get()
+            if line is self.END:
+                break
+            yield line
+        # re-raises errors that happened while starting the process
+        self.result = self.future.result()
+
+
+class SyscallEngine(object):
+    """
+    Runs external commands as asyncio subprocesses on a private event loop in a background thread.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            max_concurrency (int): The max. number of commands that may run at the same time.
+        """
+        self.max_concurrency = max_concurrency
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+        # optional GCloudWorkerPool executing gcloud commands in warm processes (see `utils.enable_gcloud_worker`)
+        self.gcloud_worker = None
+        # optional Cassette to record all commands to or to replay them from (see `utils.use_cassette`)
+        self.cassette = None
+
+    def set_max_concurrency(self, max_concurrency):
+        """
+        Changes the concurrency limit. Only affects commands that are submitted afterwards.
+
+        Args:
+            max_concurrency (int): The new max. number of commands that may run at the same time.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1!")
+        with self.lock:
+            self.max_concurrency = max_concurrency
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self._create_semaphore)
+
+    def submit(self, command, **kwargs):
+        """
+        Schedules a command for execution and returns immediately.
+
+        Args:
+            command (str): The command to execute.
+            kwargs (any): See `execute`.
+
+        Returns: A concurrent.futures.Future that resolves to the command's SyscallResult.
+        """
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self.execute(command, **kwargs), self.loop)
+        self._profile(future)
+        return future
+
+    def run(self, command, **kwargs):
+        """
+        Executes a command and blocks until it is done.
+
+        Args:
+            command (str): The command to execute.
+            kwargs (any): See `execute`.
+
+        Returns: The SyscallResult of the command.
+        """
+        if self.thread is not None and threading.current_thread() is self.thread:
+            raise RuntimeError("SyscallEngine.run must not be called from within the engine's own event loop "
+                               "(use `await async_syscall()` instead)!")
+        return self.submit(command, **kwargs).result()
+
+    def run_many(self, commands, **kwargs):
+        """
+        Executes several (independent) commands concurrently (within the concurrency limit) and blocks until
+        all of them are done.
+
+        Args:
+            commands (List[str]): The commands to execute.
+            kwargs (any): See `execute` (applied to all commands).
+
+        Returns: List of SyscallResults in the order of the given commands.
+        """
+        futures = [self.submit(c, **kwargs) for c in commands]
+        return [f.result() for f in futures]
+
+    def iter_lines(self, command, merge_err=False, timeout=None):
+        """
+        Executes a command and makes its stdout available line by line while it is still running.
+
+        Args:
+            command (str): The command to execute.
+            merge_err (bool): Whether to merge stderr into stdout. If False, stderr is captured as a whole.
+            timeout (Optional[float]): The max. number of seconds the command may run before it is killed.
+
+        Returns: A LineStream object to iterate over (yields str lines incl. line breaks).
+        """
+        self._ensure_started()
+        stream = LineStream(command)
+        stream.future = asyncio.run_coroutine_threadsafe(self._stream(stream, merge_err, timeout), self.loop)
+        self._profile(stream.future)
+        return stream
+
+    @staticmethod
+    def _profile(future):
+        # record the command (with the phase of the submitting thread) once it's done
+        if not profiler.enabled:
+            return
+        phase = profiler.current_phase()
+
+        def done(f):
+            if not f.cancelled() and f.exception() is None:
+                profiler.record_command(f.result(), phase)
+        future.add_done_callback(done)
+
+    async def _stream(self, stream, merge_err, timeout):
+        async with self.semaphore:
+            result = await self._replay(stream.command, True) or \
+                await self._execute_in_worker(stream.command, True, merge_err, timeout, None)
+            if result is not None:
+                for line in result.output.splitlines(True):
+                    stream.queue.put(line)
+                stream.queue.put(LineStream.END)
+                self._record(result)
+                return SyscallResult(result.command, result.returncode, None, result.stderr, duration=result.duration,
+                                     timed_out=result.timed_out, output_bytes=result.output_bytes)
+            start = time.time()
+            try:
+                process = await self._create_process(stream.command, True, merge_err, False)
+            except BaseException:
+                stream.queue.put(LineStream.END)
+                raise
+            stderr_task = None if merge_err else asyncio.ensure_future(process.stderr.read())
+            timed_out = False
+            num_bytes = 0
+            # only keep the lines if we have to record them
+            lines = [] if self.cassette is not None else None
+            try:
+                deadline = None if timeout is None else start + timeout
+                while True:
+                    remaining = None if deadline is None else max(deadline - time.time(), 0.0)
+                    line = await asyncio.wait_for(process.stdout.readline(), remaining)
+                    if line == b"":
+                        break
+                    num_bytes += len(line)
+                    if lines is not None:
+                        lines.append(line)
+                    stream.queue.put(line.decode("latin-1"))
+                await asyncio.wait_for(process.wait(), None if deadline is None else max(deadline - time.time(), 0.0))
+            except asyncio.TimeoutError:
+                timed_out = True
+                process.kill()
+                await process.wait()
+            finally:
+                stream.queue.put(LineStream.END)
+            stderr = None if stderr_task is None else await stderr_task
+            result = SyscallResult(stream.command, None if timed_out else process.returncode, None, stderr,
+                                   duration=time.time() - start, timed_out=timed_out,
+                                   output_bytes=num_bytes + len(stderr or b""))
+            self._record(result, None if lines is None else b"".join(lines))
+            return result
+
+    async def execute(self, command, capture=True, merge_err=True, timeout=None, stdin=None):
+        """
+        Coroutine executing a single command. Must run on the engine's loop (see `async_syscall` for a version
+        that can be awaited from any loop).
+
+        Args:
+            command (str): The command to execute in the shell.
+            capture (bool): Whether to capture stdout/stderr. If False, the outputs go to our own stdout/stderr.
+            merge_err (bool): Whether to merge stderr into stdout (only if capture is True).
+            timeout (Optional[float]): The max. number of seconds the command may run before it is killed.
+            stdin (Optional[bytes]): Data to be fed into the command's stdin.
+
+        Returns: The SyscallResult of the command.
+        """
+        async with self.semaphore:
+            result = await self._replay(command, capture)
+            if result is not None:
+                return result
+            result = await self._execute_in_worker(command, capture, merge_err, timeout, stdin)
+            if result is None:
+                start = time.time()
+                process = await self._create_process(command, capture, merge_err, stdin is not None)
+                timed_out = False
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(input=stdin), timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    process.kill()
+                    stdout, stderr = await process.communicate()
+                result = SyscallResult(command, None if timed_out else process.returncode, stdout, stderr,
+                                       duration=time.time() - start, timed_out=timed_out)
+            self._record(result)
+            return result
+
+    async def _replay(self, command, capture):
+        # returns None if we are not replaying a cassette
+        cassette = self.cassette
+        if cassette is None or not cassette.replaying:
+            return None
+        start = time.time()
+        result, latency = cassette.replay(command)
+        await asyncio.sleep(latency)
+        if not capture and result.stdout:
+            sys.stdout.write(result.output)
+        result.duration = time.time() - start
+        return result
+
+    def _record(self, result, stdout=None):
+        cassette = self.cassette
+        if cassette is not None and not cassette.replaying:
+            cassette.record(result, stdout)
+
+    async def _execute_in_worker(self, command, capture, merge_err, timeout, stdin):
+        # returns None if the command has to run as a subprocess
+        worker = self.gcloud_worker
+        if worker is None or not worker.accepts(command, stdin):
+            return None
+        return await self.loop.run_in_executor(None, worker.execute, command, capture, merge_err, timeout)
+
+    @staticmethod
+    async def _create_process(command, capture, merge_err, has_stdin):
+        stdout = asyncio.subprocess.PIPE if capture else None
+        stderr = (asyncio.subprocess.STDOUT if merge_err else asyncio.subprocess.PIPE) if capture else None
+        stdin = asyncio.subprocess.PIPE if has_stdin else None
+        # on Windows: run through the shell (cmd /c)
+        if os.name == "nt":
+            return await asyncio.create_subprocess_shell(command, stdin=stdin, stdout=stdout, stderr=stderr)
+        # pipelines run in bash (a pipeline fails if any of its stages fails)
+        if is_shell_command(command):
+            return await asyncio.create_subprocess_exec("bash", "-o", "pipefail", "-c", command, stdin=stdin,
+                                                        stdout=stdout, stderr=stderr)
+        return await asyncio.create_subprocess_exec(*shlex.split(command), stdin=stdin, stdout=stdout,
+                                                    stderr=stderr)
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.ProactorEventLoop() if os.name == "nt" else asyncio.new_event_loop()
+            started = threading.Event()
+            self.thread = threading.Thread(target=self._loop_target, args=(started,), name="tfcli-syscall-engine")
+            self.thread.daemon = True
+            self.thread.start()
+            started.wait()
+
+    def _loop_target(self, started):
+        asyncio.set_event_loop(self.loop)
+        self._create_semaphore()
+        self.loop.call_soon(started.set)
+        self.loop.run_forever()
+
+    def _create_semaphore(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+
+# the global engine used by utils.syscall
+engine = SyscallEngine()
+
+
+async def async_syscall(command, capture=True, merge_err=True, timeout=None, stdin=None):
+    """
+    Coroutine executing a command through the global engine (respecting its concurrency limit).
+    Can be awaited from any event loop.
+
+    Args:
+        command (str): The command to execute in the shell.
+        capture (bool): Whether to capture stdout/stderr.
+        merge_err (bool): Whether to merge stderr into stdout.
+        timeout (Optional[float]): The max. number of seconds the command may run before it is killed.
+        stdin (Optional[bytes]): Data to be fed into the command's stdin.
+
+    Returns: The SyscallResult of the command.
+    """
+    future = engine.submit(command, capture=capture, merge_err=merge_err, timeout=timeout, stdin=stdin)
+    return await asyncio.wrap_future(future)
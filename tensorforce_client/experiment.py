@@ -23,7 +23,24 @@ import os.path
 import re
 from warnings import warn
 import tensorforce_client.utils as util
+from tensorforce_client.plan import Plan
+from tensorforce_client.profiling import profiler
 from tensorforce_client.cluster import Cluster, get_cluster_from_string
+from tensorforce_client.gpu_allocation import plan_gpus
+from tensorforce_client.pool import cluster_pool
+from tensorforce_client.recovery import find_latest_checkpoint
+from tensorforce_client.scheduler import Scheduler
+from tensorforce_client.sync import find_missing_files, sync_directory
+
+
+# the default resource requests per container (vCPUs, memory in Gb), used for packing experiments onto clusters
+DEFAULT_RESOURCES = {
+    "worker": {"cpu": 0.5, "memory": 1.5},
+    "ps": {"cpu": 0.25, "memory": 1.0},
+    "remote_env": {"cpu": 0.5, "memory": 1.0}
+}
+# where all experiments' files used to be stored on the nodes (before each experiment got its own directory)
+LEGACY_REMOTE_DIR = "/mnt/stateful_partition/experiment/"
 
 
 class Experiment(object):
@@ -52,6 +69,22 @@ class Experiment(object):
             summary_frequency (str): The frequency with which to save a tensorboard summary.
                 This is a combination of an int and a unit (e.g. "600s"), where unit can be "s" (seconds)
                 or "t" (timesteps). The episode unit (e) is not allowed here.
+            resources (dict): The resources (vCPUs and memory in Gb) to request per container by job
+                ("worker", "ps" and "remote_env"), e.g. {"worker": {"cpu": 2, "memory": 4}}. Jobs or values not
+                given are taken from DEFAULT_RESOURCES. In multi-threaded mode, the worker's vCPUs are requested
+                once per thread.
+            gpus_per_container (int): The number of whole GPUs to request per worker container (default: plan the
+                GPUs of the experiment's cluster, see `get_gpu_plan`). Parameter servers never get GPUs.
+            allow_idle_gpus (bool): Whether to only warn (default) instead of refusing to start when the GPU plan
+                leaves some of the cluster's GPUs idle.
+            allow_gpu_sharing (bool): Whether several workers may share one GPU if there are more workers than GPUs
+                (default: False, refuse to start). Sharing workers run in privileged containers with access to all
+                of their node's devices. Only possible on the experiment's own (dedicated) cluster, see
+                `gpu_allocation`.
+            gpu_topology (dict): The number of nodes and GPUs per node (fields: num_nodes, gpus_per_node and
+                optionally node_pools) to plan the GPUs for (default: those of the experiment's cluster).
+            scale_down_on_pause (bool): Whether pausing the experiment scales its dedicated cluster down to zero
+                nodes (default: True), see `pause`.
         """
         # see whether we have a json (yaml?) file for the experiment
         # TODO: yaml support
@@ -130,6 +163,39 @@ class Experiment(object):
         # status (running, paused, stopped, etc..)
         self.status = kwargs.get("status") or from_json.get("status", None)
 
+        # the resources (and GPUs) to request per container
+        resources = kwargs.get("resources") or from_json.get("resources") or {}
+        self.resources = {job: dict(defaults, **resources.get(job, {})) for job, defaults in DEFAULT_RESOURCES.items()}
+        # None: plan the GPUs of the experiment's cluster (see `get_gpu_plan`)
+        self.gpus_per_container = kwargs.get("gpus_per_container")
+        if self.gpus_per_container is None:
+            self.gpus_per_container = from_json.get("gpus_per_container")
+        self.allow_idle_gpus = kwargs.get("allow_idle_gpus")
+        if self.allow_idle_gpus is None:
+            self.allow_idle_gpus = from_json.get("allow_idle_gpus", True)
+        self.allow_gpu_sharing = kwargs.get("allow_gpu_sharing")
+        if self.allow_gpu_sharing is None:
+            self.allow_gpu_sharing = from_json.get("allow_gpu_sharing", False)
+        self.gpu_topology = kwargs.get("gpu_topology") or from_json.get("gpu_topology")
+
+        # the experiment's own directory on the nodes (mounted as /experiment into its containers), so that several
+        # experiments can share a cluster; experiments started before this existed still use the legacy directory
+        self.remote_dir = kwargs.get("remote_dir") or from_json.get("remote_dir")
+        if not self.remote_dir:
+            self.remote_dir = LEGACY_REMOTE_DIR if self.status in ["running", "paused"] else \
+                "{}{}/".format(LEGACY_REMOTE_DIR, self.name)
+
+        # the lost tasks recreated so far (see `recovery.RecoveryLoop`), each a dict with the fields time, tasks,
+        # reasons, checkpoint, checkpoint_step and lost_seconds
+        self.recoveries = kwargs.get("recoveries") or from_json.get("recoveries") or []
+
+        # whether `pause` may scale the dedicated cluster down to zero nodes and whether it did so (in which case
+        # `start --resume` scales it back up)
+        self.scale_down_on_pause = kwargs.get("scale_down_on_pause")
+        if self.scale_down_on_pause is None:
+            self.scale_down_on_pause = from_json.get("scale_down_on_pause", True)
+        self.scaled_down = kwargs.get("scaled_down") or from_json.get("scaled_down", False)
+
         # json file specific to a certain experiment 'run' (e.g. cluster may differ from experiment's base config)
         self.running_json_file = "experiment_running.json"
 
@@ -148,7 +214,7 @@ class Experiment(object):
         print("+ Writing Experiment's settings to local disk.")
         self.write_json_file(self.path + "experiment.json")
 
-    def setup_cluster(self, cluster, project_id, start=False):
+    def setup_cluster(self, cluster, project_id, start=False, credentials=True):
         """
         Given a cluster name (or None) and a remote project-ID,
         sets up the cluster settings for this Experiment locally.
@@ -158,7 +224,9 @@ class Experiment(object):
             cluster (str): The name of the cluster. If None, will get cluster-spec from the Experiment, or create a
                 default Cluster object.
             project_id (str): The remote gcloud project ID.
-            start (bool): Whether to already create (start) the cluster in the cloud.
+            start (bool): Whether to already create (start) the cluster in the cloud. A dedicated cluster is
+                taken from the cluster pool instead, if the pool has an idle one with matching settings.
+            credentials (bool): Whether to also point kubectl to the cluster (see `setup_credentials`).
 
         Returns: The Cluster object.
 
@@ -179,35 +247,68 @@ class Experiment(object):
             cluster = Cluster(name=self.name_hyphenated)
             self.has_dedicated_cluster = True
 
-        # start cluster if not up yet
+        # check the GPU plan before creating anything
+        self.check_gpu_plan(self.get_gpu_plan(cluster.get_spec()))
+
+        # start cluster if not up yet (preferably take a warm one from the cluster pool)
         if start and not cluster.started:
-            cluster.create()
+            pooled = cluster_pool.claim(cluster, self.name) if self.has_dedicated_cluster else None
+            if pooled:
+                cluster = pooled
+            else:
+                cluster.create()
+            # get the specs again (including the new cluster)
+            clusters = util.get_cluster_specs()
         # cluster up but not in good state
         elif clusters[cluster.name_hyphenated]["status"] != "RUNNING":
             raise util.TFCliError("ERROR: Given cluster {} is not in status RUNNING (but in status {})!".
                                   format(cluster.name_hyphenated, clusters[cluster.name_hyphenated]["status"]))
 
         # check cluster vs experiment setup and warn or abort if something doesn't match
-        if self.run_mode != "distributed" and cluster.num_nodes > 1:
+        if self.run_mode != "distributed" and cluster.num_nodes > 1 and self.has_dedicated_cluster:
             warn("WARNING: Running non-distributed experiment on cluster with more than 1 node. Make sure you are "
                  "not wasting costly resources!")
-        num_gpus = cluster.num_nodes * cluster.gpus_per_node
-        if self.run_mode == "distributed" and self.num_workers + self.num_parameter_servers > num_gpus:
-            warn("WARNING: Running distributed experiment with {} processes total on cluster with only {} GPUs! "
-                 "This could lead to K8s scheduling problems.".
-                 format(self.num_workers + self.num_parameter_servers, num_gpus))
 
-        print("+ Setting up credentials to connect to cluster {}.".format(cluster.name_hyphenated))
-        util.syscall("gcloud container clusters get-credentials {} --zone {} --project {}".
-                     format(cluster.name_hyphenated, cluster.location, project_id))
-
-        print("+ Setting kubectl to point to cluster {}.".format(cluster.name_hyphenated))
-        util.syscall("kubectl config set-cluster {} --server={}".
-                     format(cluster.name_hyphenated, clusters[cluster.name_hyphenated]["master_ip"]))
+        if credentials:
+            with profiler.phase("get-credentials"):
+                self.setup_credentials(cluster, project_id, clusters[cluster.name_hyphenated]["master_ip"])
 
         self.cluster = cluster.get_spec()
+
+        # a shared cluster may already be (partly) used by other experiments
+        if not self.has_dedicated_cluster:
+            others = [e for e in get_running_experiments() if e.name != self.name]
+            # GPUs shared by another experiment's workers look free to Kubernetes
+            sharing = [e.name for e in others if (e.cluster or {}).get("name") == cluster.name and
+                       e.get_gpu_plan().shared_gpus > 0]
+            if sharing and self.get_gpu_plan(cluster.get_spec()).used_gpus > 0:
+                raise util.TFCliError("ERROR: Experiment {} can't use the GPUs of cluster {}, as experiment(s) {} "
+                                      "share them outside of Kubernetes' control!".format(
+                                          self.name, cluster.name_hyphenated, ", ".join(sharing)))
+            capacity = Scheduler(clusters, others).get_cluster(cluster.name_hyphenated)
+            if capacity and not capacity.fits(self.get_pods()):
+                warn("WARNING: Experiment {} does not fit into the free resources of cluster {} (used by {}). Some of "
+                     "its pods may stay pending!".format(self.name, cluster.name_hyphenated,
+                                                         ", ".join(capacity.experiments) or "no other experiment"))
         return cluster
 
+    def setup_credentials(self, cluster, project_id, master_ip=None):
+        """
+        Fetches the credentials for the given (running) cluster and points kubectl to it.
+
+        Args:
+            cluster (Cluster): The Cluster object.
+            project_id (str): The remote gcloud project ID.
+            master_ip (Optional[str]): The IP of the cluster's master. Default: Look it up.
+        """
+        print("+ Setting up credentials to connect to cluster {}.".format(cluster.name_hyphenated))
+        util.cloud_provider().get_credentials(cluster, project_id)
+
+        print("+ Setting kubectl to point to cluster {}.".format(cluster.name_hyphenated))
+        if master_ip is None:
+            master_ip = util.get_cluster_specs()[cluster.name_hyphenated]["master_ip"]
+        util.syscall("kubectl config set-cluster {} --server={}".format(cluster.name_hyphenated, master_ip))
+
     def start(self, project_id, resume=False, cluster=None):
         """
         Starts the Experiment in the cloud (using kubectl).
@@ -220,55 +321,196 @@ class Experiment(object):
                 using the Experiment's own cluster or - if not given either - a default cluster.
         """
 
-        # Update our cluster spec
-        cluster = self.setup_cluster(cluster, project_id, start=False if resume else True)
-        # Rewrite our json file.
-        self.status = "running"
-        self.write_json_file(file=self.path+self.running_json_file)
+        plan = self.get_start_plan(project_id, resume=resume, cluster=cluster)
+        with profiler.phase(plan.name):
+            plan.run()
+        if profiler.enabled:
+            path, total = plan.critical_path()
+            print("+ Critical path ({:.1f}s): {}".format(total, " -> ".join(s.name for s in path)))
 
-        # Render the k8s yaml config file for the experiment.
-        print("+ Generating experiment's k8s config file.")
-        #gpus_per_container = 0
-        if self.run_mode == "distributed":
-            gpus_per_container = int(cluster.num_gpus /
-                                     (self.num_workers + self.num_parameter_servers))
-        else:
-            gpus_per_container = cluster.gpus_per_node
-        util.write_kubernetes_yaml_file(self, self.k8s_config, gpus_per_container)
-        print("+ Deleting old Kubernetes Workloads.")
-        _ = util.syscall("kubectl delete -f {}".format(self.k8s_config), return_outputs="as_str")
+    def get_start_plan(self, project_id, resume=False, cluster=None):
+        """
+        Returns the Plan for starting the Experiment (see `start` for the args). Steps that don't depend on each
+        other (e.g. copying files to the nodes and deleting old Kubernetes workloads) run concurrently.
+
+        Returns: The Plan object.
+        """
+        plan = Plan("experiment.start")
+        # the Cluster object (once set up)
+        state = {}
+
+        # the experiment's paused cluster has no nodes left (see `pause`)
+        scale_up = resume and self.scaled_down and not cluster
+
+        def setup_cluster():
+            # Update our cluster spec
+            state["cluster"] = self.setup_cluster(cluster, project_id, start=False if resume else True,
+                                                  credentials=False)
+            if scale_up:
+                state["cluster"].scale_up()
+                self.scaled_down = False
+                # (now with the nodes' status)
+                self.cluster = state["cluster"].get_spec()
+
+        def get_credentials():
+            self.setup_credentials(state["cluster"], project_id)
+
+        def write_json():
+            # Rewrite our json file.
+            self.status = "running"
+            self.write_json_file(file=self.path+self.running_json_file)
+
+        def render_yaml():
+            # Render the k8s yaml config file for the experiment (resumed experiments restore their model).
+            print("+ Generating experiment's k8s config file.")
+            self.write_k8s_config(state["cluster"], load=resume)
+
+        def delete_old_workloads():
+            print("+ Deleting old Kubernetes Workloads.")
+            # fails (w/o retrying) if there are no old workloads
+            util.syscall_with_retry("kubectl delete -f {}".format(self.k8s_config), raise_on_error=False)
 
         # TODO: wipe out previous experiments' results
 
-        # Copy all required files to all nodes' disks.
+        def copy_files():
+            self.prepare_nodes(state["cluster"])
+
+        def restore_checkpoint():
+            # the new nodes come with empty disks
+            self.restore_checkpoint(state["cluster"])
+
+        def create_workloads():
+            # Create kubernetes services (which will start the experiment).
+            print("+ Creating new Kubernetes Services and ReplicaSets.")
+            print(util.syscall_with_retry("kubectl create -f {}".format(self.k8s_config)).output)
+
+        plan.add("setup-cluster", setup_cluster, estimate=5.0 if (resume and not scale_up) or cluster else 240.0,
+                 description="Look up the cluster (create it, if not running yet{}).".
+                 format("; scale it back up from zero nodes" if scale_up else ""))
+        plan.add("get-credentials", get_credentials, ["setup-cluster"], estimate=4.0,
+                 description="Point kubectl to the cluster.")
+        plan.add("write-json", write_json, ["setup-cluster"], estimate=0.0,
+                 description="Write the experiment's running json file.")
+        plan.add("render-yaml", render_yaml, ["setup-cluster"], estimate=0.0,
+                 description="Render the k8s yaml config file.")
+        plan.add("delete-old-workloads", delete_old_workloads, ["get-credentials", "render-yaml"], estimate=2.0,
+                 description="kubectl delete (old workloads).")
+        plan.add("copy-files", copy_files, ["write-json"], estimate=15.0,
+                 description="Prepare all nodes' disks and copy the json file (ssh/scp).")
+        if scale_up:
+            plan.add("restore-checkpoint", restore_checkpoint, ["copy-files"], estimate=10.0,
+                     description="Copy the latest (downloaded) checkpoint onto all nodes.")
+        plan.add("create-workloads", create_workloads,
+                 ["delete-old-workloads", "restore-checkpoint" if scale_up else "copy-files"], estimate=2.0,
+                 description="kubectl create (starts the experiment).")
+        return plan
+
+    def write_k8s_config(self, cluster, file=None, only_tasks=None, load=False):
+        """
+        Renders the Experiment's k8s yaml config file for the given cluster (see `util.write_kubernetes_yaml_file`).
+
+        Args:
+            cluster (Cluster): The (running) cluster the Experiment runs on.
+            file (Optional[str]): The file to write (default: the Experiment's `k8s_config`).
+            only_tasks (Optional[List[str]]): Only render these tasks ("[job]-[task index]").
+            load (bool): Whether the workers should restore the model from the latest checkpoint.
+        """
+        gpu_plan = self.get_gpu_plan()
+        node_pools = {job: self.get_node_pool(job) for job in ["worker", "ps"]}
+        util.write_kubernetes_yaml_file(self, file or self.k8s_config, node_pools=node_pools,
+                                        gpu_plan=gpu_plan.render(cluster.get_pool_nodes(node_pools["worker"])),
+                                        only_tasks=only_tasks, load=load)
+
+    def prepare_nodes(self, cluster):
+        """
+        Copies all required files to all nodes' disks (creates the experiment's directory, makes it writable and
+        copies the experiment's running json file into it).
+
+        Args:
+            cluster (Cluster): The (running) cluster the Experiment runs on.
+        """
         print("+ Copying all necessary config files to all nodes ...")
+        cluster.ssh_parallel(
+            "sudo mount --make-shared /mnt/stateful_partition/",  # make partition shared
+            "sudo mkdir -p {} ; ".format(self.remote_dir) +  # create experiment dir
+            "sudo chmod -R 0777 {}".format(self.remote_dir),  # make writable
+            # copy experiment's json file into new dir
+            [self.path+self.running_json_file, "_NODE_:{}.".format(self.remote_dir)],
+            # one ssh round trip per node
+            silent=False, batch=True)
+
+    def restore_checkpoint(self, cluster):
+        """
+        Copies the latest checkpoint found in the Experiment's local results (see `download`) onto all nodes.
 
-        # - create /experiment directory on primary disk
-        # - change permissions on the experiment's folder
-        # - copy experiment-running config file into /experiment directory
-        cluster.ssh_parallel("sudo mount --make-shared /mnt/stateful_partition/",  # make partition shared
-                             "sudo mkdir /mnt/stateful_partition/experiment/ ; "  # create experiment dir
-                             "sudo chmod -R 0777 /mnt/stateful_partition/experiment/",  # make writable
-                             # copy experiment's json file into new dir
-                             [self.path+self.running_json_file, "_NODE_:/mnt/stateful_partition/experiment/."],
-                             silent=False)
+        Args:
+            cluster (Cluster): The (running) cluster the Experiment runs on.
 
-        # Create kubernetes services (which will start the experiment).
-        print("+ Creating new Kubernetes Services and ReplicaSets.")
-        util.syscall("kubectl create -f {}".format(self.k8s_config))
+        Returns: The checkpoint (tuple of its local directory, global step and time, see
+            `recovery.find_latest_checkpoint`) or None if there is none.
+        """
+        checkpoint = find_latest_checkpoint(self.path + "results/")
+        if checkpoint:
+            print("+ Restoring checkpoint {} (step {}) onto all nodes ...".format(checkpoint[0], checkpoint[1]))
+            cluster.broadcast(checkpoint[0], self.remote_dir)
+        else:
+            print("WARNING: No checkpoint of experiment {} found. Its model starts from scratch.".format(self.name))
+        return checkpoint
 
-    def pause(self, project_id):
+    def recreate_tasks(self, cluster, tasks, load=True):
         """
-        Pauses the already running Experiment.
+        Replaces the Kubernetes Services and Jobs of the given tasks by new ones (e.g. after their pods got lost).
+
+        Args:
+            cluster (Cluster): The (running) cluster the Experiment runs on.
+            tasks (List[str]): The tasks to recreate ("[job]-[task index]").
+            load (bool): Whether the recreated workers should restore the model from the latest checkpoint.
+        """
+        file = re.sub(r'\.yaml$', "", self.k8s_config) + ".recovery.yaml"
+        self.write_k8s_config(cluster, file=file, only_tasks=tasks, load=load)
+        print("+ Recreating Kubernetes Services and Jobs of {}.".format(", ".join(tasks)))
+        util.syscall_with_retry("kubectl replace --force -f {}".format(file))
+
+    def pause(self, project_id, scale_down=None):
+        """
+        Pauses the already running Experiment. Its dedicated cluster (if not used by other experiments) is scaled
+        down to zero nodes, after the results (incl. the model checkpoints) have been downloaded, since the nodes'
+        disks go away with the nodes. `start --resume` scales the cluster back up and restores the latest
+        checkpoint.
 
         Args:
             project_id (str): The remote gcloud project-ID.
+            scale_down (Optional[bool]): Whether to scale a dedicated cluster down to zero nodes (default: the
+                Experiment's `scale_down_on_pause`).
         """
-        _ = self.setup_cluster(cluster=None, project_id=project_id)
+        dedicated = self.has_dedicated_cluster
+        cluster = self.setup_cluster(cluster=None, project_id=project_id)
+        self.has_dedicated_cluster = dedicated
         # delete the kubernetes workloads
         print("+ Deleting Kubernetes Workloads.")
         util.syscall("kubectl delete -f {}".format(self.k8s_config))
 
+        if scale_down is None:
+            scale_down = self.scale_down_on_pause
+        others = [e.name for e in get_running_experiments() if e.name != self.name and
+                  e.cluster.get("name", "").replace("_", "-") == cluster.name_hyphenated]
+        if scale_down and self.has_dedicated_cluster and not others and not self.scaled_down:
+            try:
+                self.download()
+                # the nodes' disks go away with the nodes: make sure we have everything
+                missing = find_missing_files(cluster, self.get_remote_results_dir(), self.path + "results/")
+                if missing:
+                    raise util.TFCliError("{} file(s) not downloaded (e.g. {})".format(len(missing), missing[0]))
+            except util.TFCliError as e:
+                warn("WARNING: Keeping the nodes of cluster {} (could not download all results: {}).".
+                     format(cluster.name_hyphenated, e))
+            else:
+                cluster.scale_to_zero()
+                self.scaled_down = True
+        elif scale_down and others:
+            print("+ Keeping the nodes of cluster {} (still used by {}).".format(cluster.name_hyphenated,
+                                                                                ", ".join(others)))
+
         self.status = "paused"
         self.write_json_file(file=self.path+self.running_json_file)
 
@@ -289,28 +531,159 @@ class Experiment(object):
             self.download()
         if self.status == "stopped":
             warn("WARNING: Experiment seems to be stopped already. Trying anyway. ...")
-        # figure out whether cluster was created along with experiment
+        # figure out whether cluster was created along with experiment (and is not used by other experiments
+        # packed onto it in the meantime)
         # if yes: shut down cluster
-        if self.has_dedicated_cluster:
+        cluster_name = self.cluster.get("name", "").replace("_", "-")
+        others = [e.name for e in get_running_experiments() if e.name != self.name and
+                  e.cluster.get("name", "").replace("_", "-") == cluster_name]
+        if self.has_dedicated_cluster and not others:
             cluster = get_cluster_from_string(self.cluster.get("name"))
             print("+ Shutting down experiment's cluster {}.".format(cluster.name_hyphenated))
             cluster.delete()
         # if not: simply stop k8s jobs
         else:
+            if others:
+                print("+ Keeping cluster {} (still used by {}).".format(cluster_name, ", ".join(others)))
             print("+ Deleting Kubernetes Workloads.")
             _ = util.syscall("kubectl delete -f {}".format(self.k8s_config), return_outputs=True)
 
         self.status = "stopped"
         self.write_json_file(file=self.path+self.running_json_file)
 
-    def download(self):
+    def download(self, incremental=True, compression=None):
         """
         Downloads the experiment's results (model checkpoints and tensorboard summary files) so far.
+
+        Args:
+            incremental (bool): Whether to only download new or changed files (and only the new parts of
+                tensorboard event files) since the last download (default: True). If False, downloads
+                everything again.
+            compression (Optional[str]): The compression to use for the transfers: "zstd", "gzip" or "none"
+                (default: the best one available locally).
+        """
+        remote_dir = self.get_remote_results_dir()
+        with profiler.phase("experiment.download"):
+            with profiler.phase("get-cluster"):
+                cluster = get_cluster_from_string(self.cluster.get("name"))
+            with profiler.phase("copy-results"):
+                if incremental:
+                    stats = sync_directory(cluster, remote_dir, self.path+"results/", compression=compression)
+                    print("+ Synced results: {}.".format(stats.describe()))
+                else:
+                    stats = cluster.download(remote_dir, self.path+"results/", compression=compression,
+                                             conflict_dir=self.path+"conflicts/")
+                    print("+ Downloaded results: {}.".format(stats.describe()))
+
+    def get_remote_results_dir(self):
+        """
+        Returns: The directory on the nodes that holds the Experiment's results (the contents of the local
+            results directory).
+        """
+        return "{}{}".format(self.remote_dir, "results/" if self.run_mode != "distributed" else "")
+
+    def get_container_resources(self):
+        """
+        Returns: Dict of the resources (vCPUs and memory in Gb) to request for each container by job ("worker",
+            "ps" and "remote_env").
+        """
+        resources = {job: dict(r) for job, r in self.resources.items()}
+        # the multi-threaded runner runs all workers in one container
+        if self.run_mode == "multi-threaded":
+            resources["worker"]["cpu"] *= self.num_workers
+        return resources
+
+    def get_pods(self):
+        """
+        Returns: List of the Experiment's pods (one per Kubernetes Job) as dicts with the fields name, cpu, memory
+            (in Gb) and gpus, each summing up the requests of all the pod's containers, and node_pool (see
+            `get_node_pool`).
+        """
+        resources = self.get_container_resources()
+        num_remote_envs = 0
+        if self.environment.get("remote"):
+            num_remote_envs = self.num_workers if self.run_mode == "multi-threaded" else 1
+        jobs = [("worker", self.num_workers), ("ps", self.num_parameter_servers)] if self.run_mode == "distributed"\
+            else [("worker", 1)]
+        gpu_plan = self.get_gpu_plan()
+        pods = []
+        for job, num_tasks in jobs:
+            for task in range(num_tasks):
+                pods.append({
+                    "name": "{}-{}-{}".format(self.name_hyphenated, job, task),
+                    "cpu": resources[job]["cpu"] + num_remote_envs * resources["remote_env"]["cpu"],
+                    "memory": resources[job]["memory"] + num_remote_envs * resources["remote_env"]["memory"],
+                    "gpus": gpu_plan.get(job, task)["share"],
+                    "node_pool": self.get_node_pool(job)
+                })
+        return pods
+
+    def get_node_pool(self, job, cluster_spec=None):
         """
-        cluster = get_cluster_from_string(self.cluster.get("name"))
-        cluster.ssh_parallel(["_NODE_:/mnt/stateful_partition/experiment/{}*".
-                             format("results/" if self.run_mode != "distributed" else ""),
-                              self.path+"results/."])
+        Returns: The name of the node pool that the given job's pods are pinned to (None if they may run on any
+            node, e.g. on clusters with only one node pool). Remote-env containers run in their worker's pod.
+
+        Args:
+            job (str): The job ("worker" or "ps").
+            cluster_spec (Optional[dict]): The cluster's spec (default: the Experiment's cluster).
+        """
+        node_pools = (cluster_spec or self.cluster or {}).get("node_pools") or []
+        if len(node_pools) < 2:
+            return None
+        pool = next((p for p in node_pools if job in (p.get("jobs") or [])), None)
+        # by default, workers (the only ones getting GPUs) go onto the GPU nodes and parameter servers don't
+        if pool is None:
+            pool = next((p for p in node_pools if ((p.get("gpus_per_node") or 0) > 0) == (job == "worker")), None)
+        return pool["name"] if pool else None
+
+    def get_gpu_plan(self, cluster_spec=None):
+        """
+        Returns: The GpuPlan (which task gets which GPUs, see `gpu_allocation.plan_gpus`) of this Experiment on the
+            cluster with the given spec.
+
+        Args:
+            cluster_spec (Optional[dict]): The cluster's spec (default: the Experiment's `gpu_topology`, if set,
+                else its cluster).
+        """
+        topology = cluster_spec or self.gpu_topology or self.cluster or {}
+        # only the GPUs of the workers' node pool count
+        pool_name = self.get_node_pool("worker", topology)
+        topology = next((p for p in topology.get("node_pools") or [] if p["name"] == pool_name), topology)
+        return plan_gpus(self.run_mode, self.num_workers, self.num_parameter_servers,
+                         num_nodes=topology.get("num_nodes") or 0, gpus_per_node=topology.get("gpus_per_node") or 0,
+                         gpus_per_worker=self.gpus_per_container)
+
+    def check_gpu_plan(self, gpu_plan):
+        """
+        Refuses GPU plans that share GPUs between workers, unless `allow_gpu_sharing` is set and the experiment
+        has its own (dedicated) cluster (otherwise, other pods could be placed onto the shared GPUs, as Kubernetes
+        doesn't know about them). Warns about (or - if `allow_idle_gpus` is False - refuses) GPU plans that leave
+        some GPUs idle.
+
+        Args:
+            gpu_plan (GpuPlan): The plan to check.
+
+        Raises:
+            TFCliError: If the plan is not acceptable.
+        """
+        if gpu_plan.shared_gpus > 0:
+            message = "Experiment {} has more workers ({}) than GPUs ({}), so several workers would have to share " \
+                      "one GPU".format(self.name, self.num_workers, gpu_plan.num_gpus)
+            if not self.has_dedicated_cluster:
+                raise util.TFCliError("ERROR: {}, which is only possible on the experiment's own cluster (Kubernetes "
+                                      "doesn't know about shared GPUs and would place other pods onto them)!".
+                                      format(message))
+            if not self.allow_gpu_sharing:
+                raise util.TFCliError("ERROR: {}. Sharing workers run in privileged containers (with access to all "
+                                      "of their node's devices). Set `allow_gpu_sharing` to start it anyway, or "
+                                      "reduce `num_workers` or set `gpus_per_container`.".format(message))
+        if gpu_plan.idle_gpus == 0:
+            return
+        message = "Experiment {} would only use {} of the cluster's {} GPUs (see `num_workers` and " \
+                  "`gpus_per_container`)!".format(self.name, gpu_plan.used_gpus, gpu_plan.num_gpus)
+        if not self.allow_idle_gpus:
+            raise util.TFCliError("ERROR: " + message + " Set `allow_idle_gpus` to start it anyway.")
+        warn("WARNING: " + message)
 
     def write_json_file(self, file=None):
         """
@@ -351,6 +724,21 @@ def get_experiment_from_string(experiment, running=False):
     return exp_obj
 
 
+def get_running_experiments():
+    """
+    Returns: A list of all local Experiment objects whose running json file says they are running right now.
+    """
+    if not os.path.isdir("experiments/"):
+        return []
+    experiments = []
+    for name in sorted(os.listdir("experiments/")):
+        if os.path.isfile("experiments/{}/experiment_running.json".format(name)):
+            experiment = get_experiment_from_string(name, running=True)
+            if experiment.status == "running":
+                experiments.append(experiment)
+    return experiments
+
+
 def get_local_experiments(as_objects=False):
     """
     Args:
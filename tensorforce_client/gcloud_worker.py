@@ -0,0 +1,261 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Warm gcloud workers: long-lived helper processes that load the gcloud CLI (and its credentials) only once and then
+execute many gcloud commands in-process. This saves the SDK's start-up time (often more than 1s) for every
+single `gcloud ...` call. Enabled via `tfcli --gcloud-workers [N]` (see `utils.enable_gcloud_worker`); all
+`utils.syscall` calls for gcloud commands are then routed through the workers. Commands that can't run
+in-process (interactive ones, ssh/scp, shell constructs) as well as all other executables still use subprocesses.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from six.moves import queue
+
+from tensorforce_client.cache import inventory_cache
+from tensorforce_client.engine import SyscallResult
+
+
+# the server script (run with the SDK's python)
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gcloud_worker_server.py")
+
+# gcloud (sub-)commands that must not run inside a worker (interactive or long-lived terminal sessions)
+EXCLUDED_COMMANDS = ["compute ssh", "compute scp", "compute connect-to-serial-port", "auth login", "init",
+                     "components", "interactive", "alpha interactive", "beta interactive"]
+
+
+class GCloudWorkerError(Exception):
+    def __init__(self, message, sent=False):
+        """
+        Args:
+            message (str): The error message.
+            sent (bool): Whether the command had already been sent to the worker (so it may have been executed).
+        """
+        super(GCloudWorkerError, self).__init__(message)
+        self.sent = sent
+
+
+class GCloudWorker(object):
+    """
+    Client for a single worker process. Executes one command at a time.
+    """
+
+    def __init__(self, sdk_root, python, startup_timeout=120):
+        """
+        Args:
+            sdk_root (str): The root dir of the Cloud SDK installation.
+            python (str): The python executable to run the worker with (the one the SDK uses).
+            startup_timeout (float): The max. number of seconds to wait for the worker to load the gcloud CLI.
+        """
+        self.sdk_root = sdk_root
+        self.python = python
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.next_id = 0
+
+    def start(self):
+        self.process = subprocess.Popen([self.python, SERVER_SCRIPT, self.sdk_root], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=open(os.devnull, "w"),
+                                        universal_newlines=True, bufsize=1)
+        answer = self._read(self.startup_timeout)
+        if not answer.get("ready"):
+            self.close()
+            raise GCloudWorkerError("gcloud worker did not come up: {}".format(answer))
+
+    def execute(self, args, timeout=None):
+        """
+        Executes one gcloud command in the worker.
+
+        Args:
+            args (List[str]): The command line args (w/o the leading `gcloud`).
+            timeout (Optional[float]): The max. number of seconds the command may take. The worker is killed
+                if it takes longer.
+
+        Returns: Dict with the keys returncode (int), stdout (str) and stderr (str).
+        """
+        self.next_id += 1
+        try:
+            self.process.stdin.write(json.dumps({"id": self.next_id, "args": args}) + "\n")
+            self.process.stdin.flush()
+        except (IOError, OSError, ValueError) as e:
+            self.close()
+            raise GCloudWorkerError("Could not send command to gcloud worker: {}".format(e))
+        try:
+            return self._read(timeout)
+        except GCloudWorkerError as e:
+            e.sent = True
+            raise
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+        self.process = None
+
+    def _read(self, timeout):
+        # a timer kills the worker (and thereby ends the blocking readline) if the answer takes too long
+        timer = None if timeout is None else threading.Timer(timeout, self.process.kill)
+        if timer:
+            timer.start()
+        try:
+            line = self.process.stdout.readline()
+        finally:
+            if timer:
+                timer.cancel()
+        if not line:
+            self.close()
+            raise GCloudWorkerError("gcloud worker died")
+        return json.loads(line)
+
+
+class GCloudWorkerPool(object):
+    """
+    A set of (lazily started) gcloud workers. Hands out one idle worker per command, so up to `size` gcloud
+    commands can run at the same time. If the workers can't be started (e.g. an SDK layout we don't know), the
+    pool disables itself and all commands go back to being executed as subprocesses.
+    """
+
+    def __init__(self, size=1, sdk_root=None, python=None):
+        """
+        Args:
+            size (int): The max. number of worker processes.
+            sdk_root (Optional[str]): The root dir of the Cloud SDK. Default: Ask `gcloud info`.
+            python (Optional[str]): The python executable the SDK uses. Default: Ask `gcloud info`.
+        """
+        self.size = size
+        self.sdk_root = sdk_root
+        self.python = python
+        self.idle = queue.Queue()
+        self.workers = []
+        self.disabled = False
+        self.lock = threading.Lock()
+
+    def accepts(self, command, stdin=None):
+        """
+        Returns: Whether the given command can be executed by a worker.
+        """
+        if self.disabled or stdin is not None or any(c in command for c in "|&;<>`$"):
+            return False
+        words = command.split()
+        if not words or words[0] not in ("gcloud", "gcloud.cmd"):
+            return False
+        sub_command = " ".join(w for w in words[1:] if not w.startswith("-")) + " "
+        return not any(sub_command.startswith(e + " ") for e in EXCLUDED_COMMANDS)
+
+    def execute(self, command, capture=True, merge_err=True, timeout=None):
+        """
+        Executes an (accepted) gcloud command in one of the workers.
+
+        Args:
+            command (str): The full command (incl. the leading `gcloud`).
+            capture (bool): Whether to capture the outputs. If False, they are written to our stdout/stderr.
+            merge_err (bool): Whether to merge stderr into stdout (only if capture is True).
+            timeout (Optional[float]): The max. number of seconds the command may run.
+
+        Returns: The SyscallResult of the command or None if no worker was available or the worker died before
+            the command was sent to it (the caller should then execute the command as a subprocess). Commands
+            that may have (partially) run before their worker died are not repeated, they fail.
+        """
+        worker = self._acquire()
+        if worker is None:
+            return None
+        start = time.time()
+        try:
+            answer = worker.execute(shlex.split(command)[1:], timeout)
+        except GCloudWorkerError as e:
+            with self.lock:
+                self.workers.remove(worker)
+            if not e.sent:
+                return None
+            if timeout is not None and time.time() - start >= timeout:
+                return SyscallResult(command, None, duration=time.time() - start, timed_out=True)
+            answer = {"returncode": 1, "stdout": "", "stderr": "ERROR: (gcloud) {} while executing the command.\n".
+                      format(e)}
+        else:
+            self.idle.put(worker)
+
+        stdout = answer["stdout"].encode("utf-8")
+        stderr = answer["stderr"].encode("utf-8")
+        if not capture:
+            sys.stdout.write(answer["stdout"])
+            sys.stderr.write(answer["stderr"])
+            return SyscallResult(command, answer["returncode"], duration=time.time() - start,
+                                 output_bytes=len(stdout) + len(stderr))
+        if merge_err:
+            stdout, stderr = stdout + stderr, None
+        return SyscallResult(command, answer["returncode"], stdout, stderr, duration=time.time() - start)
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                if self.disabled:
+                    return None
+                worker = None
+                if len(self.workers) < self.size:
+                    worker = GCloudWorker(None, None)
+                    self.workers.append(worker)
+            if worker is None:
+                # wait for a worker to become idle (re-check every now and then in case workers died meanwhile)
+                try:
+                    return self.idle.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+            try:
+                worker.sdk_root, worker.python = self._locate_sdk()
+                worker.start()
+            except (GCloudWorkerError, subprocess.CalledProcessError, OSError, ValueError, IndexError) as e:
+                print("WARNING: Could not start gcloud worker ({}). Running gcloud commands as separate "
+                      "processes.".format(e))
+                with self.lock:
+                    self.disabled = True
+                    self.workers.remove(worker)
+                return None
+            return worker
+
+    def _locate_sdk(self):
+        if self.sdk_root is None or self.python is None:
+            info = inventory_cache.get("sdk")
+            if info is None:
+                out = subprocess.check_output(
+                    'gcloud info --format "value(installation.sdk_root,basic.python_location)"', shell=True)
+                info = out.decode("latin-1").strip().split("\t")
+                inventory_cache.set("sdk", "", info)
+            self.sdk_root = self.sdk_root or info[0]
+            self.python = self.python or info[1]
+        return self.sdk_root, self.python
@@ -0,0 +1,90 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+The server side of a warm gcloud worker (see `gcloud_worker.GCloudWorker`).
+This script is run with the Cloud SDK's own python interpreter (which may be python2) and must therefore only use
+the standard library. It loads the gcloud CLI once and then executes gcloud commands (received as json lines on
+stdin) in-process, answering with one json line (return code and outputs) per command on stdout.
+
+Usage:
+    [SDK python] gcloud_worker_server.py [SDK root dir]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import os
+import sys
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def reset_gcloud_log(out, err):
+    # gcloud's log module holds on to the streams it was set up with
+    try:
+        from googlecloudsdk.core import log
+        log.Reset(stdout=out, stderr=err)
+    except (ImportError, AttributeError, TypeError):
+        pass
+
+
+def serve(sdk_root):
+    sys.path.insert(0, os.path.join(sdk_root, "lib"))
+    # keep our answer channel clear of anything gcloud (or its child processes) might write to fd 1
+    channel = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    from googlecloudsdk import gcloud_main
+    cli = gcloud_main.CreateCLI([])
+    channel.write(json.dumps({"ready": True}) + "\n")
+    channel.flush()
+
+    stdout, stderr = sys.stdout, sys.stderr
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        request = json.loads(line)
+        out, err = StringIO(), StringIO()
+        sys.stdout, sys.stderr = out, err
+        reset_gcloud_log(out, err)
+        returncode = 0
+        try:
+            cli.Execute(request["args"])
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            err.write("ERROR: (gcloud worker) {}\n".format(e))
+            returncode = 1
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            reset_gcloud_log(stdout, stderr)
+        channel.write(json.dumps({
+            "id": request.get("id"),
+            "returncode": returncode,
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue()
+        }) + "\n")
+        channel.flush()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
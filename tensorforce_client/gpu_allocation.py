@@ -0,0 +1,147 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Plans which of an experiment's tasks get which GPUs: Only workers get GPUs (parameter servers just hold and update
+variables). If there are at least as many GPUs as workers, each worker gets the same number of whole GPUs (as many
+as still fit onto one node for all workers). If there are more workers than GPUs, several workers share one GPU:
+The workers are spread round-robin over all nodes' GPUs (so that neighbouring workers land on different nodes) and
+each gets the matching fraction of its GPU's memory (a worker that ends up alone on its GPU requests it as a whole
+GPU). Kubernetes can only hand out whole GPUs, so sharing workers don't request any GPU from Kubernetes but are
+pinned to their node and see the GPU through the node's NVIDIA driver (mounted into their - privileged - container).
+
+Sharing thus has a price: The sharing workers run with full (root) access to their node, including all of its
+devices, and Kubernetes doesn't know that their GPUs are in use, so it would happily place other pods requesting
+GPUs onto them (which then run out of GPU memory). Experiments only share GPUs when explicitly allowed to
+(`allow_gpu_sharing`) and only on their own (dedicated) cluster (see `Experiment.check_gpu_plan`).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import math
+
+
+# share of a GPU's memory not handed out to the workers sharing the GPU (CUDA context, fragmentation)
+GPU_MEMORY_HEADROOM = 0.05
+
+
+class GpuPlan(object):
+    """
+    The GPUs of each task ("[job]-[task index]") of an experiment.
+    """
+
+    def __init__(self, num_gpus):
+        """
+        Args:
+            num_gpus (int): The total number of GPUs available to the experiment.
+        """
+        self.num_gpus = num_gpus
+        # dicts by task name with the fields:
+        # gpus (whole GPUs to request from Kubernetes), share (share of a GPU for sharing tasks, else gpus),
+        # shared_gpu (index of the shared GPU on its node or None), node (the node index of a sharing task),
+        # memory_fraction (the share of the GPU's memory a sharing task may use)
+        self.tasks = {}
+
+    def add(self, task, gpus=0, shared_gpu=None, node=None, share=None, memory_fraction=None):
+        self.tasks[task] = {"gpus": gpus, "share": share if share is not None else gpus, "shared_gpu": shared_gpu,
+                            "node": node, "memory_fraction": memory_fraction}
+
+    def get(self, job, task):
+        """
+        Returns: The GPU dict (see `tasks`) of the given task.
+        """
+        return self.tasks.get("{}-{}".format(job, task), {"gpus": 0, "share": 0, "shared_gpu": None, "node": None,
+                                                         "memory_fraction": None})
+
+    @property
+    def used_gpus(self):
+        """
+        Returns: The number of GPUs used by at least one task.
+        """
+        return sum(t["gpus"] for t in self.tasks.values()) + self.shared_gpus
+
+    @property
+    def shared_gpus(self):
+        """
+        Returns: The number of GPUs shared by several tasks (outside of Kubernetes' control).
+        """
+        return len(set((t["node"], t["shared_gpu"]) for t in self.tasks.values() if t["shared_gpu"] is not None))
+
+    @property
+    def idle_gpus(self):
+        return max(self.num_gpus - self.used_gpus, 0)
+
+    def render(self, node_names=None):
+        """
+        Returns: Dict of the tasks' GPU settings (for the k8s yaml template) with the sharing tasks' node indices
+            replaced by the given node names (None if the node names are not known).
+
+        Args:
+            node_names (Optional[List[str]]): The names of the cluster's (GPU) nodes.
+        """
+        rendered = {}
+        for name, t in self.tasks.items():
+            rendered[name] = dict(t, node=node_names[t["node"]] if node_names and t["node"] is not None and
+                                  t["node"] < len(node_names) else None)
+        return rendered
+
+
+def plan_gpus(run_mode, num_workers, num_parameter_servers, num_nodes, gpus_per_node, gpus_per_worker=None):
+    """
+    Args:
+        run_mode (str): The experiment's run mode (single, multi-threaded or distributed).
+        num_workers (int): The number of workers.
+        num_parameter_servers (int): The number of parameter servers (only for run mode distributed).
+        num_nodes (int): The number of nodes of the cluster.
+        gpus_per_node (int): The number of GPUs per node.
+        gpus_per_worker (Optional[int]): A fixed number of whole GPUs per worker (no sharing). None for planning
+            (see module docstring).
+
+    Returns: The GpuPlan.
+    """
+    plan = GpuPlan(num_nodes * gpus_per_node)
+    # one container runs all workers (and gets all GPUs of its node)
+    if run_mode != "distributed":
+        plan.add("worker-0", gpus=gpus_per_worker if gpus_per_worker is not None else gpus_per_node)
+        return plan
+
+    for task in range(num_parameter_servers):
+        plan.add("ps-{}".format(task))
+
+    if gpus_per_worker is not None or plan.num_gpus == 0:
+        for task in range(num_workers):
+            plan.add("worker-{}".format(task), gpus=gpus_per_worker or 0)
+    # enough GPUs: the most whole GPUs per worker that still fit onto one node for all workers
+    elif num_workers <= plan.num_gpus:
+        gpus = max(k for k in range(1, gpus_per_node + 1) if num_nodes * (gpus_per_node // k) >= num_workers)
+        for task in range(num_workers):
+            plan.add("worker-{}".format(task), gpus=gpus)
+    # more workers than GPUs: share the GPUs (round-robin over the nodes first)
+    else:
+        slots = [(node, gpu) for gpu in range(gpus_per_node) for node in range(num_nodes)]
+        counts = [0] * len(slots)
+        for task in range(num_workers):
+            counts[task % len(slots)] += 1
+        for task in range(num_workers):
+            slot = task % len(slots)
+            node, gpu = slots[slot]
+            if counts[slot] == 1:
+                plan.add("worker-{}".format(task), gpus=1)
+                continue
+            plan.add("worker-{}".format(task), shared_gpu=gpu, node=node, share=1.0 / counts[slot],
+                     memory_fraction=math.floor((1.0 - GPU_MEMORY_HEADROOM) / counts[slot] * 100) / 100)
+    return plan
@@ -0,0 +1,119 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+The resources (vCPUs and memory) and prices of google compute engine machine types and GPUs (see
+https://cloud.google.com/compute/docs/machine-types and https://cloud.google.com/compute/pricing).
+Prices are the on-demand prices (USD per hour) in us-central1 and can be overridden (or extended) by a local price
+table (see `load_price_table`).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import re
+import tensorforce_client.utils as util
+
+
+# tuples of (vCPUs, memory in Gb) by predefined machine type
+MACHINE_TYPES = {
+    "f1-micro": (0.2, 0.6),
+    "g1-small": (0.5, 1.7)
+}
+# USD per hour by predefined machine type
+MACHINE_TYPE_PRICES = {
+    "f1-micro": 0.0076,
+    "g1-small": 0.0257
+}
+for _cpus in [1, 2, 4, 8, 16, 32, 64, 96]:
+    MACHINE_TYPES["n1-standard-{}".format(_cpus)] = (_cpus, 3.75 * _cpus)
+    MACHINE_TYPE_PRICES["n1-standard-{}".format(_cpus)] = 0.0475 * _cpus
+    if _cpus > 1:
+        MACHINE_TYPES["n1-highmem-{}".format(_cpus)] = (_cpus, 6.5 * _cpus)
+        MACHINE_TYPE_PRICES["n1-highmem-{}".format(_cpus)] = 0.0592 * _cpus
+        MACHINE_TYPES["n1-highcpu-{}".format(_cpus)] = (_cpus, 0.9 * _cpus)
+        MACHINE_TYPE_PRICES["n1-highcpu-{}".format(_cpus)] = 0.03545 * _cpus
+# USD per hour per vCPU and per Gb of memory of custom machine types
+CUSTOM_CPU_PRICE = 0.033174
+CUSTOM_MEMORY_PRICE = 0.004446
+
+# USD per hour and max. number per node by GPU type
+GPU_TYPES = {
+    "nvidia-tesla-k80": {"price": 0.45, "max_per_node": 8},
+    "nvidia-tesla-p100": {"price": 1.46, "max_per_node": 4},
+    "nvidia-tesla-v100": {"price": 2.48, "max_per_node": 8}
+}
+
+
+def get_machine_type_resources(machine_type):
+    """
+    Returns: Tuple of (number of vCPUs, memory in Gb) of a predefined or custom ("custom-[vCPUs]-[memory in Mb]")
+        machine type.
+
+    Args:
+        machine_type (str): The name of the machine type.
+    """
+    match = re.match(r'^custom-(\d+)-(\d+)(-ext)?$', machine_type or "")
+    if match:
+        return int(match.group(1)), int(match.group(2)) / 1024
+    if machine_type not in MACHINE_TYPES:
+        raise util.TFCliError("ERROR: Unknown machine type {}!".format(machine_type))
+    return MACHINE_TYPES[machine_type]
+
+
+def get_machine_type_price(machine_type):
+    """
+    Returns: The price (USD per hour) of a predefined or custom machine type.
+
+    Args:
+        machine_type (str): The name of the machine type.
+    """
+    if machine_type in MACHINE_TYPE_PRICES:
+        return MACHINE_TYPE_PRICES[machine_type]
+    cpus, memory = get_machine_type_resources(machine_type)
+    return cpus * CUSTOM_CPU_PRICE + memory * CUSTOM_MEMORY_PRICE
+
+
+def load_price_table(file=None):
+    """
+    Returns the machine types and GPU types (with their resources and prices) to choose from, e.g. for recommending
+    a cluster's node shape.
+
+    Args:
+        file (Optional[str]): A local json price table with the (optional) fields "machine_types"
+            ({name: {"cpus": .., "memory": .., "price": ..}}) and "gpu_types" ({name: {"price": ..,
+            "max_per_node": ..}}). Its entries override (or add to) the built-in ones. Missing cpus/memory/price
+            fields of a machine type are taken from the built-in tables.
+
+    Returns: Tuple of (machine types dict, GPU types dict), both by name.
+    """
+    machine_types = {name: {"cpus": cpus, "memory": memory, "price": MACHINE_TYPE_PRICES[name]}
+                     for name, (cpus, memory) in MACHINE_TYPES.items()}
+    gpu_types = {name: dict(settings) for name, settings in GPU_TYPES.items()}
+    if file:
+        with open(file) as f:
+            table = json.load(f)
+        for name, settings in table.get("machine_types", {}).items():
+            if not {"cpus", "memory"} <= set(settings):
+                cpus, memory = get_machine_type_resources(name)
+                settings = dict({"cpus": cpus, "memory": memory}, **settings)
+            if "price" not in settings:
+                settings = dict(settings, price=get_machine_type_price(name))
+            machine_types[name] = settings
+        for name, settings in table.get("gpu_types", {}).items():
+            gpu_types[name] = dict(gpu_types.get(name, {"max_per_node": 8}), **settings)
+    return machine_types, gpu_types
@@ -0,0 +1,145 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Merging of per-node download directories: Every node's files are first downloaded into the node's own staging
+directory (so parallel downloads never write to the same local path), then all staging directories are merged into
+the target directory. Files that exist on several nodes with identical content (same md5) are only kept once. If
+their contents differ, the most recently modified version wins (ties go to the node whose name sorts first); the
+other versions can be kept in a separate conflicts directory.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import shutil
+import tensorforce_client.utils as util
+
+
+# the name of the directory (inside the target directory) holding the nodes' staging directories
+STAGING_DIR = ".staging"
+
+
+class MergeStats(object):
+    def __init__(self):
+        self.files = 0
+        self.duplicates = 0
+        self.conflicts = 0
+
+    def describe(self):
+        return "{} file(s), {} duplicate(s) skipped, {} conflict(s)".format(self.files, self.duplicates,
+                                                                          self.conflicts)
+
+
+class _Candidate(object):
+    # one node's version of a file
+    def __init__(self, node, file, size, mtime):
+        self.node = node
+        self.file = file
+        self.size = size
+        self.mtime = mtime
+        self.md5 = None
+
+
+def staging_dir(local_dir, node):
+    """
+    Returns: The (emptied) staging directory of a node inside a local target directory.
+    """
+    directory = os.path.join(local_dir, STAGING_DIR, node)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    return directory
+
+
+def remove_staging_dirs(local_dir):
+    """
+    Removes all (left over) staging directories inside a local target directory.
+    """
+    shutil.rmtree(os.path.join(local_dir, STAGING_DIR), ignore_errors=True)
+
+
+def merge_directories(sources, local_dir, conflict_dir=None):
+    """
+    Moves the files of several (staging) directories into one local directory and removes the staging directories.
+
+    Args:
+        sources (List[tuple]): The (node, directory) pairs to merge. The nodes' order does not matter.
+        local_dir (str): The directory to merge into. Existing files in it get overwritten.
+        conflict_dir (Optional[str]): A directory to move the losing versions of conflicting files into
+            (as [conflict_dir]/[node]/[path]). If None, these are discarded.
+
+    Returns: MergeStats about the merged files.
+    """
+    stats = MergeStats()
+    # all versions of each file (by relative path), in node order
+    candidates = {}
+    for node, directory in sorted(sources):
+        for root, _, files in os.walk(directory):
+            for f in files:
+                file = os.path.join(root, f)
+                stat = os.stat(file)
+                candidates.setdefault(os.path.relpath(file, directory), []).\
+                    append(_Candidate(node, file, stat.st_size, stat.st_mtime))
+
+    # hash (in parallel) only those versions that could be duplicates of each other (same path and size)
+    to_hash = [c for versions in candidates.values() if len(versions) > 1
+               for c in versions if sum(1 for v in versions if v.size == c.size) > 1]
+    with ThreadPoolExecutor(max_workers=util.engine.max_concurrency) as executor:
+        for c, md5 in zip(to_hash, executor.map(lambda c: md5_file(c.file), to_hash)):
+            c.md5 = md5
+
+    for path, versions in sorted(candidates.items()):
+        # newest first, ties by node name
+        versions = sorted(versions, key=lambda c: (-c.mtime, c.node))
+        winner = versions[0]
+        _move(winner.file, os.path.join(local_dir, path))
+        stats.files += 1
+        contents = {(winner.size, winner.md5)} if winner.md5 else set()
+        for c in versions[1:]:
+            if c.md5 and (c.size, c.md5) in contents:
+                stats.duplicates += 1
+                continue
+            if c.md5:
+                contents.add((c.size, c.md5))
+            stats.conflicts += 1
+            if conflict_dir:
+                _move(c.file, os.path.join(conflict_dir, c.node, path))
+
+    for _, directory in sources:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if stats.conflicts:
+        print("WARNING: {} file(s) differed between nodes. Kept the most recently modified version{}.".format(
+            stats.conflicts, " (others moved to {})".format(conflict_dir) if conflict_dir else ""))
+    return stats
+
+
+def md5_file(file):
+    md5 = hashlib.md5()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _move(file, target):
+    if not os.path.isdir(os.path.dirname(target)):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(file, target)
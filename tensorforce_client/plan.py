@@ -0,0 +1,164 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Execution plans: multi-step operations (e.g. `Experiment.start`) expressed as a dependency graph of steps.
+A Plan runs every step as soon as all steps it depends on are done, so independent steps run concurrently.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+import tensorforce_client.utils as util
+from tensorforce_client.profiling import profiler
+
+
+class Step(object):
+    """
+    A single step of a Plan.
+    """
+
+    def __init__(self, name, func, depends_on=None, estimate=1.0, description=None):
+        """
+        Args:
+            name (str): The (unique) name of the step.
+            func (callable): The function to call (w/o args) to execute the step.
+            depends_on (Optional[List[str]]): The names of the steps that must be done before this one can start.
+            estimate (float): The estimated duration (in sec) of the step (used for the critical path
+                before the plan has run).
+            description (Optional[str]): A short description of what the step does.
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.estimate = estimate
+        self.description = description or ""
+        # the measured duration (None if the step hasn't run yet)
+        self.duration = None
+
+
+class Plan(object):
+    """
+    A dependency graph of Steps.
+    """
+
+    def __init__(self, name, max_workers=4):
+        """
+        Args:
+            name (str): The name of the plan (also used as the profiler phase for the plan's steps).
+            max_workers (int): The max. number of steps to run at the same time.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        # all steps in the order they were added (which is a valid execution order)
+        self.steps = []
+        self.steps_by_name = {}
+
+    def add(self, name, func, depends_on=None, estimate=1.0, description=None):
+        """
+        Adds a new step to the plan. All steps it depends on must have been added already (which makes
+        cycles impossible).
+
+        Args:
+            See `Step`.
+
+        Returns: The new Step.
+        """
+        if name in self.steps_by_name:
+            raise util.TFCliError("ERROR: Step {} already exists in plan {}!".format(name, self.name))
+        for dependency in depends_on or []:
+            if dependency not in self.steps_by_name:
+                raise util.TFCliError("ERROR: Step {} depends on unknown step {}!".format(name, dependency))
+        step = Step(name, func, depends_on, estimate, description)
+        self.steps.append(step)
+        self.steps_by_name[name] = step
+        return step
+
+    def run(self):
+        """
+        Executes all steps, each one as soon as all its dependencies are done. If a step fails, no further steps
+        are started and - once the already running steps are done - the step's error is re-raised.
+        """
+        parent_phase = profiler.current_phase()
+        done = set()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                if error is None:
+                    for step in self.steps:
+                        if step.name not in done and step.name not in running.values() and \
+                                all(d in done for d in step.depends_on):
+                            running[executor.submit(self._run_step, step, parent_phase)] = step.name
+                if len(running) == 0:
+                    break
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    else:
+                        done.add(name)
+        if error is not None:
+            raise error
+
+    def critical_path(self, measured=True):
+        """
+        Returns: Tuple of: The longest chain of dependent steps (List[Step]) and its total duration.
+
+        Args:
+            measured (bool): Whether to use the measured durations of the steps (where available) instead of
+                their estimates.
+        """
+        # steps are in topological order -> a single pass finds the longest path
+        finish = {}
+        previous = {}
+        for step in self.steps:
+            duration = step.duration if measured and step.duration is not None else step.estimate
+            start = max([finish[d] for d in step.depends_on] or [0.0])
+            finish[step.name] = start + duration
+            previous[step.name] = max(step.depends_on, key=lambda d: finish[d]) if step.depends_on else None
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=lambda n: finish[n])
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.insert(0, self.steps_by_name[name])
+            name = previous[name]
+        return path, total
+
+    def describe(self):
+        """
+        Returns: A human readable (str) description of the plan's steps, their dependencies and the critical path.
+        """
+        lines = ["PLAN {} ({} steps):".format(self.name, len(self.steps))]
+        lines.append("{: <24s}{: >10s}  {: <40s}{}".format("Step", "Est. (s)", "Depends on", "Description"))
+        for step in self.steps:
+            lines.append("{: <24s}{: >10.1f}  {: <40s}{}".format(step.name, step.estimate,
+                                                                 ", ".join(step.depends_on) or "-", step.description))
+        path, total = self.critical_path(measured=False)
+        lines.append("Critical path (est. {:.1f}s): {}".format(total, " -> ".join(s.name for s in path)))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _run_step(step, parent_phase):
+        start = time.time()
+        with profiler.phase(step.name, parent=parent_phase):
+            step.func()
+        step.duration = time.time() - start
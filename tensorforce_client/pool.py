@@ -0,0 +1,297 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+A pool of warm (already created and provisioned) clusters per cluster spec, so that experiments with a dedicated
+cluster don't have to wait for a cluster to be created. The pool's size and max. idle time per cluster spec are
+configured in the project's .tensorforce.json file ("cluster_pool" field, see `tfcli pool set`), its state (which
+pool clusters exist and since when they are idle) is kept in .tensorforce.pool.json.
+
+When an experiment claims a pool cluster, the pool is refilled by a `tfcli pool fill --watch` process in the
+background, which then stays around to delete pool clusters that have been idle for longer than their max. idle
+time (so the pool doesn't cost money forever).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from contextlib import contextmanager
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import tensorforce_client.utils as util
+from tensorforce_client.cluster import Cluster, create_clusters, get_cluster_from_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# the default max. number of seconds a pool cluster may be idle before it gets deleted
+DEFAULT_MAX_IDLE = 3600
+# pool clusters that are still not ready after this many seconds are considered failed
+CREATION_TIMEOUT = 3600
+# the cluster settings that have to match for a pool cluster to be used for a cluster spec
+KEY_FIELDS = ["machine_type", "num_nodes", "gpus_per_node", "gpu_type", "disk_size", "location", "node_pools"]
+
+
+class ClusterPool(object):
+    """
+    Keeps a configurable number of idle clusters per cluster spec (see module docstring).
+    """
+
+    def __init__(self, file=".tensorforce.pool.json", project_file=".tensorforce.json"):
+        """
+        Args:
+            file (str): The pool's state file (relative to the project dir).
+            project_file (str): The project file holding the pool's configuration.
+        """
+        self.file = file
+        self.project_file = project_file
+        self.lock = threading.Lock()
+
+    def get_config(self):
+        """
+        Returns: Dict of pool settings (size, max_idle) by cluster spec name (empty if no pool is configured).
+        """
+        if not os.path.isfile(self.project_file):
+            return {}
+        return util.read_json_spec(self.project_file).get("cluster_pool", {})
+
+    def set_config(self, spec, size, max_idle=None):
+        """
+        Sets the number of idle clusters to keep for a cluster spec.
+
+        Args:
+            spec (str): The cluster spec (json file or name of a file in configs/clusters).
+            size (int): The number of idle clusters to keep (0 to remove the spec from the pool).
+            max_idle (Optional[int]): The max. number of seconds a cluster may be idle before it gets deleted
+                (default: DEFAULT_MAX_IDLE).
+        """
+        # make sure the spec exists
+        util.read_json_spec(spec, "clusters")
+        project = util.read_json_spec(self.project_file)
+        config = project.setdefault("cluster_pool", {})
+        if size > 0:
+            config[spec] = {"size": size, "max_idle": max_idle or DEFAULT_MAX_IDLE}
+        else:
+            config.pop(spec, None)
+        with open(self.project_file, "w") as f:
+            json.dump(project, f)
+
+    def list(self):
+        """
+        Returns: Dict of the pool's clusters by name (fields: spec, status ("creating" or "idle"), since, cluster).
+        """
+        with self._state() as state:
+            return dict(state["clusters"])
+
+    def claim(self, cluster, claimed_by):
+        """
+        Takes an idle pool cluster matching the given (not yet started) Cluster's settings out of the pool and
+        triggers a refill of the pool in the background.
+
+        Args:
+            cluster (Cluster): The cluster we would otherwise have to create.
+            claimed_by (str): Who claims the cluster (e.g. the experiment's name, only for messages).
+
+        Returns: The claimed (running) Cluster object or None if there is no matching idle cluster.
+        """
+        key = self.key(cluster.get_spec())
+        claimed = None
+        with self._state() as state:
+            candidates = sorted((e["since"], name) for name, e in state["clusters"].items()
+                                if e["status"] == "idle" and e["key"] == key)
+            if not candidates:
+                return None
+            running_clusters = util.get_cluster_specs()
+            for _, name in candidates:
+                # either claimed now or gone
+                del state["clusters"][name]
+                if running_clusters.get(name, {}).get("status") == "RUNNING":
+                    claimed = get_cluster_from_string(name, running_clusters=running_clusters)
+                    break
+        if claimed:
+            print("+ Claimed warm cluster {} from the pool for {}.".format(claimed.name_hyphenated, claimed_by))
+            self.fill_in_background()
+        return claimed
+
+    def fill(self):
+        """
+        Deletes expired pool clusters (see `reap`) and creates (concurrently) as many clusters as needed to bring
+        the pool up to its configured size.
+
+        Returns: List of the newly created Cluster objects.
+        """
+        self.reap()
+        clusters = []
+        with self._state() as state:
+            for spec, settings in sorted(self.get_config().items()):
+                num_clusters = sum(1 for e in state["clusters"].values() if e["spec"] == spec)
+                for _ in range(settings.get("size", 1) - num_clusters):
+                    cluster = Cluster(file=spec, name=self._new_name(spec))
+                    state["clusters"][cluster.name_hyphenated] = {
+                        "spec": spec, "key": self.key(cluster.get_spec()), "status": "creating", "since": time.time(),
+                        "cluster": cluster.get_spec()
+                    }
+                    clusters.append(cluster)
+        if not clusters:
+            return []
+
+        print("+ Filling cluster pool with {} new cluster(s) ...".format(len(clusters)))
+        errors = create_clusters(clusters, raise_on_error=False)
+        with self._state() as state:
+            for cluster in clusters:
+                entry = state["clusters"].get(cluster.name_hyphenated)
+                if cluster.name_hyphenated in errors:
+                    state["clusters"].pop(cluster.name_hyphenated, None)
+                elif entry:
+                    entry.update(status="idle", since=time.time(), cluster=cluster.get_spec())
+        for cluster in clusters:
+            if cluster.name_hyphenated in errors:
+                print("WARNING: Could not create pool cluster {}: {}".format(cluster.name_hyphenated,
+                                                                             errors[cluster.name_hyphenated]))
+                self._delete(cluster)
+        return [c for c in clusters if c.name_hyphenated not in errors]
+
+    def reap(self):
+        """
+        Deletes all pool clusters that have been idle for longer than their max. idle time, whose cluster spec is
+        no longer part of the pool or whose creation apparently failed.
+
+        Returns: The names of the deleted clusters.
+        """
+        if not os.path.isfile(self.file):
+            return []
+        config = self.get_config()
+        now = time.time()
+        expired = []
+        with self._state() as state:
+            for name, entry in sorted(state["clusters"].items()):
+                max_idle = config.get(entry["spec"], {}).get("max_idle", DEFAULT_MAX_IDLE)
+                if (entry["status"] == "idle" and (now - entry["since"] > max_idle or entry["spec"] not in config))\
+                        or (entry["status"] == "creating" and now - entry["since"] > CREATION_TIMEOUT):
+                    expired.append(Cluster(**entry["cluster"]))
+                    del state["clusters"][name]
+        for cluster in expired:
+            print("+ Deleting pool cluster {} (idle for too long).".format(cluster.name_hyphenated))
+            self._delete(cluster)
+        return [c.name_hyphenated for c in expired]
+
+    def drain(self):
+        """
+        Deletes all clusters of the pool (the pool's configuration stays as it is).
+
+        Returns: The names of the deleted clusters.
+        """
+        with self._state() as state:
+            clusters = [Cluster(**e["cluster"]) for e in state["clusters"].values()]
+            state["clusters"] = {}
+        for cluster in clusters:
+            self._delete(cluster)
+        return [c.name_hyphenated for c in clusters]
+
+    def watch(self, poll_interval=60.0):
+        """
+        Deletes expired pool clusters (see `reap`) until the pool is empty. Returns right away if another
+        process is already watching the pool.
+
+        Args:
+            poll_interval (float): The number of seconds between two checks.
+        """
+        with self._state() as state:
+            if _is_alive(state.get("watcher")):
+                return
+            state["watcher"] = os.getpid()
+        try:
+            while True:
+                self.reap()
+                if not self.list():
+                    return
+                time.sleep(poll_interval)
+        finally:
+            with self._state() as state:
+                state.pop("watcher", None)
+
+    def fill_in_background(self, log_file=".tensorforce.pool.log"):
+        """
+        Starts a detached `tfcli pool fill --watch` process (its outputs go to `log_file`).
+        """
+        # nothing to do if no pool is configured (or when replaying commands)
+        if not self.get_config() or (util.engine.cassette is not None and util.engine.cassette.replaying):
+            return
+        print("+ Refilling cluster pool in the background (see {}).".format(log_file))
+        with open(log_file, "a") as log:
+            kwargs = {"start_new_session": True} if os.name != "nt" else {}
+            subprocess.Popen([sys.executable, "-m", "tensorforce_client.tfcli", "pool", "fill", "--watch"],
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+
+    @staticmethod
+    def key(spec):
+        """
+        Returns: The key (str) under which clusters with the given spec (see `Cluster.get_spec`) are pooled.
+        """
+        return "|".join(str(spec.get(field)) for field in KEY_FIELDS)
+
+    @contextmanager
+    def _state(self):
+        # the pool's state (read and written under a lock, so that several tfcli processes can use the pool)
+        with self.lock:
+            with open(self.file + ".lock", "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = {"clusters": {}}
+                if os.path.isfile(self.file):
+                    with open(self.file) as f:
+                        state = json.load(f)
+                yield state
+                tmp_file = self.file + ".tmp"
+                with open(tmp_file, "w") as f:
+                    json.dump(state, f, indent=1, sort_keys=True)
+                os.replace(tmp_file, self.file)
+
+    @staticmethod
+    def _new_name(spec):
+        spec_name = re.sub(r'[^a-z0-9]+', "-", os.path.splitext(os.path.basename(spec))[0].lower()).strip("-")
+        return "pool-{}-{:06x}".format(spec_name[:24], random.getrandbits(24))
+
+    @staticmethod
+    def _delete(cluster):
+        try:
+            cluster.delete()
+        except util.TFCliError as e:
+            print("WARNING: Could not delete pool cluster {}: {}".format(cluster.name_hyphenated, e))
+
+
+def _is_alive(pid):
+    # (os.kill would terminate the process on Windows)
+    if not pid or os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+# the project's cluster pool
+cluster_pool = ClusterPool()
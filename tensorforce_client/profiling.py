@@ -0,0 +1,253 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from contextlib import contextmanager
+import json
+import re
+import threading
+import time
+
+
+class Profiler(object):
+    """
+    Collects timing information about all external commands (wall time, exit code, bytes of output), about
+    the major phases of tfcli commands (e.g. "experiment.start/copy-files") and about bulk file transfers.
+    Nothing is recorded unless the profiler is enabled (`tfcli --profile`).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = time.time()
+        # list of dicts: command, group, phase, start, duration, returncode, output_bytes, timed_out
+        self.commands = []
+        # list of dicts: name, start, duration
+        self.phases = []
+        # list of dicts: node, direction, phase, files, bytes, duration, compression
+        self.transfers = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def enable(self):
+        self.enabled = True
+        self.start_time = time.time()
+
+    def current_phase(self):
+        """
+        Returns: The full name of the innermost phase active in the calling thread (None if none).
+        """
+        stack = getattr(self.local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def phase(self, name, parent=None):
+        """
+        Context manager measuring the wall time of a phase. Phases can be nested; the recorded name
+        is the "/"-joined path of all enclosing phases.
+
+        Args:
+            name (str): The name of the phase.
+            parent (Optional[str]): The full name of the enclosing phase. Only needed if the enclosing phase
+                was entered in another thread (default: the calling thread's current phase).
+        """
+        if not self.enabled:
+            yield
+            return
+        parent = parent or self.current_phase()
+        full_name = name if parent is None else parent + "/" + name
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        self.local.stack.append(full_name)
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.local.stack.pop()
+            with self.lock:
+                self.phases.append({"name": full_name, "start": start - self.start_time,
+                                    "duration": time.time() - start})
+
+    @contextmanager
+    def resume(self, phase):
+        """
+        Context manager continuing a phase that was entered in another thread: Commands issued in the calling
+        thread meanwhile are attributed to the phase (the phase itself is only recorded by the thread that
+        entered it).
+
+        Args:
+            phase (Optional[str]): The full name of the phase (see `current_phase`).
+        """
+        if not self.enabled or phase is None:
+            yield
+            return
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        self.local.stack.append(phase)
+        try:
+            yield
+        finally:
+            self.local.stack.pop()
+
+    def in_current_phase(self, func):
+        """
+        Returns: A function calling `func` within the calling thread's current phase (see `resume`), e.g. to be
+            run by a thread pool.
+
+        Args:
+            func (callable): The function to wrap.
+        """
+        phase = self.current_phase()
+
+        def wrapped(*args, **kwargs):
+            with self.resume(phase):
+                return func(*args, **kwargs)
+        return wrapped
+
+    def record_command(self, result, phase=None):
+        """
+        Records a finished external command.
+
+        Args:
+            result (SyscallResult): The result of the command.
+            phase (Optional[str]): The phase during which the command was issued.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.commands.append({
+                "command": result.command,
+                "group": self.command_group(result.command),
+                "phase": phase,
+                "start": time.time() - result.duration - self.start_time,
+                "duration": result.duration,
+                "returncode": result.returncode,
+                "output_bytes": result.output_bytes,
+                "timed_out": result.timed_out
+            })
+
+    def record_transfer(self, node, direction, num_files, num_bytes, duration, compression=None):
+        """
+        Records a finished bulk file transfer (see `tensorforce_client.transfer`).
+
+        Args:
+            node (str): The node transferred from/to ("[node] -> [ip]" for node-to-node transfers).
+            direction (str): Either "upload", "download" or "forward" (node to node).
+            num_files (int): The number of files (or directories) transferred.
+            num_bytes (int): The number of (uncompressed) bytes transferred.
+            duration (float): The wall time (in sec) of the transfer.
+            compression (Optional[str]): The compression used.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.transfers.append({
+                "node": node,
+                "direction": direction,
+                "phase": self.current_phase(),
+                "files": num_files,
+                "bytes": num_bytes,
+                "duration": duration,
+                "compression": compression
+            })
+
+    @staticmethod
+    def command_group(command):
+        """
+        Returns: A short grouping key for a command: the executable plus its sub-commands
+            (e.g. "gcloud compute ssh" or "kubectl create").
+        """
+        words = []
+        for word in command.split():
+            if word.startswith("-") or not re.match(r'^[a-z][\w\-]*$', word) or len(words) == 3:
+                break
+            words.append(word)
+        return " ".join(words) or command[:30]
+
+    def report(self, top=10):
+        """
+        Returns: A human readable breakdown (str) of phases and commands, sorted by total wall time.
+
+        Args:
+            top (int): The number of slowest single commands to list.
+        """
+        lines = ["PROFILE (total wall time: {:.2f}s)".format(time.time() - self.start_time)]
+
+        lines.append("")
+        lines.append("{: <60s}{: >8s}{: >12s}".format("Phase", "Calls", "Total (s)"))
+        phases = {}
+        for p in self.phases:
+            calls, total = phases.get(p["name"], (0, 0.0))
+            phases[p["name"]] = (calls + 1, total + p["duration"])
+        for name, (calls, total) in sorted(phases.items(), key=lambda i: -i[1][1]):
+            lines.append("{: <60s}{: >8d}{: >12.2f}".format(name, calls, total))
+
+        lines.append("")
+        lines.append("{: <40s}{: >8s}{: >12s}{: >10s}{: >10s}{: >14s}".
+                     format("Command", "Calls", "Total (s)", "Max (s)", "Failed", "Output bytes"))
+        groups = {}
+        for c in self.commands:
+            g = groups.setdefault(c["group"], {"calls": 0, "total": 0.0, "max": 0.0, "failed": 0, "bytes": 0})
+            g["calls"] += 1
+            g["total"] += c["duration"]
+            g["max"] = max(g["max"], c["duration"])
+            g["failed"] += 0 if c["returncode"] == 0 else 1
+            g["bytes"] += c["output_bytes"]
+        for name, g in sorted(groups.items(), key=lambda i: -i[1]["total"]):
+            lines.append("{: <40s}{: >8d}{: >12.2f}{: >10.2f}{: >10d}{: >14d}".
+                         format(name, g["calls"], g["total"], g["max"], g["failed"], g["bytes"]))
+
+        if self.transfers:
+            lines.append("")
+            lines.append("{: <40s}{: >8s}{: >12s}{: >14s}{: >12s}".
+                         format("Transfer", "Streams", "Total (s)", "Bytes", "MB/s"))
+            directions = {}
+            for t in self.transfers:
+                d = directions.setdefault(t["direction"], {"streams": 0, "total": 0.0, "bytes": 0})
+                d["streams"] += 1
+                d["total"] += t["duration"]
+                d["bytes"] += t["bytes"]
+            for name, d in sorted(directions.items()):
+                lines.append("{: <40s}{: >8d}{: >12.2f}{: >14d}{: >12.2f}".format(
+                    name, d["streams"], d["total"], d["bytes"], d["bytes"] / 1e6 / d["total"] if d["total"] else 0.0))
+
+        lines.append("")
+        lines.append("Slowest commands:")
+        for c in sorted(self.commands, key=lambda c: -c["duration"])[:top]:
+            lines.append("{: >8.2f}s  [exit {}]  {}".format(c["duration"], c["returncode"], c["command"]))
+        return "\n".join(lines)
+
+    def write_json(self, file):
+        """
+        Writes all collected records as a json file (e.g. for tracking trends over time).
+
+        Args:
+            file (str): The file to write to.
+        """
+        with open(file, "w") as f:
+            json.dump({
+                "start_time": self.start_time,
+                "total_duration": time.time() - self.start_time,
+                "phases": self.phases,
+                "commands": self.commands,
+                "transfers": self.transfers
+            }, f, indent=4)
+
+
+# the global profiler
+profiler = Profiler()
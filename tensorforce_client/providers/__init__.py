@@ -0,0 +1,83 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Cloud backends. The backend of a project is set via the "cloud_provider" field in its .tensorforce.json file:
+- "google" (default): Uses the gcloud command line tool for everything.
+- "gke": Talks to the google cloud REST APIs directly (over persistent connections) and only uses gcloud for
+    ssh/scp and kubectl credentials.
+- "fake": An in-process fake cloud (for tests and benchmarks).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import os
+import threading
+
+from tensorforce_client.providers.base import CloudProvider
+from tensorforce_client.providers.gcloud import GCloudProvider
+from tensorforce_client.providers.gke import GKEProvider, ConnectionPool
+from tensorforce_client.providers.fake import FakeProvider
+
+
+_provider = None
+_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Returns: The CloudProvider of the current project (created on first call).
+    """
+    global _provider
+    with _lock:
+        if _provider is None:
+            _provider = create_provider()
+        return _provider
+
+
+def set_provider(provider):
+    """
+    Sets the CloudProvider to use from here on (e.g. a FakeProvider for tests).
+
+    Args:
+        provider (Optional[CloudProvider]): The provider to use. None for re-creating it on the next
+            `get_provider()` call.
+    """
+    global _provider
+    with _lock:
+        _provider = provider
+
+
+def create_provider(project_file=".tensorforce.json"):
+    """
+    Returns: A new CloudProvider according to the project's settings.
+
+    Args:
+        project_file (str): The project file to read the "cloud_provider" and "remote_id" settings from.
+    """
+    import tensorforce_client.utils as util
+
+    project = util.read_json_spec(project_file) if os.path.isfile(project_file) else {}
+    name = project.get("cloud_provider", "google")
+    if name == GCloudProvider.name:
+        return GCloudProvider()
+    elif name == GKEProvider.name:
+        return GKEProvider(project_id=project.get("remote_id"))
+    elif name == FakeProvider.name:
+        return FakeProvider(state_file=".tensorforce.fake.json")
+    raise util.TFCliError("ERROR: Unknown cloud_provider '{}' in {}! Supported are google|gke|fake.".
+                          format(name, project_file))
@@ -0,0 +1,290 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import json
+import threading
+import tensorforce_client.utils as util
+from tensorforce_client.profiling import profiler
+
+
+class CloudProvider(object):
+    """
+    Base class for all cloud backends. A provider covers everything tfcli needs from the cloud: listing projects,
+    clusters, compute instances and disks, creating and deleting clusters, fetching cluster credentials for kubectl,
+    and running ssh/scp commands on cluster nodes.
+
+    All list-methods return plain (json serializable) dicts, so that their results can be cached
+    (see `InventoryCache`). Clusters are returned in the format of the GKE API's cluster resource.
+    """
+
+    # the name of the provider as used in the project's .tensorforce.json file ("cloud_provider" field)
+    name = None
+
+    def list_projects(self):
+        """
+        Returns: List of project dicts with the fields: projectId, name, projectNumber.
+        """
+        raise NotImplementedError
+
+    def list_clusters(self):
+        """
+        Returns: List of cluster dicts (GKE API format, e.g. name, zone, endpoint, status, nodeConfig, etc..).
+        """
+        raise NotImplementedError
+
+    def list_instances(self, cluster):
+        """
+        Returns: List of node dicts (fields: name, name_hyphenated, zone, machine_type, internal-ip, external-ip,
+            status) of the given cluster. The first node is the cluster's primary node.
+
+        Args:
+            cluster (str): The (hyphenated) name of the cluster.
+        """
+        raise NotImplementedError
+
+    def list_disks(self):
+        """
+        Returns: List of disk dicts with the fields: name, zone, size (in Gb), type, status.
+        """
+        raise NotImplementedError
+
+    def create_cluster(self, cluster):
+        """
+        Creates a cluster in the cloud and waits until it's up.
+
+        Args:
+            cluster (Cluster): The Cluster object describing the cluster to create.
+        """
+        raise NotImplementedError
+
+    def create_cluster_async(self, cluster):
+        """
+        Starts creating a cluster in the cloud and returns right away (default: runs `create_cluster` in
+        a background thread).
+
+        Args:
+            cluster (Cluster): The Cluster object describing the cluster to create.
+
+        Returns: The Operation handle of the creation.
+        """
+        return Operation("create-cluster " + cluster.name_hyphenated, self.create_cluster, cluster)
+
+    @staticmethod
+    def get_node_config(cluster, pool):
+        """
+        Returns: The node config (dict in GKE API format) of one of a cluster's node pools.
+
+        Args:
+            cluster (Cluster): The Cluster object.
+            pool (dict): One of the cluster's `node_pools`.
+        """
+        config = {"machineType": pool["machine_type"], "diskSizeGb": cluster.disk_size}
+        if pool["gpus_per_node"] > 0:
+            config["accelerators"] = [{"acceleratorType": pool["gpu_type"],
+                                       "acceleratorCount": str(pool["gpus_per_node"])}]
+        if pool["preemptible"]:
+            config["preemptible"] = True
+        labels = cluster.get_node_labels(pool)
+        if labels:
+            config["labels"] = labels
+        return config
+
+    @staticmethod
+    def get_autoscaling(pool, min_nodes=None):
+        """
+        Returns: The autoscaling settings (dict in GKE API format) of one of a cluster's node pools (None if the pool
+            is not autoscaled).
+
+        Args:
+            pool (dict): One of the cluster's `node_pools`.
+            min_nodes (Optional[int]): A lower bound to use instead of the pool's `min_nodes`.
+        """
+        if pool.get("max_nodes") is None:
+            return None
+        return {"enabled": True, "minNodeCount": pool["min_nodes"] if min_nodes is None else min_nodes,
+                "maxNodeCount": pool["max_nodes"]}
+
+    def resize_node_pool(self, cluster, pool, num_nodes, min_nodes=None):
+        """
+        Resizes one of a cluster's node pools and waits until the resize is done (not until the new nodes are
+        ready, see `Cluster.wait_ready`).
+
+        Args:
+            cluster (Cluster): The Cluster object.
+            pool (dict): One of the cluster's `node_pools`.
+            num_nodes (int): The new number of nodes of the pool.
+            min_nodes (Optional[int]): The new lower bound of the pool's autoscaler (only for autoscaled pools; None
+                for keeping the current one).
+        """
+        raise NotImplementedError
+
+    def delete_cluster(self, cluster):
+        """
+        Deletes (shuts down) a cluster in the cloud (does not wait for the operation to finish).
+
+        Args:
+            cluster (Cluster): The Cluster object to delete.
+        """
+        raise NotImplementedError
+
+    def get_credentials(self, cluster, project_id):
+        """
+        Fetches the credentials for a cluster and configures the local kubectl to use them.
+
+        Args:
+            cluster (Cluster): The Cluster object to get the credentials for.
+            project_id (str): The remote project ID.
+        """
+        raise NotImplementedError
+
+    def get_kubectl_context(self, cluster):
+        """
+        Returns: The name of the kubectl context pointing to the given cluster (default: the one kubectl knows whose
+            name ends in "_[cluster name]", as set up by gcloud). None if there is no (unique) such context.
+
+        Args:
+            cluster (Cluster): The Cluster object.
+        """
+        result = util.syscall("kubectl config get-contexts -o name", return_outputs="as_result", merge_err=False)
+        contexts = [c for c in result.output.split() if c.endswith("_" + cluster.name_hyphenated)] if result.ok else []
+        return contexts[0] if len(contexts) == 1 else None
+
+    def get_node_status(self, cluster, context=None):
+        """
+        Returns the Kubernetes status of a cluster's nodes (default: asks kubectl).
+
+        Args:
+            cluster (Cluster): The Cluster object.
+            context (Optional[str]): The kubectl context pointing to the cluster (default: kubectl's current one).
+
+        Returns: List of dicts (fields: name, ready (bool), gpus (allocatable GPUs), pool (the node's node pool))
+            for all nodes registered in the cluster's Kubernetes (an empty list if Kubernetes can't be reached (yet)).
+        """
+        result = util.syscall("kubectl {}get nodes -o json".format("--context {} ".format(context) if context else ""),
+                              return_outputs="as_result", merge_err=False)
+        try:
+            items = json.loads(result.output).get("items", []) if result.ok else []
+        except ValueError:
+            return []
+        nodes = []
+        for item in items:
+            status = item.get("status", {})
+            labels = item.get("metadata", {}).get("labels", {})
+            nodes.append({
+                "name": item.get("metadata", {}).get("name"),
+                "ready": any(c.get("type") == "Ready" and c.get("status") == "True"
+                             for c in status.get("conditions", [])),
+                "gpus": int(status.get("allocatable", {}).get("nvidia.com/gpu", 0)),
+                "pool": labels.get(util.NODE_POOL_LABEL) or labels.get("cloud.google.com/gke-nodepool")
+            })
+        return nodes
+
+    def ssh(self, node, command, location=None, capture=True):
+        """
+        Executes a shell command on a cluster node.
+
+        Args:
+            node (str): The name of the node (compute instance).
+            command (str): The command to execute on the node.
+            location (Optional[str]): The zone of the node.
+            capture (bool): Whether to capture the command's outputs (if False, they go to our stdout).
+
+        Returns: The SyscallResult of the command. Raises a TFCliError if the command failed.
+        """
+        raise NotImplementedError
+
+    def ssh_pipe(self, node, command, location=None, local_input=None, local_output=None):
+        """
+        Executes a shell command on a cluster node with its stdin and/or stdout connected to local shell commands
+        (e.g. for streaming archives from/to the node through a single ssh channel).
+
+        Args:
+            node (str): The name of the node (compute instance).
+            command (str): The command to execute on the node (must not contain double quotes).
+            location (Optional[str]): The zone of the node.
+            local_input (Optional[str]): A local shell command whose stdout becomes the remote command's stdin.
+            local_output (Optional[str]): A local shell command that gets the remote command's stdout as stdin.
+
+        Returns: The SyscallResult of the whole pipeline. Raises a TFCliError if it failed.
+        """
+        raise NotImplementedError
+
+    def scp(self, source, target, location=None, capture=True):
+        """
+        Copies files from/to a cluster node. Remote paths are given as [node name]:[path].
+
+        Args:
+            source (str): The source path.
+            target (str): The target path.
+            location (Optional[str]): The zone of the node.
+            capture (bool): Whether to capture the command's outputs (if False, they go to our stdout).
+
+        Returns: The SyscallResult of the copy command. Raises a TFCliError if the copy failed.
+        """
+        raise NotImplementedError
+
+
+class Operation(object):
+    """
+    A handle to a long running cloud operation (e.g. the creation of a cluster) that runs in a background thread.
+    """
+
+    def __init__(self, name, function, *args):
+        """
+        Args:
+            name (str): A description of the operation (for messages).
+            function (callable): The (blocking) function carrying out the operation.
+            args (any): The args to pass to `function`.
+        """
+        self.name = name
+        self.future = Future()
+        # the operation's commands are profiled under the phase it was started in
+        self.phase = profiler.current_phase()
+        self.thread = threading.Thread(target=self._run, args=(function,) + args)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def done(self):
+        """
+        Returns: Whether the operation has finished (successfully or not).
+        """
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the operation to finish.
+
+        Args:
+            timeout (Optional[float]): The max. number of seconds to wait (default: forever).
+
+        Returns: The operation's result. Raises the operation's error if it failed.
+        """
+        try:
+            return self.future.result(timeout)
+        except FutureTimeoutError:
+            raise util.TFCliError("ERROR: Operation {} did not finish within {}s!".format(self.name, timeout))
+
+    def _run(self, function, *args):
+        try:
+            with profiler.phase(self.name, parent=self.phase):
+                self.future.set_result(function(*args))
+        except BaseException as e:
+            self.future.set_exception(e)
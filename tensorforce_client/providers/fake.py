@@ -0,0 +1,209 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import hashlib
+import json
+import os
+import threading
+import time
+import tensorforce_client.utils as util
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.providers.base import CloudProvider
+
+
+class FakeProvider(CloudProvider):
+    """
+    An in-process fake cloud for tests and benchmarks. Clusters "exist" as soon as they are created and all
+    ssh/scp commands succeed without doing anything (they are only recorded in `calls`).
+    The fake cloud's state can be kept in a json file, so that it survives across tfcli commands.
+    """
+
+    name = "fake"
+
+    def __init__(self, state_file=None, latency=0.0, project_id="fake-project"):
+        """
+        Args:
+            state_file (Optional[str]): A json file to keep the fake cloud's state in (None for in-memory only).
+            latency (float): The number of seconds each call should take (to simulate API latency).
+            project_id (str): The ID of the (only) project in the fake cloud.
+        """
+        self.state_file = state_file
+        self.latency = latency
+        self.project_id = project_id
+        # list of tuples: (method name, args)
+        self.calls = []
+        self.lock = threading.RLock()
+        self.state = {"clusters": {}, "disks": []}
+        if self.state_file and os.path.isfile(self.state_file):
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+
+    def list_projects(self):
+        self._call("list_projects")
+        return [{"projectId": self.project_id, "name": self.project_id, "projectNumber": "123456789012"}]
+
+    def list_clusters(self):
+        self._call("list_clusters")
+        with self.lock:
+            return [c["spec"] for c in self.state["clusters"].values()]
+
+    def list_instances(self, cluster):
+        self._call("list_instances", cluster)
+        with self.lock:
+            c = self.state["clusters"].get(cluster)
+            return list(c["instances"]) if c else []
+
+    def list_disks(self):
+        self._call("list_disks")
+        with self.lock:
+            return list(self.state["disks"])
+
+    def create_cluster(self, cluster):
+        self._call("create_cluster", cluster.name_hyphenated)
+        location = cluster.location or "us-central1-a"
+        node_configs = [self.get_node_config(cluster, pool) for pool in cluster.node_pools]
+        with self.lock:
+            if cluster.name_hyphenated in self.state["clusters"]:
+                raise util.TFCliError("ERROR: Cluster {} already exists!".format(cluster.name_hyphenated))
+            index = len(self.state["clusters"])
+            instances = []
+            for pool in cluster.node_pools:
+                self._add_instances(instances, cluster, pool, pool["num_nodes"], index, location)
+            self.state["clusters"][cluster.name_hyphenated] = {
+                "index": index,
+                "next_instance": len(instances),
+                "spec": {
+                    "name": cluster.name_hyphenated,
+                    "zone": location,
+                    "location": location,
+                    "endpoint": "34.0.{}.1".format(index % 250),
+                    "currentMasterVersion": "1.9.2-gke.1",
+                    "currentNodeCount": cluster.num_nodes,
+                    "status": "RUNNING",
+                    "nodeConfig": node_configs[0],
+                    "nodePools": [dict({"name": pool["name"], "initialNodeCount": pool["num_nodes"],
+                                        "config": node_config,
+                                        "instanceGroupUrls": [self._instance_group_url(cluster, pool, location)]},
+                                       **({"autoscaling": self.get_autoscaling(pool)}
+                                          if pool["max_nodes"] is not None else {}))
+                                  for pool, node_config in zip(cluster.node_pools, node_configs)]
+                },
+                "instances": instances
+            }
+            self._save()
+
+    def resize_node_pool(self, cluster, pool, num_nodes, min_nodes=None):
+        self._call("resize_node_pool", cluster.name_hyphenated, pool["name"], num_nodes, min_nodes)
+        with self.lock:
+            c = self.state["clusters"].get(cluster.name_hyphenated)
+            if not c:
+                raise util.TFCliError("ERROR: Cluster {} does not exist!".format(cluster.name_hyphenated))
+            spec = c["spec"]
+            pool_spec = next((p for p in spec["nodePools"] if p["name"] == pool["name"]), None)
+            if pool_spec is None:
+                raise util.TFCliError("ERROR: Cluster {} has no node pool {}!".format(cluster.name_hyphenated,
+                                                                                    pool["name"]))
+            others = [i for i in c["instances"] if i.get("pool") != pool["name"]]
+            instances = [i for i in c["instances"] if i.get("pool") == pool["name"]][:num_nodes]
+            # (new instances never reuse the names of earlier ones)
+            first = c.get("next_instance", len(c["instances"]))
+            added = num_nodes - len(instances)
+            self._add_instances(instances, cluster, pool, added, c.get("index", 0), spec["location"], first=first)
+            c["next_instance"] = first + max(added, 0)
+            c["instances"] = others + instances
+            if min_nodes is not None and "autoscaling" in pool_spec:
+                pool_spec["autoscaling"]["minNodeCount"] = min_nodes
+            spec["currentNodeCount"] = len(c["instances"])
+            self._save()
+
+    @staticmethod
+    def _instance_group_name(cluster, pool):
+        # (as in GKE: the pool's nodes are named "[instance group name]-[id]")
+        return "gke-{}-{}-{}".format(cluster.name_hyphenated[:20], pool["name"],
+                                     hashlib.md5(cluster.name_hyphenated.encode("utf-8")).hexdigest()[:8])
+
+    def _instance_group_url(self, cluster, pool, location):
+        return "https://www.googleapis.com/compute/v1/projects/{}/zones/{}/instanceGroupManagers/{}-grp".\
+            format(self.project_id, location, self._instance_group_name(cluster, pool))
+
+    def _add_instances(self, instances, cluster, pool, num, index, location, first=None):
+        # appends `num` new instances of the given node pool
+        for n in range(num):
+            i = (len(instances) if first is None else first) + n
+            name = "{}-{:04d}".format(self._instance_group_name(cluster, pool), i)
+            instances.append({
+                "name": name,
+                "name_hyphenated": name,
+                "zone": location,
+                "machine_type": pool["machine_type"],
+                "internal-ip": "10.{}.{}.{}".format(index % 250, i // 250, i % 250 + 2),
+                "external-ip": "35.{}.{}.{}".format(index % 250, i // 250, i % 250 + 2),
+                "status": "RUNNING",
+                # (only known to the fake's Kubernetes, see `get_node_status`)
+                "pool": pool["name"],
+                "gpus": pool["gpus_per_node"]
+            })
+
+    def delete_cluster(self, cluster):
+        self._call("delete_cluster", cluster.name_hyphenated)
+        with self.lock:
+            self.state["clusters"].pop(cluster.name_hyphenated, None)
+            self._save()
+
+    def get_credentials(self, cluster, project_id):
+        self._call("get_credentials", cluster.name_hyphenated, project_id)
+
+    def get_kubectl_context(self, cluster):
+        return None
+
+    def get_node_status(self, cluster, context=None):
+        self._call("get_node_status", cluster.name_hyphenated)
+        with self.lock:
+            c = self.state["clusters"].get(cluster.name_hyphenated)
+            if not c:
+                return []
+            gpus = int(c["spec"]["nodeConfig"].get("accelerators", [{}])[0].get("acceleratorCount", 0))
+            return [{"name": i["name"], "ready": True, "gpus": i.get("gpus", gpus), "pool": i.get("pool")}
+                    for i in c["instances"]]
+
+    def ssh(self, node, command, location=None, capture=True):
+        self._call("ssh", node, command)
+        return SyscallResult("ssh {} {}".format(node, command), 0, b"" if capture else None,
+                             duration=self.latency)
+
+    def ssh_pipe(self, node, command, location=None, local_input=None, local_output=None):
+        self._call("ssh_pipe", node, command, local_input, local_output)
+        return SyscallResult("ssh {} {}".format(node, command), 0, b"", duration=self.latency)
+
+    def scp(self, source, target, location=None, capture=True):
+        self._call("scp", source, target)
+        return SyscallResult("scp {} {}".format(source, target), 0, b"" if capture else None,
+                             duration=self.latency)
+
+    def _call(self, method, *args):
+        with self.lock:
+            self.calls.append((method, args))
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _save(self):
+        if self.state_file:
+            with open(self.state_file, "w") as f:
+                json.dump(self.state, f, indent=4)
@@ -0,0 +1,221 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import re
+import tensorforce_client.utils as util
+from tensorforce_client.engine import engine
+from tensorforce_client.providers.base import CloudProvider
+from tensorforce_client.ssh import ssh_connections
+
+
+# the fields of a compute instance that we need (in this order), projected server-side by gcloud
+INSTANCE_FIELDS = [
+    "name", "zone.basename()", "machineType.basename()", "networkInterfaces[0].networkIP",
+    "networkInterfaces[0].accessConfigs[0].natIP", "status", "labels.goog-k8s-cluster-name"
+]
+
+
+class GCloudProvider(CloudProvider):
+    """
+    Google cloud backend that shells out to the `gcloud` command line tool for every single operation.
+    """
+
+    name = "google"
+
+    def list_projects(self):
+        return self._list_json("gcloud projects list --format json", "projects")
+
+    def list_clusters(self):
+        return self._list_json("gcloud container clusters list --format json", "clusters")
+
+    def list_instances(self, cluster):
+        instances = []
+        # let gcloud do the filtering (GKE node names start with "gke-[cluster name (cut)]-") and only send us the
+        # fields we actually need; nodes of other clusters with the same name prefix are excluded via their
+        # cluster-name label (if set)
+        command = "gcloud compute instances list --filter \"name ~ ^gke-{short}- AND " \
+                  "(labels.goog-k8s-cluster-name={name} OR -labels.goog-k8s-cluster-name:*)\" " \
+                  "--format \"value({fields})\"".format(short=cluster[:20], name=cluster,
+                                                        fields=",".join(INSTANCE_FIELDS))
+
+        def list_instances():
+            del instances[:]
+            out = engine.iter_lines(command)
+            for line in out:
+                fields = line.rstrip("\r\n").split("\t")
+                if len(fields) < len(INSTANCE_FIELDS) - 1:
+                    continue
+                name, zone, machine_type, internal_ip, external_ip, status = fields[:6]
+                label = fields[6] if len(fields) > 6 else ""
+                if label and label != cluster:
+                    continue
+                instances.append({
+                    "name": name,
+                    "name_hyphenated": name,
+                    "zone": zone,
+                    "machine_type": machine_type,
+                    "internal-ip": internal_ip,
+                    "external-ip": external_ip or None,
+                    "status": status,
+                })
+            return out.result
+
+        result, failure = util.retry_policy.call(list_instances, util.get_circuit_breaker(command))
+        if failure != util.SUCCESS:
+            raise util.CommandError(result, failure)
+        return instances
+
+    def list_disks(self):
+        return [{
+            "name": d.get("name"),
+            "zone": re.sub(r'^.+/', "", d.get("zone", "")),
+            "size": int(d.get("sizeGb", 0)),
+            "type": re.sub(r'^.+/', "", d.get("type", "")),
+            "status": d.get("status")
+        } for d in self._list_json("gcloud compute disks list --format json", "disks")]
+
+    def create_cluster(self, cluster):
+        # creating is not idempotent: only rate-limit errors are retried, everything else raises a CommandError
+        # (the cluster comes with its first node pool, all further pools are added to it afterwards)
+        first = cluster.node_pools[0]
+        if cluster.num_gpus == 0:
+            util.syscall_with_retry("gcloud container clusters create {} -m {} --disk-size {} --num-nodes {} {}{}".
+                                    format(cluster.name_hyphenated, first["machine_type"], cluster.disk_size,
+                                           first["num_nodes"], self._zone_flag(cluster.location),
+                                           self._node_pool_flags(cluster, first)),
+                                    policy=util.creation_retry_policy)
+        else:
+            util.syscall_with_retry("gcloud container clusters create {} --enable-cloud-logging "
+                                    "--enable-cloud-monitoring {}{} -m {} "
+                                    "--disk-size {} --enable-kubernetes-alpha --image-type UBUNTU "
+                                    "--num-nodes {} --cluster-version 1.9.2-gke.1 --quiet{}".
+                                    format(cluster.name_hyphenated, self._accelerator_flag(first),
+                                           self._zone_flag(cluster.location), first["machine_type"],
+                                           cluster.disk_size, first["num_nodes"],
+                                           self._node_pool_flags(cluster, first)),
+                                    policy=util.creation_retry_policy)
+        for pool in cluster.node_pools[1:]:
+            util.syscall_with_retry("gcloud container node-pools create {} --cluster {} {} -m {} --disk-size {} "
+                                    "--num-nodes {} {}{}--quiet{}".
+                                    format(pool["name"], cluster.name_hyphenated, self._zone_flag(cluster.location),
+                                           pool["machine_type"], cluster.disk_size, pool["num_nodes"],
+                                           self._accelerator_flag(pool),
+                                           "--image-type UBUNTU " if pool["gpus_per_node"] > 0 else "",
+                                           self._node_pool_flags(cluster, pool)),
+                                    policy=util.creation_retry_policy)
+
+    @staticmethod
+    def _accelerator_flag(pool):
+        if pool["gpus_per_node"] == 0:
+            return ""
+        return "--accelerator type={},count={} ".format(pool["gpu_type"], pool["gpus_per_node"])
+
+    @staticmethod
+    def _autoscaling_flags(pool, min_nodes=None):
+        autoscaling = CloudProvider.get_autoscaling(pool, min_nodes)
+        if not autoscaling:
+            return ""
+        return " --enable-autoscaling --min-nodes {} --max-nodes {}".format(autoscaling["minNodeCount"],
+                                                                            autoscaling["maxNodeCount"])
+
+    @staticmethod
+    def _node_pool_flags(cluster, pool):
+        # preemptible VMs, autoscaling and the pool's node labels (see `Cluster.get_node_labels`)
+        flags = " --preemptible" if pool["preemptible"] else ""
+        flags += GCloudProvider._autoscaling_flags(pool)
+        labels = cluster.get_node_labels(pool)
+        if labels:
+            flags += " --node-labels " + ",".join("{}={}".format(k, v) for k, v in sorted(labels.items()))
+        return flags
+
+    def resize_node_pool(self, cluster, pool, num_nodes, min_nodes=None):
+        name = cluster.get_cloud_pool_name(pool)
+        # lower (or restore) the autoscaler's bound first, so it doesn't undo the resize
+        if min_nodes is not None and pool["max_nodes"] is not None:
+            util.syscall_with_retry("gcloud container clusters update {} --node-pool {} {}{} --quiet".
+                                    format(cluster.name_hyphenated, name, self._zone_flag(cluster.location),
+                                           self._autoscaling_flags(pool, min_nodes)))
+        util.syscall_with_retry("gcloud container clusters resize {} --node-pool {} --num-nodes {} {} --quiet".
+                                format(cluster.name_hyphenated, name, num_nodes, self._zone_flag(cluster.location)))
+
+    def delete_cluster(self, cluster):
+        util.syscall_with_retry("gcloud container clusters delete {} {} --quiet --async".
+                                format(cluster.name_hyphenated, self._zone_flag(cluster.location)))
+
+    def get_credentials(self, cluster, project_id):
+        util.syscall_with_retry("gcloud container clusters get-credentials {} {} --project {}".
+                                format(cluster.name_hyphenated, self._zone_flag(cluster.location), project_id))
+
+    def ssh(self, node, command, location=None, capture=True):
+        # preferably through the node's multiplexed connection
+        if ssh_connections.connect(node, location):
+            result = self._multiplexed(node, ssh_connections.ssh_command(node, command), capture)
+            if result is not None:
+                return result
+        return util.syscall_with_retry("gcloud compute ssh {} {} --command \"{}\"".
+                                       format(node, self._zone_flag(location, "="), command), capture=capture)
+
+    def ssh_pipe(self, node, command, location=None, local_input=None, local_output=None):
+        # the pipeline runs in a local shell: keep it from expanding anything in the (double quoted) remote command
+        if local_input or local_output:
+            command = re.sub(r'([\\"$`])', r'\\\1', command)
+        if ssh_connections.connect(node, location):
+            ssh = ssh_connections.ssh_command(node, command)
+        else:
+            ssh = "gcloud compute ssh {} {} --command \"{}\"".format(node, self._zone_flag(location, "="), command)
+        return util.syscall_with_retry(" | ".join(c for c in [local_input, ssh, local_output] if c))
+
+    def scp(self, source, target, location=None, capture=True):
+        node = ssh_connections.remote_node(source, target)
+        if node and ssh_connections.connect(node, location):
+            result = self._multiplexed(node, ssh_connections.scp_command(node, source, target), capture)
+            if result is not None:
+                return result
+        return util.syscall_with_retry("gcloud compute scp {} {} {}".
+                                       format(self._zone_flag(location, "="), source, target), capture=capture)
+
+    @staticmethod
+    def _multiplexed(node, command, capture):
+        # returns None if the master connection broke (-> caller falls back to gcloud)
+        try:
+            # remote commands aren't necessarily idempotent (e.g. appending to a file): not retried
+            return util.syscall_with_retry(command, capture=capture, policy=util.creation_retry_policy)
+        except util.CommandError as e:
+            # 255: ssh's own (connection) errors - or the remote command's exit code, if the master is still fine
+            if e.result.returncode != 255 or ssh_connections.check(node):
+                raise
+        ssh_connections.drop(node)
+        return None
+
+    @staticmethod
+    def _list_json(command, what):
+        out = util.syscall_with_retry(command, merge_err=False).output
+        try:
+            json_out = json.loads(out)
+        except ValueError:
+            raise util.TFCliError("ERROR: Could not load list of {} from cloud!".format(what))
+        if not isinstance(json_out, list):
+            raise util.TFCliError("ERROR: List of {} is not a json-list!".format(what))
+        return json_out
+
+    @staticmethod
+    def _zone_flag(location, separator=" "):
+        return "--zone" + separator + location if location else ""
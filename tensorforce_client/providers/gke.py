@@ -0,0 +1,346 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import re
+import socket
+import threading
+import time
+from six.moves import http_client
+from six.moves.urllib.parse import urlencode
+import tensorforce_client.utils as util
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.profiling import profiler
+from tensorforce_client.providers.base import Operation
+from tensorforce_client.providers.gcloud import GCloudProvider
+
+
+CONTAINER_API = "container.googleapis.com"
+COMPUTE_API = "compute.googleapis.com"
+RESOURCE_MANAGER_API = "cloudresourcemanager.googleapis.com"
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of persistent (keep-alive) HTTPS connections per host.
+    """
+
+    def __init__(self, max_idle_per_host=8, timeout=60):
+        """
+        Args:
+            max_idle_per_host (int): The max. number of idle connections to keep open per host.
+            timeout (float): The socket timeout (in sec) for all connections.
+        """
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def request(self, method, host, path, body=None, headers=None):
+        """
+        Sends an HTTPS request over a pooled connection.
+
+        Args:
+            method (str): The HTTP method.
+            host (str): The host to send the request to.
+            path (str): The path (incl. query string).
+            body (Optional[bytes]): The request body.
+            headers (Optional[dict]): The request headers.
+
+        Returns: tuple(HTTP status, response body as bytes).
+        """
+        connection, reused = self._get(host)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            data = response.read()
+        except (http_client.HTTPException, socket.error):
+            connection.close()
+            # the server may have closed an idle connection in the meantime -> try once with a fresh one
+            if reused:
+                return self.request(method, host, path, body, headers)
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._put(host, connection)
+        return response.status, data
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for c in connections:
+                    c.close()
+            self.idle = {}
+
+    def _get(self, host):
+        with self.lock:
+            connections = self.idle.get(host)
+            if connections:
+                return connections.pop(), True
+        return http_client.HTTPSConnection(host, timeout=self.timeout), False
+
+    def _put(self, host, connection):
+        with self.lock:
+            connections = self.idle.setdefault(host, [])
+            if len(connections) < self.max_idle_per_host:
+                connections.append(connection)
+                return
+        connection.close()
+
+
+class GKEProvider(GCloudProvider):
+    """
+    Google cloud backend that talks to the GKE, compute and resource-manager REST APIs directly over a pool of
+    persistent HTTPS connections instead of starting a new `gcloud` process for each call.
+    Only an access token is fetched (once per ~45min) via `gcloud auth print-access-token`.
+    Ssh/scp and kubectl credentials are still handled by the gcloud tool.
+    """
+
+    name = "gke"
+
+    # refresh the access token after this many seconds (tokens are valid for 1h)
+    TOKEN_LIFETIME = 45 * 60
+
+    def __init__(self, project_id, pool=None):
+        """
+        Args:
+            project_id (str): The remote (google cloud) project ID.
+            pool (Optional[ConnectionPool]): The connection pool to use.
+        """
+        self.project_id = project_id
+        self.pool = pool or ConnectionPool()
+        self.token = None
+        self.token_time = 0
+        self.default_zone = None
+        self.lock = threading.Lock()
+
+    def list_projects(self):
+        return [{
+            "projectId": p.get("projectId"),
+            "name": p.get("name"),
+            "projectNumber": p.get("projectNumber")
+        } for p in self._list(RESOURCE_MANAGER_API, "/v1/projects", "projects")]
+
+    def list_clusters(self):
+        return self._call("GET", CONTAINER_API, "/v1/projects/{}/locations/-/clusters".format(self.project_id)).\
+            get("clusters", [])
+
+    def list_instances(self, cluster):
+        params = {
+            # GKE node names start with "gke-[cluster name (cut)]-"
+            "filter": "name eq \"gke-{}-.*\"".format(cluster[:20]),
+            "fields": "items/*/instances(name,zone,machineType,status,labels,"
+                      "networkInterfaces(networkIP,accessConfigs/natIP)),nextPageToken"
+        }
+        instances = []
+        for zone in self._list(COMPUTE_API, "/compute/v1/projects/{}/aggregated/instances".format(self.project_id),
+                               "items", params, aggregated=True):
+            for c in zone.get("instances", []):
+                # exclude nodes of other clusters with the same name prefix
+                label = c.get("labels", {}).get("goog-k8s-cluster-name")
+                if label and label != cluster:
+                    continue
+                network = c.get("networkInterfaces", [{}])[0]
+                access_configs = network.get("accessConfigs", [{}])
+                instances.append({
+                    "name": c.get("name"),
+                    "name_hyphenated": c.get("name"),
+                    "zone": re.sub(r'^.+/', "", c.get("zone", "")),
+                    "machine_type": re.sub(r'^.+/', "", c.get("machineType", "")),
+                    "internal-ip": network.get("networkIP"),
+                    "external-ip": access_configs[0].get("natIP") if access_configs else None,
+                    "status": c.get("status"),
+                })
+        return instances
+
+    def list_disks(self):
+        disks = []
+        for zone in self._list(COMPUTE_API, "/compute/v1/projects/{}/aggregated/disks".format(self.project_id),
+                               "items", {"fields": "items/*/disks(name,zone,sizeGb,type,status),nextPageToken"},
+                               aggregated=True):
+            for d in zone.get("disks", []):
+                disks.append({
+                    "name": d.get("name"),
+                    "zone": re.sub(r'^.+/', "", d.get("zone", "")),
+                    "size": int(d.get("sizeGb", 0)),
+                    "type": re.sub(r'^.+/', "", d.get("type", "")),
+                    "status": d.get("status")
+                })
+        return disks
+
+    def create_cluster(self, cluster):
+        self.create_cluster_async(cluster).wait()
+
+    def create_cluster_async(self, cluster):
+        location = cluster.location or self._get_default_zone()
+        node_configs = [self.get_node_config(cluster, pool) for pool in cluster.node_pools]
+        for node_config in node_configs:
+            if "accelerators" in node_config:
+                node_config["imageType"] = "UBUNTU"
+        autoscaling = [self.get_autoscaling(pool) for pool in cluster.node_pools]
+        if len(cluster.node_pools) == 1 and not autoscaling[0]:
+            spec = {"name": cluster.name_hyphenated, "initialNodeCount": cluster.num_nodes,
+                    "nodeConfig": node_configs[0]}
+        else:
+            spec = {"name": cluster.name_hyphenated, "nodePools": [
+                dict({"name": pool["name"], "initialNodeCount": pool["num_nodes"], "config": node_config},
+                     **({"autoscaling": a} if a else {}))
+                for pool, node_config, a in zip(cluster.node_pools, node_configs, autoscaling)
+            ]}
+        if cluster.num_gpus > 0:
+            spec.update({
+                "enableKubernetesAlpha": True,
+                "initialClusterVersion": "1.9.2-gke.1",
+                "loggingService": "logging.googleapis.com",
+                "monitoringService": "monitoring.googleapis.com"
+            })
+        # (not idempotent -> only retried after rate-limit errors)
+        operation = self._call("POST", CONTAINER_API, "/v1/projects/{}/locations/{}/clusters".
+                               format(self.project_id, location), {"cluster": spec},
+                               policy=util.creation_retry_policy)
+
+        def finish():
+            self._wait_for_operation(location, operation)
+            # gcloud would have done this automatically
+            self.get_credentials(cluster, self.project_id)
+
+        return Operation("create-cluster " + cluster.name_hyphenated, finish)
+
+    def resize_node_pool(self, cluster, pool, num_nodes, min_nodes=None):
+        location = cluster.location or self._get_default_zone()
+        path = "/v1/projects/{}/locations/{}/clusters/{}/nodePools/{}".\
+            format(self.project_id, location, cluster.name_hyphenated, cluster.get_cloud_pool_name(pool))
+        # lower (or restore) the autoscaler's bound first, so it doesn't undo the resize (one operation at a time)
+        autoscaling = self.get_autoscaling(pool, min_nodes)
+        if min_nodes is not None and autoscaling:
+            self._wait_for_operation(location, self._call("POST", CONTAINER_API, path + ":setAutoscaling",
+                                                          {"autoscaling": autoscaling}))
+        self._wait_for_operation(location, self._call("POST", CONTAINER_API, path + ":setSize",
+                                                      {"nodeCount": num_nodes}))
+
+    def delete_cluster(self, cluster):
+        location = cluster.location or self._get_default_zone()
+        self._call("DELETE", CONTAINER_API, "/v1/projects/{}/locations/{}/clusters/{}".
+                   format(self.project_id, location, cluster.name_hyphenated))
+
+    def _wait_for_operation(self, location, operation, poll_interval=5.0, timeout=1800):
+        # polls the operation until it's done (or the timeout is up; the operation itself goes on in the cloud)
+        deadline = time.time() + timeout
+        while operation.get("status") != "DONE":
+            if time.time() + poll_interval > deadline:
+                raise util.TFCliError("ERROR: Operation {} did not finish within {}s!".format(operation.get("name"),
+                                                                                            timeout))
+            time.sleep(poll_interval)
+            operation = self._call("GET", CONTAINER_API, "/v1/projects/{}/locations/{}/operations/{}".
+                                   format(self.project_id, location, operation.get("name")))
+        if operation.get("error") or operation.get("statusMessage"):
+            raise util.TFCliError("ERROR: Operation {} failed: {}".
+                                  format(operation.get("name"), operation.get("error") or
+                                         operation.get("statusMessage")))
+        return operation
+
+    def _get_default_zone(self):
+        if self.default_zone is None:
+            self.default_zone = util.syscall_with_retry("gcloud config get-value compute/zone", merge_err=False).\
+                output.strip()
+            if not self.default_zone:
+                raise util.TFCliError("ERROR: No location given for cluster and no default zone set in gcloud "
+                                      "(`gcloud config set compute/zone [zone]`)!")
+        return self.default_zone
+
+    def _get_token(self, refresh=False):
+        with self.lock:
+            if refresh or self.token is None or time.time() - self.token_time > self.TOKEN_LIFETIME:
+                self.token = util.syscall_with_retry("gcloud auth print-access-token", merge_err=False).\
+                    output.strip()
+                self.token_time = time.time()
+            return self.token
+
+    def _list(self, host, path, key, params=None, aggregated=False):
+        """
+        Returns: All items of a (paginated) list call. For aggregated lists, the per-zone dicts are returned.
+        """
+        params = dict(params or {})
+        items = []
+        while True:
+            response = self._call("GET", host, path + ("?" + urlencode(params) if params else ""))
+            page = response.get(key, {} if aggregated else [])
+            items.extend(page.values() if aggregated else page)
+            if not response.get("nextPageToken"):
+                return items
+            params["pageToken"] = response["nextPageToken"]
+
+    def _call(self, method, host, path, body=None, policy=None):
+        """
+        Sends an API request (with retries according to `policy`, default: `util.retry_policy`) and returns the
+        parsed json response.
+        """
+        policy = policy or util.retry_policy
+        breaker = util.get_circuit_breaker(host)
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        attempt = 0
+        refreshed = False
+        while True:
+            attempt += 1
+            breaker.before_call()
+            headers = {"Authorization": "Bearer " + self._get_token(), "Content-Type": "application/json"}
+            start = time.time()
+            try:
+                status, response = self.pool.request(method, host, path, data, headers)
+            except (http_client.HTTPException, socket.error) as e:
+                status, response = None, str(e).encode("utf-8")
+            self._record(method, host, path, status, response, time.time() - start)
+            # token expired -> get a new one and try again right away
+            if status == 401 and not refreshed:
+                self._get_token(refresh=True)
+                refreshed = True
+                attempt -= 1
+                continue
+            failure = self.classify_status(status)
+            breaker.after_call(failure)
+            if failure == util.SUCCESS:
+                return json.loads(response.decode("utf-8")) if response else {}
+            elif failure not in policy.retry_on or attempt >= policy.max_attempts:
+                raise util.TFCliError("ERROR: {} https://{}{} failed (HTTP status {}): {}".
+                                      format(method, host, path, status, response.decode("utf-8", "replace")))
+            time.sleep(policy.delay(attempt, failure))
+
+    @staticmethod
+    def classify_status(status):
+        """
+        Returns: The failure class (see `util.classify_failure`) of an HTTP status (None for connection errors).
+        """
+        if status is None or status in [500, 502, 503, 504]:
+            return util.TRANSIENT
+        elif status == 429:
+            return util.RATE_LIMITED
+        elif 200 <= status < 300:
+            return util.SUCCESS
+        return util.FATAL
+
+    @staticmethod
+    def _record(method, host, path, status, response, duration):
+        # API calls show up in the profile like commands
+        if profiler.enabled:
+            command = "https {} {}{}".format(method.lower(), host, path.split("?")[0])
+            returncode = 0 if status and 200 <= status < 300 else status
+            profiler.record_command(SyscallResult(command, returncode, response, duration=duration),
+                                    profiler.current_phase())
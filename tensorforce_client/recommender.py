@@ -0,0 +1,117 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Recommends the cheapest cluster (node shape and number of nodes) for an experiment: For every machine type (and
+GPU type and number of GPUs per node, if the experiment's pods need GPUs) of a price table (see
+`machine_types.load_price_table`), finds the smallest number of nodes that all of the experiment's pods fit onto
+(see `scheduler.ClusterCapacity`) and ranks the resulting clusters by their price per hour.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from tensorforce_client.scheduler import ClusterCapacity
+
+
+# the numbers of GPUs per node to consider
+GPUS_PER_NODE = [1, 2, 4, 8]
+
+
+class Recommendation(object):
+    """
+    A cluster (node shape and number of nodes) that fits all pods of an experiment.
+    """
+
+    def __init__(self, machine_type, num_nodes, gpus_per_node, gpu_type, price, cpu_shares):
+        """
+        Args:
+            machine_type (str): The nodes' machine type.
+            num_nodes (int): The number of nodes.
+            gpus_per_node (int): The number of GPUs per node.
+            gpu_type (Optional[str]): The GPU type (None if no GPUs).
+            price (float): The price of the whole cluster (USD per hour).
+            cpu_shares (List[float]): The expected number of vCPUs per pod (in the order of the pods): Each node's
+                allocatable vCPUs split among its pods in proportion to their requests.
+        """
+        self.machine_type = machine_type
+        self.num_nodes = num_nodes
+        self.gpus_per_node = gpus_per_node
+        self.gpu_type = gpu_type
+        self.price = price
+        self.cpu_shares = cpu_shares
+
+    def get_spec(self, name):
+        """
+        Returns: A cluster spec (dict) for this recommendation (see `Cluster`).
+        """
+        spec = {"name": name, "machine_type": self.machine_type, "num_nodes": self.num_nodes}
+        if self.gpus_per_node > 0:
+            spec.update(gpus_per_node=self.gpus_per_node, gpu_type=self.gpu_type)
+        return spec
+
+
+def recommend_clusters(pods, machine_types, gpu_types, gpu_type=None, num=5):
+    """
+    Args:
+        pods (List[dict]): The experiment's pods (see `Experiment.get_pods`).
+        machine_types (dict): The machine types to choose from (see `machine_types.load_price_table`).
+        gpu_types (dict): The GPU types to choose from (see `machine_types.load_price_table`).
+        gpu_type (Optional[str]): Only consider this GPU type (if the pods need GPUs at all).
+        num (int): The max. number of recommendations to return.
+
+    Returns: List of the cheapest Recommendations (cheapest first; ties go to fewer nodes, then more vCPUs per pod).
+    """
+    # recommendations are single-pool clusters: the pods' pinning to the node pools of their current cluster
+    # doesn't apply
+    pods = [dict(pod, node_pool=None) for pod in pods]
+    needs_gpus = any(pod["gpus"] > 0 for pod in pods)
+    if needs_gpus:
+        gpu_options = [(t, n) for t, settings in sorted(gpu_types.items()) if gpu_type in [None, t]
+                       for n in GPUS_PER_NODE if n <= settings.get("max_per_node", 8)]
+    else:
+        gpu_options = [(None, 0)]
+
+    recommendations = []
+    for machine_type, settings in sorted(machine_types.items()):
+        # GPUs can only be attached to n1 (or custom) machine types
+        if needs_gpus and not machine_type.startswith(("n1-", "custom-")):
+            continue
+        for gpu, gpus_per_node in gpu_options:
+            # more nodes than pods would never be needed
+            for num_nodes in range(1, len(pods) + 1):
+                capacity = ClusterCapacity({"name": "recommendation", "num_nodes": num_nodes,
+                                            "gpus_per_node": gpus_per_node},
+                                           machine_resources=(settings["cpus"], settings["memory"]))
+                assignment = capacity.place(pods)
+                if assignment is None:
+                    continue
+                price = num_nodes * (settings["price"] + gpus_per_node * (gpu_types[gpu]["price"] if gpu else 0.0))
+                recommendations.append(Recommendation(machine_type, num_nodes, gpus_per_node, gpu, price,
+                                                      _cpu_shares(pods, assignment, capacity.capacity)))
+                break
+
+    recommendations.sort(key=lambda r: (round(r.price, 4), r.num_nodes, -min(r.cpu_shares or [0.0])))
+    return recommendations[:num]
+
+
+def _cpu_shares(pods, assignment, nodes):
+    # each node's allocatable vCPUs split among its pods in proportion to their requests
+    requested = [0.0] * len(nodes)
+    for pod, n in zip(pods, assignment):
+        requested[n] += pod["cpu"]
+    return [nodes[n]["cpu"] * pod["cpu"] / requested[n] if requested[n] > 0 else 0.0
+            for pod, n in zip(pods, assignment)]
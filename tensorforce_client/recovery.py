@@ -0,0 +1,256 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Recovery of experiments whose tasks got lost, e.g. because their (preemptible) node was taken away: The experiment's
+Jobs run their pods with `restartPolicy: Never`, so a worker or parameter server whose pod failed, got evicted or
+was replaced on another node would otherwise stall a distributed run forever.
+
+A `RecoveryLoop` (see `tfcli experiment watch`) regularly syncs the experiment's results (incl. the model
+checkpoints) to the local disk, so that they survive the loss of a node. Once it finds lost tasks, it recreates
+their Jobs. Lost workers of a distributed experiment simply rejoin the parameter servers, which still hold the
+model. If the model itself is lost (a parameter server or the only worker of a single or multi-threaded
+experiment), the latest checkpoint is copied back onto all nodes and all tasks are recreated with `--load`. Every
+recovery is recorded in the experiment's `recoveries` (incl. the training time lost since the checkpoint).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import calendar
+import json
+import os
+import re
+import time
+import tensorforce_client.utils as util
+from tensorforce_client.cluster import get_cluster_from_string
+
+
+# pods created this many seconds after their Job are replacements of lost pods (e.g. after their node went away)
+REPLACEMENT_GRACE = 120
+
+
+def get_lost_tasks(experiment):
+    """
+    Asks kubectl for the status of the given Experiment's Jobs and pods.
+
+    Args:
+        experiment (Experiment): The (running) Experiment.
+
+    Returns: Tuple of (dict of reasons (str) by lost task ("[job]-[task index]"), set of completed tasks). A task
+        is lost if its Job failed, one of its pods failed (e.g. got evicted) or its pod had to be replaced by a new
+        one. None instead of the tuple if kubectl can't tell.
+    """
+    result = util.syscall("kubectl get jobs,pods -l name={} -o json".format(experiment.name_hyphenated),
+                          return_outputs="as_result", merge_err=False)
+    try:
+        items = json.loads(result.output).get("items", []) if result.ok else None
+    except ValueError:
+        items = None
+    if items is None:
+        return None
+
+    jobs = {}
+    lost = {}
+    completed = set()
+    for item in items:
+        labels = item.get("metadata", {}).get("labels", {})
+        if labels.get("job") not in ["worker", "ps"]:
+            continue
+        task = "{}-{}".format(labels["job"], labels.get("task"))
+        status = item.get("status", {})
+        if item.get("kind") == "Job":
+            jobs[task] = _timestamp(item["metadata"].get("creationTimestamp"))
+            conditions = {c.get("type"): c for c in status.get("conditions", []) if c.get("status") == "True"}
+            if "Complete" in conditions:
+                completed.add(task)
+            elif "Failed" in conditions:
+                lost[task] = "Job failed ({})".format(conditions["Failed"].get("reason", "unknown reason"))
+            elif status.get("failed"):
+                lost.setdefault(task, "{} pod(s) failed".format(status["failed"]))
+        elif status.get("phase") == "Failed":
+            terminated = [c.get("state", {}).get("terminated", {}) for c in status.get("containerStatuses", [])]
+            reason = status.get("reason") or next((t.get("reason") for t in terminated if t.get("reason")), "Failed")
+            lost[task] = "pod {} {} on node {}".format(item["metadata"].get("name"), reason,
+                                                       item.get("spec", {}).get("nodeName"))
+    # replacement pods (the job controller recreates pods that were deleted along with their node, but without
+    # restoring the model)
+    for item in items:
+        labels = item.get("metadata", {}).get("labels", {})
+        task = "{}-{}".format(labels.get("job"), labels.get("task"))
+        if item.get("kind") == "Pod" and task in jobs and task not in lost and task not in completed and \
+                _timestamp(item["metadata"].get("creationTimestamp")) - jobs[task] > REPLACEMENT_GRACE:
+            lost[task] = "pod {} replaced a lost pod".format(item["metadata"].get("name"))
+    return lost, completed
+
+
+def find_latest_checkpoint(directory):
+    """
+    Finds the most recent tensorflow checkpoint below the given (local) directory.
+
+    Args:
+        directory (str): The directory to search (e.g. an experiment's results directory).
+
+    Returns: Tuple of (the checkpoint's directory, its global step (None if unknown), the time it was written at)
+        or None if there is no checkpoint.
+    """
+    latest = None
+    for root, _, files in os.walk(directory):
+        if "checkpoint" not in files:
+            continue
+        file = os.path.join(root, "checkpoint")
+        with open(file) as f:
+            match = re.search(r'^model_checkpoint_path:\s*"([^"]*)"', f.read(), re.MULTILINE)
+        if not match:
+            continue
+        step = re.search(r'-(\d+)$', match.group(1))
+        mtime = os.path.getmtime(file)
+        if latest is None or mtime > latest[2]:
+            latest = (root, int(step.group(1)) if step else None, mtime)
+    return latest
+
+
+class RecoveryLoop(object):
+    """
+    Watches a running experiment and recreates its lost tasks from the latest checkpoint (see module docstring).
+    """
+
+    def __init__(self, experiment, interval=60.0, sync_interval=600.0):
+        """
+        Args:
+            experiment (Experiment): The (running) Experiment to watch.
+            interval (float): The number of seconds between two checks for lost tasks.
+            sync_interval (float): The number of seconds between two syncs of the experiment's results.
+        """
+        self.experiment = experiment
+        self.interval = interval
+        self.sync_interval = sync_interval
+        self.last_sync = None
+
+    def run(self):
+        """
+        Checks for lost tasks (and syncs the results) until the experiment is no longer running or all its workers
+        are done.
+        """
+        print("+ Watching experiment {} for lost tasks (every {:g}s) ...".format(self.experiment.name, self.interval))
+        while True:
+            if not self.check():
+                return
+            time.sleep(self.interval)
+
+    def check(self):
+        """
+        Checks the experiment once: recovers lost tasks or - if none are lost and it's time to - syncs the results.
+
+        Returns: Whether the experiment is still running.
+        """
+        # the experiment may have been paused or stopped in the meantime
+        running_json = self.experiment.path + self.experiment.running_json_file
+        if os.path.isfile(running_json):
+            with open(running_json) as f:
+                self.experiment.status = json.load(f).get("status")
+        if self.experiment.status != "running":
+            print("+ Experiment {} is {}. Done watching.".format(self.experiment.name, self.experiment.status))
+            return False
+
+        status = get_lost_tasks(self.experiment)
+        if status is None:
+            print("WARNING: Could not get the status of experiment {}'s tasks. Trying again later.".
+                  format(self.experiment.name))
+            return True
+        lost, completed = status
+        workers = ["worker-{}".format(i) for i in range(self.experiment.num_workers
+                                                        if self.experiment.run_mode == "distributed" else 1)]
+        if all(w in completed for w in workers):
+            print("+ All workers of experiment {} are done.".format(self.experiment.name))
+            self.sync()
+            return False
+        if lost:
+            try:
+                self.recover(lost)
+            # e.g. a replacement node that is not up yet
+            except util.TFCliError as e:
+                print("WARNING: Could not recover experiment {}: {} Trying again later.".
+                      format(self.experiment.name, e))
+        elif self.last_sync is None or time.time() - self.last_sync >= self.sync_interval:
+            self.sync()
+        return True
+
+    def sync(self):
+        """
+        Syncs the experiment's results (incl. the model checkpoints) to the local disk. Nodes that can't be reached
+        are skipped (with a warning).
+        """
+        try:
+            self.experiment.download()
+        except util.TFCliError as e:
+            print("WARNING: Could not sync all results of experiment {}: {}".format(self.experiment.name, e))
+        self.last_sync = time.time()
+
+    def recover(self, lost):
+        """
+        Recreates the given lost tasks (from the latest checkpoint, if the model itself got lost) and records the
+        recovery.
+
+        Args:
+            lost (dict): The reasons (str) by lost task ("[job]-[task index]", see `get_lost_tasks`).
+
+        Returns: The recovery record (dict, see `Experiment.recoveries`).
+        """
+        experiment = self.experiment
+        for task, reason in sorted(lost.items()):
+            print("WARNING: Task {} of experiment {} is lost: {}.".format(task, experiment.name, reason))
+        now = time.time()
+        cluster = get_cluster_from_string(experiment.cluster.get("name"))
+        # (replaced nodes come with empty disks)
+        experiment.prepare_nodes(cluster)
+
+        tasks = sorted(lost)
+        # distributed workers simply rejoin the parameter servers, which still hold the model
+        rollback = experiment.run_mode != "distributed" or any(t.startswith("ps-") for t in tasks)
+        checkpoint = None
+        if rollback:
+            # get what's left of the results (incl. the latest checkpoint) from the surviving nodes
+            self.sync()
+            checkpoint = experiment.restore_checkpoint(cluster)
+            # without the parameter servers' variables, all tasks have to start over
+            if experiment.run_mode == "distributed":
+                tasks = ["worker-{}".format(i) for i in range(experiment.num_workers)] + \
+                    ["ps-{}".format(i) for i in range(experiment.num_parameter_servers)]
+        experiment.recreate_tasks(cluster, tasks, load=checkpoint is not None)
+
+        record = {
+            "time": now,
+            "tasks": tasks,
+            "reasons": dict(lost),
+            "checkpoint": checkpoint[0] if checkpoint else None,
+            "checkpoint_step": checkpoint[1] if checkpoint else None,
+            # the training time since the checkpoint (0 if the model survived, unknown if there was no checkpoint)
+            "lost_seconds": 0.0 if not rollback else max(now - checkpoint[2], 0.0) if checkpoint else None
+        }
+        experiment.recoveries.append(record)
+        experiment.write_json_file(file=experiment.path + experiment.running_json_file)
+        print("+ Recovered {} task(s) of experiment {} ({}).".format(
+            len(tasks), experiment.name, "model rolled back by about {:.1f}min of training".format(
+                record["lost_seconds"] / 60) if checkpoint else "model kept" if not rollback else "model lost"))
+        return record
+
+
+def _timestamp(value):
+    # k8s timestamps (e.g. "2018-03-01T12:00:00Z") as seconds since the epoch
+    if not value:
+        return 0.0
+    return calendar.timegm(time.strptime(value, "%Y-%m-%dT%H:%M:%SZ"))
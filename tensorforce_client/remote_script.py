@@ -0,0 +1,138 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Remote scripts: several shell commands (and uploads of small local files) compiled into a single script that is
+executed on a node with one ssh round trip (see `Cluster.ssh_parallel(batch=True)`). Each step reports its exit
+code (and timing) through marker lines in the output, so the results can be split up per step again.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import base64
+import os
+import re
+import shlex
+
+
+# the max. size of a local file to be embedded into a script (bigger files are scp'd separately)
+MAX_UPLOAD_BYTES = 64 * 1024
+# the max. length of the (encoded) script command (Windows' cmd can't handle more than ~8k chars)
+MAX_COMMAND_LENGTH = 6000 if os.name == "nt" else 256 * 1024
+
+
+class RemoteScript(object):
+    """
+    A sequence of steps (shell commands or file uploads) to be run on one node in a single ssh session. Steps are
+    run in order, the script stops at the first failing step.
+    """
+
+    MARKER = "__TFCLI_STEP__"
+
+    def __init__(self):
+        # the items (as given to `ssh_parallel`) of all steps
+        self.items = []
+        self.steps = []
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def can_upload(source):
+        """
+        Returns: Whether the given local file can be embedded into a script.
+        """
+        return os.path.isfile(source) and os.path.getsize(source) <= MAX_UPLOAD_BYTES
+
+    def add_command(self, item, command):
+        """
+        Adds a shell command step.
+
+        Args:
+            item (any): The item to report the step's result for.
+            command (str): The shell command.
+        """
+        self._add(item, "( {}\n)".format(command))
+
+    def add_upload(self, item, source, target):
+        """
+        Adds a step writing the content of a (small) local file to a path on the node.
+
+        Args:
+            item (any): The item to report the step's result for.
+            source (str): The local file.
+            target (str): The remote path (file or existing directory).
+        """
+        with open(source, "rb") as f:
+            content = base64.b64encode(f.read()).decode("ascii")
+        self._add(item, "__t={}; [ -d \"$__t\" ] && __t=\"$__t/\"{}\nprintf '%s' '{}' | base64 -d > \"$__t\"".
+                  format(shlex.quote(target), shlex.quote(os.path.basename(source)), content))
+
+    def command(self):
+        """
+        Returns: The single-line shell command (str) to be run via ssh that executes the whole script.
+        """
+        script = "\n".join(self.steps) + "\n"
+        return "echo {} | base64 -d | bash".format(base64.b64encode(script.encode("utf-8")).decode("ascii"))
+
+    def fits(self, step_size=0):
+        """
+        Returns: Whether the script's command (plus an additional step of the given size) is still short enough.
+        """
+        return len(self.command()) + step_size * 4 // 3 < MAX_COMMAND_LENGTH
+
+    def parse(self, output, returncode):
+        """
+        Splits the output of the executed script up into the results of its steps.
+
+        Args:
+            output (str): The (merged) outputs of the script.
+            returncode (Optional[int]): The exit code of the ssh command.
+
+        Returns: List of tuples (item, exit code, duration in sec, output) for all steps that were started.
+        """
+        results = []
+        current = None
+        # outputs before the first step (e.g. ssh warnings) go to the first step
+        lines = []
+        for line in output.splitlines(True):
+            match = re.match(r'^' + self.MARKER + r' (\d+) (start|exit (\d+)) (\d+)\s*$', line)
+            if not match:
+                lines.append(line)
+            elif match.group(2) == "start":
+                current = [int(match.group(1)), int(match.group(4))]
+            elif current is not None:
+                step_output = "".join(lines)
+                results.append((self.items[current[0]], int(match.group(3)),
+                                (int(match.group(4)) - current[1]) / 1e9,
+                                step_output[:-1] if step_output.endswith("\n") else step_output))
+                current = None
+                lines = []
+        # the session ended within a step (or before the first one)
+        if current is not None or len(results) == 0:
+            index = current[0] if current is not None else 0
+            results.append((self.items[index], returncode or None, 0.0, "".join(lines)))
+        return results
+
+    def _add(self, item, code):
+        index = len(self.items)
+        self.items.append(item)
+        # the exit marker starts on a new line even if the step's output doesn't end with one (`parse` removes
+        # that newline again)
+        self.steps.append("echo \"{m} {i} start $(date +%s%N)\"\n{code}\n__rc=$?\n"
+                          "printf '\\n{m} {i} exit %s %s\\n' $__rc $(date +%s%N)\n[ $__rc -eq 0 ] || exit $__rc".
+                          format(m=self.MARKER, i=index, code=code))
@@ -0,0 +1,229 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Bin-packing of several experiments onto the (running) clusters of a project: Each experiment's pods (see
+`Experiment.get_pods`) need a certain number of vCPUs, memory and GPUs on one node (of a certain node pool, if the
+pod is pinned to one). Experiments are placed
+biggest first onto the fullest cluster whose nodes still have room for all of their pods (first-fit decreasing).
+Only experiments that don't fit anywhere get a new cluster (created from their own cluster spec), which later
+experiments can then be packed onto as well.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import copy
+import tensorforce_client.utils as util
+from tensorforce_client.machine_types import get_machine_type_resources
+
+
+# the vCPUs and memory (in Gb) per node that are not available to pods (kubelet, kube-proxy, logging, etc..)
+SYSTEM_RESERVED_CPU = 0.25
+SYSTEM_RESERVED_MEMORY = 1.0
+
+
+class ClusterCapacity(object):
+    """
+    The free resources on the nodes of a running (or planned) cluster.
+    """
+
+    def __init__(self, spec, owner=None, machine_resources=None):
+        """
+        Args:
+            spec (dict): The cluster's spec (see `Cluster.get_spec` or `util.get_cluster_specs`).
+            owner (Optional[Experiment]): The experiment that this (not yet created) cluster is planned for.
+                None for running clusters.
+            machine_resources (Optional[tuple]): The (vCPUs, memory in Gb) of the cluster's machine type
+                (default: look up the spec's machine type).
+        """
+        self.spec = spec
+        self.name = spec["name"].replace("_", "-")
+        self.owner = owner
+        # the nodes of all node pools (a cluster without `node_pools` is one pool)
+        node_pools = spec.get("node_pools") or [{"name": None, "machine_type": spec.get("machine_type"),
+                                                 "num_nodes": spec.get("num_nodes"),
+                                                 "gpus_per_node": spec.get("gpus_per_node")}]
+        self.nodes = []
+        for pool in node_pools:
+            cpus, memory = machine_resources or get_machine_type_resources(pool.get("machine_type"))
+            self.nodes.extend({"cpu": max(cpus - SYSTEM_RESERVED_CPU, 0.0),
+                               "memory": max(memory - SYSTEM_RESERVED_MEMORY, 0.0),
+                               "gpus": pool.get("gpus_per_node") or 0,
+                               "pool": pool.get("name")} for _ in range(pool.get("num_nodes") or 0))
+        self.capacity = copy.deepcopy(self.nodes)
+        # names of the experiments placed on this cluster
+        self.experiments = []
+
+    @property
+    def new(self):
+        return self.owner is not None
+
+    def fits(self, pods):
+        """
+        Returns: Whether all given pods (see `Experiment.get_pods`) fit onto the cluster's free resources.
+        """
+        return self._place(pods) is not None
+
+    def place(self, pods):
+        """
+        Returns: List of the node indices (one per pod, in the order of `pods`) the given pods would be placed on
+            (without reserving anything) or None if they don't all fit.
+        """
+        placed = self._place(pods)
+        return placed[1] if placed is not None else None
+
+    def add(self, experiment_name, pods, force=False):
+        """
+        Reserves the resources of the given pods on the cluster's nodes.
+
+        Args:
+            experiment_name (str): The name of the experiment the pods belong to.
+            pods (List[dict]): The experiment's pods (see `Experiment.get_pods`).
+            force (bool): Whether to add the experiment even if its pods don't fit (its pods' resources are then
+                not reserved).
+
+        Returns: Whether the pods fit.
+        """
+        placed = self._place(pods)
+        if placed is None and not force:
+            return False
+        if placed is not None:
+            self.nodes = placed[0]
+        self.experiments.append(experiment_name)
+        return placed is not None
+
+    def utilization(self):
+        """
+        Returns: The share (0.0 to 1.0) of the cluster's allocatable vCPUs that are already reserved.
+        """
+        total = sum(n["cpu"] for n in self.capacity)
+        return 1.0 - sum(n["cpu"] for n in self.nodes) / total if total > 0 else 1.0
+
+    def _place(self, pods):
+        # first-fit decreasing of the pods onto a copy of the nodes: (nodes, node index per pod) or None if some pod
+        # doesn't fit
+        nodes = copy.deepcopy(self.nodes)
+        assignment = [None] * len(pods)
+        for i in sorted(range(len(pods)), key=lambda i: (pods[i]["gpus"], pods[i]["cpu"], pods[i]["memory"]),
+                        reverse=True):
+            for n, node in enumerate(nodes):
+                # pods pinned to a node pool only go onto that pool's nodes
+                if pods[i].get("node_pool") not in [None, node["pool"]]:
+                    continue
+                if all(node[r] >= pods[i][r] for r in ["cpu", "memory", "gpus"]):
+                    for r in ["cpu", "memory", "gpus"]:
+                        node[r] -= pods[i][r]
+                    assignment[i] = n
+                    break
+            else:
+                return None
+        return nodes, assignment
+
+
+class Placement(object):
+    """
+    Where an experiment is going to run.
+    """
+
+    def __init__(self, experiment, cluster, fits=True):
+        self.experiment = experiment
+        self.cluster = cluster
+        self.fits = fits
+
+
+class Scheduler(object):
+    """
+    Packs experiments onto running clusters (see module docstring).
+    """
+
+    def __init__(self, running_clusters, running_experiments=None):
+        """
+        Args:
+            running_clusters (dict): The project's clusters (see `util.get_cluster_specs`). Clusters that are not
+                in status RUNNING are ignored.
+            running_experiments (Optional[List[Experiment]]): The experiments that are already running (their
+                resources are taken from their clusters' capacities).
+        """
+        self.clusters = []
+        for name, spec in sorted(running_clusters.items()):
+            if spec.get("status") != "RUNNING":
+                continue
+            try:
+                self.clusters.append(ClusterCapacity(spec))
+            except util.TFCliError as e:
+                print("WARNING: Not scheduling onto cluster {}: {}".format(name, e))
+        for experiment in running_experiments or []:
+            cluster = self.get_cluster(experiment.cluster.get("name", ""))
+            if cluster:
+                cluster.add(experiment.name, experiment.get_pods(), force=True)
+
+    def get_cluster(self, name):
+        """
+        Returns: The ClusterCapacity of the given cluster or None if the cluster is unknown (or not running).
+        """
+        name = name.replace("_", "-")
+        return next((c for c in self.clusters if c.name == name), None)
+
+    def schedule(self, experiments):
+        """
+        Places the given experiments onto the clusters (biggest experiments first, each onto the fullest cluster
+        that still has room for it). Experiments that don't fit anywhere get a new cluster from their own cluster
+        spec (renamed to [cluster]-[experiment] if a cluster of that name already exists).
+
+        Args:
+            experiments (List[Experiment]): The experiments to place (not running yet).
+
+        Returns: List of Placement objects (in the order of `experiments`).
+        """
+        placements = {}
+        for experiment in sorted(experiments, key=lambda e: _size(e.get_pods()), reverse=True):
+            pods = experiment.get_pods()
+            target = None
+            for cluster in sorted(self.clusters, key=lambda c: c.utilization(), reverse=True):
+                if cluster.add(experiment.name, pods):
+                    target = cluster
+                    break
+            fits = True
+            if target is None:
+                spec = dict(experiment.cluster or {"name": experiment.name_hyphenated})
+                if self.get_cluster(spec["name"]):
+                    spec["name"] = "{}-{}".format(spec["name"], experiment.name_hyphenated)
+                target = ClusterCapacity(spec, owner=experiment)
+                self.clusters.append(target)
+                fits = target.add(experiment.name, pods, force=True)
+            placements[experiment.name] = Placement(experiment, target, fits)
+        return [placements[e.name] for e in experiments]
+
+    @staticmethod
+    def describe(placements):
+        """
+        Returns: A printable table (str) of the given placements.
+        """
+        lines = ["{:<24} {:<32} {:>5} {:>6} {:>8} {:>5}".format("EXPERIMENT", "CLUSTER", "PODS", "vCPUs", "MEM(Gb)",
+                                                              "GPUs")]
+        for p in placements:
+            pods = p.experiment.get_pods()
+            lines.append("{:<24} {:<32} {:>5} {:>6.2f} {:>8.2f} {:>5}".format(
+                p.experiment.name, p.cluster.name + (" (new)" if p.cluster.owner is p.experiment else ""),
+                len(pods), sum(pod["cpu"] for pod in pods), sum(pod["memory"] for pod in pods),
+                sum(pod["gpus"] for pod in pods)))
+        return "\n".join(lines)
+
+
+def _size(pods):
+    # sort key for experiments: GPUs first, then vCPUs, then memory
+    return tuple(sum(p[r] for p in pods) for r in ["gpus", "cpu", "memory"])
@@ -0,0 +1,168 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Multiplexed ssh connections to cluster nodes. The first ssh to a node goes through `gcloud compute ssh` (which
+takes care of keys and host aliases) and leaves an OpenSSH master connection (ControlMaster) behind. All further
+ssh/scp commands to that node then run through plain `ssh`/`scp` over the master's control socket, which saves
+the gcloud start-up, the key checks and the TCP+SSH handshakes. All masters are closed at exit (and would
+otherwise exit by themselves after being idle for a while). Not available on Windows.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import tensorforce_client.utils as util
+
+
+# the prefix of the (random) control directory in the temp dir (holding the master connections' sockets)
+CONTROL_DIR_PREFIX = "tfcli-ssh-"
+
+
+class SSHConnectionManager(object):
+    """
+    Keeps one multiplexed ssh (master) connection per node.
+    """
+
+    def __init__(self, persist=600):
+        """
+        Args:
+            persist (int): The number of seconds an idle master connection stays alive (in case we don't get to
+                close it ourselves).
+        """
+        self.enabled = os.name != "nt"
+        self.persist = persist
+        # created lazily (unix socket paths must be short -> temp dir); private to this process (and its masters),
+        # the cassette normalizes its random path (see `cassette.Cassette.key`)
+        self.control_dir = None
+        # control socket paths by node name (only for established connections)
+        self.connections = {}
+        # nodes we could not connect to (we don't try again)
+        self.failed = set()
+        self.node_locks = {}
+        self.lock = threading.Lock()
+
+    def connect(self, node, location=None):
+        """
+        Makes sure there is a master connection to the given node (establishes it, if not).
+
+        Args:
+            node (str): The name of the node (compute instance).
+            location (Optional[str]): The zone of the node.
+
+        Returns: The control socket's path or None if the node can't be reached through a multiplexed connection
+            (the caller should then use `gcloud compute ssh/scp` directly).
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            if node in self.connections:
+                return self.connections[node]
+            if node in self.failed:
+                return None
+            if self.control_dir is None:
+                self.control_dir = tempfile.mkdtemp(prefix=CONTROL_DIR_PREFIX)
+                atexit.register(self.close_all)
+            node_lock = self.node_locks.setdefault(node, threading.Lock())
+        # only one thread establishes the connection, all others wait for it
+        with node_lock:
+            if node in self.connections:
+                return self.connections[node]
+            control_path = os.path.join(self.control_dir, hashlib.md5(node.encode("utf-8")).hexdigest()[:12])
+            result = util.syscall_with_retry(
+                "gcloud compute ssh {} {} --ssh-flag=-oControlMaster=auto --ssh-flag=-oControlPath={} "
+                "--ssh-flag=-oControlPersist={} --command true".
+                format(node, "--zone=" + location if location else "", control_path, self.persist),
+                raise_on_error=False)
+            # (there is no actual socket when replaying a cassette)
+            replaying = util.engine.cassette is not None and util.engine.cassette.replaying
+            with self.lock:
+                if result.ok and (replaying or os.path.exists(control_path)):
+                    self.connections[node] = control_path
+                else:
+                    print("WARNING: Could not open multiplexed ssh connection to {}. Using gcloud for every "
+                          "command.".format(node))
+                    self.failed.add(node)
+                return self.connections.get(node)
+
+    def ssh_command(self, node, command):
+        """
+        Returns: The plain ssh command (str) running `command` on the node through its master connection.
+        """
+        return "ssh {} {} \"{}\"".format(self._options(node), node, command)
+
+    def scp_command(self, node, source, target):
+        """
+        Returns: The plain scp command (str) copying through the master connection to the node (which must be
+            the host in either source or target).
+        """
+        return "scp {} {} {}".format(self._options(node), source, target)
+
+    @staticmethod
+    def remote_node(*locations):
+        """
+        Returns: The host (node name) of the first remote location ("[host]:[path]") in `locations` or None.
+        """
+        for location in locations:
+            # skip Windows drive letters (e.g. "C:\\...")
+            match = re.match(r'^([\w\-\.]{2,}):', location)
+            if match:
+                return match.group(1)
+        return None
+
+    def check(self, node):
+        """
+        Returns: Whether the node's master connection is (still) alive.
+        """
+        with self.lock:
+            control_path = self.connections.get(node)
+        return control_path is not None and \
+            util.syscall("ssh -oControlPath={} -O check {}".format(control_path, node), return_outputs="as_result").ok
+
+    def drop(self, node):
+        """
+        Forgets about (and closes) a node's master connection, e.g. after it broke.
+        """
+        with self.lock:
+            control_path = self.connections.pop(node, None)
+        if control_path:
+            util.syscall("ssh -oControlPath={} -O exit {}".format(control_path, node), return_outputs="as_result")
+
+    def close_all(self):
+        """
+        Closes the master connections this process opened and removes their control directory.
+        """
+        with self.lock:
+            connections, self.connections = self.connections, {}
+            control_dir, self.control_dir = self.control_dir, None
+        util.syscalls(["ssh -oControlPath={} -O exit {}".format(control_path, node)
+                       for node, control_path in connections.items()])
+        if control_dir:
+            shutil.rmtree(control_dir, ignore_errors=True)
+
+    def _options(self, node):
+        return "-oControlPath={} -oControlMaster=no -oBatchMode=yes".format(self.connections[node])
+
+
+# the global connection manager (used by the gcloud cloud providers)
+ssh_connections = SSHConnectionManager()
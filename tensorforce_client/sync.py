@@ -0,0 +1,335 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Incremental downloads of remote directories (e.g. an experiment's results). A manifest (size, mtime and md5 of
+every file) is kept next to the downloaded files. Each sync lists the remote files (sizes and mtimes), compares
+them with the manifest and only transfers files that are new or changed. Files whose content turns out to be
+unchanged (same md5) are not transferred at all, append-only files (e.g. tensorboard event files) are resumed
+from their last byte offset. All other new or changed files of a node are downloaded as one compressed tar
+stream (see `transfer`) into the node's own staging directory and moved into place from there (see `merge`).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import gzip
+import json
+import os
+import re
+import shlex
+import threading
+import time
+import tensorforce_client.utils as util
+from tensorforce_client import transfer
+from tensorforce_client.merge import md5_file, merge_directories, remove_staging_dirs, staging_dir
+from tensorforce_client.profiling import profiler
+
+
+# the name of the manifest file (in the local directory)
+MANIFEST_FILE = ".manifest.json"
+# files that are only ever appended to (-> resumed from the last byte offset)
+APPEND_ONLY_PATTERNS = ["events.out.tfevents.*", "*.log"]
+
+_DATA_BEGIN = "__TFCLI_DATA_BEGIN__"
+_DATA_END = "__TFCLI_DATA_END__"
+
+
+class Manifest(object):
+    """
+    The size, mtime (of the remote original) and md5 of all files in a local directory that were synced from
+    remote nodes.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): The local directory (holding the manifest file).
+        """
+        self.directory = directory
+        self.file = os.path.join(directory, MANIFEST_FILE)
+        # entries by relative path: dict of size, mtime (str, as reported by the remote `find`), md5 and node
+        self.files = {}
+        self.lock = threading.Lock()
+        if os.path.isfile(self.file):
+            with open(self.file) as f:
+                self.files = json.load(f).get("files", {})
+
+    def get(self, path):
+        """
+        Returns: The entry for the given relative path (None if the file is unknown or has been removed or
+            altered locally).
+        """
+        entry = self.files.get(path)
+        local_file = os.path.join(self.directory, path)
+        if entry is None or not os.path.isfile(local_file) or os.path.getsize(local_file) != entry["size"]:
+            return None
+        return entry
+
+    def local_md5(self, path):
+        """
+        Returns: The md5 of a local file (from the manifest if known, otherwise computed).
+        """
+        entry = self.get(path)
+        if entry is not None and entry.get("md5"):
+            return entry["md5"]
+        return md5_file(os.path.join(self.directory, path))
+
+    def update(self, path, size, mtime, node, md5=None):
+        with self.lock:
+            self.files[path] = {
+                "size": size,
+                "mtime": mtime,
+                "md5": md5 or md5_file(os.path.join(self.directory, path)),
+                "node": node
+            }
+
+    def save(self):
+        tmp_file = self.file + ".tmp"
+        with self.lock:
+            with open(tmp_file, "w") as f:
+                json.dump({"files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.file)
+
+
+class RemoteFile(object):
+    """
+    A file in a node's remote directory (as listed by `find`).
+    """
+
+    def __init__(self, node, path, size, mtime):
+        self.node = node
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+
+class SyncStats(object):
+    def __init__(self):
+        self.new = 0
+        self.changed = 0
+        self.appended = 0
+        self.unchanged = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, what, num_bytes=0):
+        with self.lock:
+            setattr(self, what, getattr(self, what) + 1)
+            self.bytes += num_bytes
+
+    def describe(self):
+        return "{} new, {} changed, {} appended, {} unchanged file(s); {} transferred".format(
+            self.new, self.changed, self.appended, self.unchanged, format_bytes(self.bytes))
+
+
+def sync_directory(cluster, remote_dir, local_dir, append_only=None, compression=None):
+    """
+    Incrementally downloads the content of a directory on all of a cluster's nodes into one local directory.
+    If the same file exists on several nodes, the most recently modified one wins.
+
+    Args:
+        cluster (Cluster): The Cluster whose nodes to download from.
+        remote_dir (str): The directory on the nodes.
+        local_dir (str): The local directory to download into (also holds the manifest).
+        append_only (Optional[List[str]]): Filename patterns of files that are only ever appended to
+            (default: `APPEND_ONLY_PATTERNS`).
+        compression (Optional[str]): The compression for the transfers: "zstd", "gzip" or "none" (default: the
+            best one available locally, see `transfer.default_compression`).
+
+    Returns: SyncStats about the transferred and skipped files.
+    """
+    append_only = APPEND_ONLY_PATTERNS if append_only is None else append_only
+    compression = compression or transfer.default_compression()
+    provider = util.cloud_provider()
+    manifest = Manifest(local_dir)
+    stats = SyncStats()
+    nodes = sorted(cluster.instances)
+
+    with ThreadPoolExecutor(max_workers=util.engine.max_concurrency) as executor:
+        # 1) list all nodes' files
+        listings = list(executor.map(profiler.in_current_phase(
+            lambda n: _list_remote(provider, cluster, n, remote_dir)), nodes))
+        # 2) pick one source per file (the latest version; ties go to the first node)
+        sources = {}
+        for listing in listings:
+            for f in listing:
+                if f.path not in sources or float(f.mtime) > float(sources[f.path].mtime):
+                    sources[f.path] = f
+        # 3) diff against the manifest and transfer what's new (one thread per node)
+        todo = {node: [] for node in nodes}
+        for path, f in sorted(sources.items()):
+            entry = manifest.get(path)
+            if entry and entry["size"] == f.size and entry["mtime"] == f.mtime:
+                stats.add("unchanged")
+            else:
+                todo[f.node].append(f)
+        try:
+            sync_node = profiler.in_current_phase(_sync_node)
+            for future in [executor.submit(sync_node, provider, cluster, node, remote_dir, files, manifest,
+                                           append_only, compression, stats) for node, files in todo.items() if files]:
+                future.result()
+        finally:
+            manifest.save()
+            remove_staging_dirs(local_dir)
+    return stats
+
+
+def find_missing_files(cluster, remote_dir, local_dir):
+    """
+    Compares the files in a directory on all of a cluster's nodes with a local copy (e.g. before the nodes go
+    away).
+
+    Args:
+        cluster (Cluster): The Cluster whose nodes to check.
+        remote_dir (str): The directory on the nodes.
+        local_dir (str): The local directory.
+
+    Returns: The sorted relative paths of all remote files whose latest version is missing locally (or has a
+        different size).
+    """
+    provider = util.cloud_provider()
+    with ThreadPoolExecutor(max_workers=util.engine.max_concurrency) as executor:
+        listings = list(executor.map(profiler.in_current_phase(
+            lambda n: _list_remote(provider, cluster, n, remote_dir)), sorted(cluster.instances)))
+    sources = {}
+    for listing in listings:
+        for f in listing:
+            if f.path not in sources or float(f.mtime) > float(sources[f.path].mtime):
+                sources[f.path] = f
+    return sorted(path for path, f in sources.items() if not os.path.isfile(os.path.join(local_dir, path)) or
+                  os.path.getsize(os.path.join(local_dir, path)) != f.size)
+
+
+def _list_remote(provider, cluster, node, remote_dir):
+    output = provider.ssh(node, "find {} -type f -printf '%s %T@ %P\\n' 2>/dev/null; true".
+                          format(shlex.quote(remote_dir)), location=cluster.location).output
+    files = []
+    for line in output.splitlines():
+        fields = line.split(" ", 2)
+        if len(fields) == 3 and fields[0].isdigit() and fields[2] != MANIFEST_FILE:
+            files.append(RemoteFile(node, fields[2], int(fields[0]), fields[1]))
+    return files
+
+
+def _sync_node(provider, cluster, node, remote_dir, files, manifest, append_only, compression, stats):
+    # compare hashes of files we already have (a single ssh call): full md5s for changed files, md5s of the
+    # already downloaded part for append-only ones
+    checks = []
+    for f in files:
+        if not os.path.isfile(os.path.join(manifest.directory, f.path)):
+            continue
+        local_size = os.path.getsize(os.path.join(manifest.directory, f.path))
+        if f.size > local_size and any(fnmatch.fnmatch(os.path.basename(f.path), p) for p in append_only):
+            checks.append((f, local_size))
+        else:
+            checks.append((f, None))
+    hashes = _remote_hashes(provider, cluster, node, remote_dir, checks) if checks else {}
+
+    downloads = []
+    appends = []
+    for f in files:
+        if f.path not in hashes:
+            downloads.append((f, "new"))
+            continue
+        offset, remote_md5 = hashes[f.path]
+        local_md5 = manifest.local_md5(f.path)
+        # same content (e.g. just touched) -> nothing to transfer
+        if offset is None and remote_md5 == local_md5:
+            manifest.update(f.path, f.size, f.mtime, node, md5=local_md5)
+            stats.add("unchanged")
+        # the local file is a prefix of the remote one -> only get the new bytes
+        elif offset is not None and remote_md5 == local_md5:
+            appends.append((f, offset))
+        else:
+            downloads.append((f, "changed"))
+
+    # all new/changed files as one tar stream (into the node's staging dir, then moved into place)
+    if downloads:
+        staging = staging_dir(manifest.directory, node)
+        transfer.download(node, remote_dir, [f.path for f, _ in downloads], staging,
+                          location=cluster.location, compression=compression)
+        # don't trust the transfer's exit code alone (and don't mistake an old local version for the new one)
+        missing = [f.path for f, _ in downloads if not os.path.isfile(os.path.join(staging, f.path))]
+        if missing:
+            raise util.TFCliError("ERROR: {} file(s) not downloaded from node {} (e.g. {})!".format(
+                len(missing), node, missing[0]))
+        merge_directories([(node, staging)], manifest.directory)
+        for f, what in downloads:
+            manifest.update(f.path, os.path.getsize(os.path.join(manifest.directory, f.path)), f.mtime, node)
+            stats.add(what, f.size)
+    # the new parts of all append-only files with a single ssh call
+    if appends:
+        start = time.time()
+        tails = _remote_tails(provider, cluster, node, remote_dir, appends, compression != "none")
+        for f, offset in appends:
+            local_file = os.path.join(manifest.directory, f.path)
+            with open(local_file, "ab") as file:
+                file.write(tails[f.path])
+            # if the file has grown further since it was listed, we don't know its mtime (-> check it next time)
+            mtime = f.mtime if len(tails[f.path]) == f.size - offset else "0"
+            manifest.update(f.path, os.path.getsize(local_file), mtime, node)
+            stats.add("appended", len(tails[f.path]))
+        profiler.record_transfer(node, "download", len(appends), sum(len(t) for t in tails.values()),
+                                 time.time() - start, "gzip" if compression != "none" else "none")
+
+
+def _remote_hashes(provider, cluster, node, remote_dir, checks):
+    # returns dict: path -> (offset or None, md5 of the file's first [offset] bytes or the whole file)
+    commands = ["cd {}".format(shlex.quote(remote_dir))]
+    for i, (f, offset) in enumerate(checks):
+        commands.append("echo {}; {} {} | md5sum".format(i, "head -c {}".format(offset) if offset else "cat",
+                                                         shlex.quote(f.path)))
+    output = provider.ssh(node, " && ".join(commands[:1]) + " && { " + "; ".join(commands[1:]) + "; }",
+                          location=cluster.location).output
+    hashes = {}
+    index = None
+    for line in output.splitlines():
+        if line.strip().isdigit():
+            index = int(line.strip())
+        elif index is not None and index < len(checks) and line.endswith("-"):
+            f, offset = checks[index]
+            hashes[f.path] = (offset, line.split()[0])
+            index = None
+    return hashes
+
+
+def _remote_tails(provider, cluster, node, remote_dir, appends, compress):
+    # returns dict: path -> the file's bytes from the given offset on (sent base64-encoded, optionally gzipped)
+    commands = ["cd {}".format(shlex.quote(remote_dir))]
+    for i, (f, offset) in enumerate(appends):
+        commands.append("echo {b} {i}; tail -c +{o} {p}{z} | base64; echo {e} {i}".format(
+            b=_DATA_BEGIN, e=_DATA_END, i=i, o=offset + 1, p=shlex.quote(f.path), z=" | gzip -c" if compress else ""))
+    output = provider.ssh(node, " && ".join(commands[:1]) + " && { " + "; ".join(commands[1:]) + "; }",
+                          location=cluster.location).output
+    tails = {}
+    for i, (f, _) in enumerate(appends):
+        match = re.search(r'{b} {i}\n(.*?){e} {i}\n'.format(b=_DATA_BEGIN, e=_DATA_END, i=i), output, re.DOTALL)
+        if not match:
+            raise util.TFCliError("ERROR: Could not get the new content of {} from node {}!".format(f.path, node))
+        data = base64.b64decode(match.group(1))
+        tails[f.path] = gzip.decompress(data) if compress else data
+    return tails
+
+
+def format_bytes(num_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024 or unit == "GB":
+            return "{:.1f}{}".format(num_bytes, unit) if unit != "B" else "{}B".format(num_bytes)
+        num_bytes /= 1024
@@ -20,14 +20,41 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
 import os
 import argparse
 import tensorforce_client.utils as util
 import tensorforce_client.commands as commands
+from tensorforce_client.pool import cluster_pool
+from tensorforce_client.profiling import profiler
+from tensorforce_client.ssh import ssh_connections
 
 
 def main():
     parser = argparse.ArgumentParser(prog="tfcli", usage="%(prog)s")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore the cached cloud inventory (clusters, instances, etc..) and fetch it again.")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="The max. number of gcloud/kubectl/ssh commands to run at the same time (default: 8).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a breakdown of where the time went (per phase and external command) at exit.")
+    parser.add_argument("--profile-json", default=None,
+                        help="Also write the profiling data to this json file (implies --profile).")
+    parser.add_argument("--gcloud-workers", type=int, nargs="?", const=1, default=0,
+                        help="Run gcloud commands in this many warm gcloud processes instead of starting gcloud "
+                             "anew for each command (default if given w/o number: 1).")
+    parser.add_argument("--no-ssh-multiplexing", action="store_true",
+                        help="Don't reuse one ssh connection per node for all ssh/scp commands, but run each of them "
+                             "through a new `gcloud compute ssh/scp`.")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", default=None, metavar="CASSETTE",
+                                help="Record all external commands (and their outputs) into this cassette file.")
+    cassette_group.add_argument("--replay", default=None, metavar="CASSETTE",
+                                help="Don't execute any external commands, but answer them from this (recorded) "
+                                     "cassette file instead. Needs the `google` or `fake` cloud provider.")
+    parser.add_argument("--replay-latency", default="recorded",
+                        help="With --replay: The time (in sec) each command takes, 'recorded' for the recorded "
+                             "durations (default) or per executable (e.g. 'gcloud=1.0,ssh=0.05,*=0.3').")
     subparsers = parser.add_subparsers(dest="command", help="command help")
     # add subparsers for sub commands e.g. cluster, experiment
     project_parser = subparsers.add_parser("init",
@@ -41,8 +68,9 @@ def main():
     cluster_parser = subparsers.add_parser("cluster", help="Main command for controlling clusters in the cloud.")
     cluster_subparsers = cluster_parser.add_subparsers(dest="sub_command", help="sub-command help")
     cluster_create_parser = cluster_subparsers.add_parser("create", help="Creates a new cluster in the cloud.")
-    cluster_create_parser.add_argument('-f', '--file',
-                                       help="The json file to get all information from for the new cluster.")
+    cluster_create_parser.add_argument('-f', '--file', action="append",
+                                       help="The json file to get all information from for the new cluster. "
+                                            "Can be given several times to create several clusters concurrently.")
     cluster_create_parser.add_argument('-n', '--name',
                                        help="The name of the Kubernetes cluster (must be all lower case).")
     cluster_create_parser.add_argument('-s', '--size', default=3,
@@ -51,6 +79,15 @@ def main():
                                        help="The type of the machines to use (e.g. n1-standard-1 or custom-1-17920).")
     cluster_create_parser.add_argument('-d', '--disk-size', default=100,
                                        help="The boot disk size in Gb per node (default: 100Gb).")
+    cluster_create_parser.add_argument('--preemptible', action="store_true",
+                                       help="Whether to use (much cheaper) preemptible VMs as nodes (use "
+                                            "`experiment watch` to recover experiments from lost nodes).")
+    cluster_create_parser.add_argument('--min-nodes', type=int, default=None,
+                                       help="The min. number of nodes the cluster's autoscaler may shrink the cluster "
+                                            "to (turns on autoscaling).")
+    cluster_create_parser.add_argument('--max-nodes', type=int, default=None,
+                                       help="The max. number of nodes the cluster's autoscaler may grow the cluster "
+                                            "to (turns on autoscaling; default: the cluster's size).")
 
     cluster_delete_parser = cluster_subparsers.add_parser("delete", help="Deletes (shuts down) a cluster in the cloud.")
     cluster_delete_parser.add_argument('-c', '--cluster',
@@ -60,6 +97,39 @@ def main():
 
     cluster_list_parser = cluster_subparsers.add_parser("list", help="Lists all running clusters in the cloud.")
 
+    cluster_recommend_parser = cluster_subparsers.add_parser(
+        "recommend", help="Recommends the cheapest node shapes and numbers of nodes that all pods of an experiment "
+                          "fit onto.")
+    cluster_recommend_parser.add_argument('-e', '--experiment', required=True,
+                                          help="The name of an existing experiment or an experiment spec (json) file.")
+    cluster_recommend_parser.add_argument('--prices', default=None,
+                                          help="A local json price table overriding (or adding to) the built-in "
+                                               "machine and GPU types and prices.")
+    cluster_recommend_parser.add_argument('--num', type=int, default=5,
+                                          help="The number of recommendations to show (default: 5).")
+    cluster_recommend_parser.add_argument('-o', '--output', default=None,
+                                          help="Write the cheapest recommendation as cluster spec (json) file "
+                                               "(e.g. clusters/my_cluster.json).")
+
+    pool_parser = subparsers.add_parser("pool", help="Main command for controlling the pool of warm clusters.")
+    pool_subparsers = pool_parser.add_subparsers(dest="sub_command", help="sub-command help")
+    pool_set_parser = pool_subparsers.add_parser("set", help="Sets the number of idle clusters to keep for a "
+                                                             "cluster spec.")
+    pool_set_parser.add_argument('-c', '--cluster', required=True,
+                                 help="The cluster spec (json) file whose clusters to keep in the pool.")
+    pool_set_parser.add_argument('-s', '--size', type=int, default=1,
+                                 help="The number of idle clusters to keep (default: 1; 0 removes the spec from "
+                                      "the pool).")
+    pool_set_parser.add_argument('--max-idle', type=int, default=None,
+                                 help="The number of seconds after which an idle pool cluster gets deleted "
+                                      "(default: 3600).")
+    pool_list_parser = pool_subparsers.add_parser("list", help="Lists the pool's settings and clusters.")
+    pool_fill_parser = pool_subparsers.add_parser("fill", help="Creates clusters until the pool is full.")
+    pool_fill_parser.add_argument('--watch', action="store_true",
+                                  help="Keep running afterwards and delete pool clusters once they are idle for too "
+                                       "long.")
+    pool_drain_parser = pool_subparsers.add_parser("drain", help="Deletes all clusters of the pool.")
+
     experiment_parser = subparsers.add_parser("experiment", help="Main command for controlling experiments.")
     exp_subparsers = experiment_parser.add_subparsers(dest="sub_command", help="sub-command help")
     exp_list_parser = exp_subparsers.add_parser("list", help="Lists all running experiments.")
@@ -96,18 +166,48 @@ def main():
     exp_start_parser.add_argument('-R', '--resume', action="store_true",
                                   help="Whether to resume a paused experiment on a running cluster.")
     exp_start_parser.add_argument('-c', '--cluster', help="The name of the (already running) cluster to use.")
+    exp_start_parser.add_argument('--plan', action="store_true",
+                                  help="Only print the steps (and their dependencies and critical path) that "
+                                       "starting the experiment would take.")
+
+    exp_schedule_parser = exp_subparsers.add_parser(
+        "schedule", help="Packs several existing experiments onto the running clusters (creating new clusters only "
+                         "for those that don't fit anywhere) and starts them.")
+    exp_schedule_parser.add_argument('-e', '--experiments', nargs="+", required=True,
+                                     help="The names of the experiments to start.")
+    exp_schedule_parser.add_argument('--plan', action="store_true",
+                                     help="Only print which experiment would run on which cluster.")
 
     exp_pause_parser = exp_subparsers.add_parser("pause")
     exp_pause_parser.add_argument('-e', '--experiment', required=True, help="The name of the experiment to pause.")
+    exp_pause_parser.add_argument('--keep-nodes', action="store_true",
+                                  help="Whether to keep the nodes of the experiment's dedicated cluster (default: "
+                                       "scale the cluster down to zero nodes until the experiment is resumed).")
 
     exp_stop_parser = exp_subparsers.add_parser("stop")
     exp_stop_parser.add_argument('-e', '--experiment', required=True, help="The name of the experiment to stop.")
     exp_stop_parser.add_argument('--no-download', action="store_true",
                                  help="Whether to not download any results prior to stopping.")
 
+    exp_watch_parser = exp_subparsers.add_parser(
+        "watch", help="Watches a running experiment and recreates its lost (e.g. preempted) tasks from the latest "
+                      "checkpoint.")
+    exp_watch_parser.add_argument('-e', '--experiment', required=True, help="The name of the experiment to watch.")
+    exp_watch_parser.add_argument('--interval', type=float, default=60.0,
+                                  help="The number of seconds between two checks for lost tasks (default: 60).")
+    exp_watch_parser.add_argument('--sync-interval', type=float, default=600.0,
+                                  help="The number of seconds between two syncs of the experiment's results (incl. "
+                                       "its checkpoints) to the local disk (default: 600).")
+
     exp_download_parser = exp_subparsers.add_parser("download")
     exp_download_parser.add_argument('-e', '--experiment', required=True,
                                      help="The name of the experiment for which to download results (so far).")
+    exp_download_parser.add_argument('--full', action="store_true",
+                                     help="Whether to download all results again (instead of only new or changed "
+                                          "files).")
+    exp_download_parser.add_argument('--compression', choices=["zstd", "gzip", "none"], default=None,
+                                     help="The compression to use for the transfers (default: zstd if installed, "
+                                          "else gzip).")
 
     # parse all args at once
     args = parser.parse_args()
@@ -121,6 +221,24 @@ def main():
     tfcli experiment 
     """
 
+    if args.max_concurrency:
+        util.engine.set_max_concurrency(args.max_concurrency)
+
+    if args.no_ssh_multiplexing:
+        ssh_connections.enabled = False
+
+    if args.record:
+        util.use_cassette(args.record, mode="record")
+    elif args.replay:
+        util.use_cassette(args.replay, mode="replay", latency=parse_latency(args.replay_latency))
+
+    if args.gcloud_workers:
+        util.enable_gcloud_worker(args.gcloud_workers)
+
+    if args.profile or args.profile_json:
+        profiler.enable()
+        atexit.register(print_profile, args.profile_json)
+
     # process commands and sub-commands
     if not args.command:
         print("USAGE ERROR: You have to provide a command after `tfcli`: E.g.: `tfcli experiment --help`")
@@ -143,6 +261,14 @@ def main():
             parser.print_help()
             quit()
 
+        # drop the project's cached cloud inventory (what is fetched during this command is cached again)
+        if args.refresh:
+            util.inventory_cache.invalidate()
+
+        # delete pool clusters that are idle for too long (in case no `pool fill --watch` process is doing this)
+        if args.command != "pool":
+            cluster_pool.reap()
+
         # experiment command
         if args.command == "experiment":
             if args.sub_command == "new":
@@ -152,19 +278,38 @@ def main():
             # start the experiment on a cloud cluster
             elif args.sub_command == "start":
                 commands.cmd_experiment_start(args, get_remote_project_id())
+            # packs several experiments onto the (running) clusters and starts them
+            elif args.sub_command == "schedule":
+                commands.cmd_experiment_schedule(args, get_remote_project_id())
             # pauses the experiment on the cluster
             elif args.sub_command == "pause":
                 commands.cmd_experiment_pause(args, get_remote_project_id())
             # stops the experiment on the cluster
             elif args.sub_command == "stop":
                 commands.cmd_experiment_stop(args)  # TODO: experiment stop
+            # recreates lost tasks of the experiment
+            elif args.sub_command == "watch":
+                commands.cmd_experiment_watch(args, get_remote_project_id())
             # downloads the tensorboard and logs from the cluster
             elif args.sub_command == "download":
                 commands.cmd_experiment_download(args)  # TODO: experiment download
             # invalid sub-command
             else:
                 print("USAGE ERROR: Invalid sub-command ({}) for command 'experiment'. "
-                      "Allowed are [new|start|stop|pause|download|list].".format(args.sub_command))
+                      "Allowed are [new|start|schedule|stop|pause|watch|download|list].".format(args.sub_command))
+                parser.print_help()
+        elif args.command == "pool":
+            if args.sub_command == "set":
+                commands.cmd_pool_set(args)
+            elif args.sub_command == "list":
+                commands.cmd_pool_list()
+            elif args.sub_command == "fill":
+                commands.cmd_pool_fill(args)
+            elif args.sub_command == "drain":
+                commands.cmd_pool_drain()
+            else:
+                print("USAGE ERROR: Invalid sub-command ({}) for command 'pool'. "
+                      "Allowed are [set|list|fill|drain].".format(args.sub_command))
                 parser.print_help()
         elif args.command == "cluster":
             # starts a Kubernetes cloud cluster with google
@@ -176,12 +321,34 @@ def main():
             # list all currently existing clusters
             elif args.sub_command == "list":
                 commands.cmd_cluster_list()
+            elif args.sub_command == "recommend":
+                commands.cmd_cluster_recommend(args)
             else:
                 print("USAGE ERROR: Invalid sub-command ({}) for command 'cluster'. "
-                      "Allowed are [create|delete|list].".format(args.sub_command))
+                      "Allowed are [create|delete|list|recommend].".format(args.sub_command))
                 parser.print_help()
 
 
+def print_profile(json_file=None):
+    print(profiler.report())
+    if json_file:
+        profiler.write_json(json_file)
+        print("+ Profile written to {}.".format(json_file))
+
+
+def parse_latency(latency):
+    # "recorded" -> None, "0.5" -> 0.5, "gcloud=1.0,*=0.2" -> {"gcloud": 1.0, "*": 0.2}
+    if latency == "recorded":
+        return None
+    elif "=" not in latency:
+        return float(latency)
+    latencies = {}
+    for pair in latency.split(","):
+        executable, value = pair.split("=")
+        latencies[executable.strip()] = None if value.strip() == "recorded" else float(value)
+    return latencies
+
+
 def get_remote_project_id():
     project_spec = util.read_json_spec(file=".tensorforce.json")
     return project_spec["remote_id"]
@@ -0,0 +1,237 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+Bulk file transfers from/to cluster nodes as (compressed) tar streams: Any number of files goes through a single
+ssh channel (instead of one scp per file) and is compressed on the fly with zstd or gzip. Each transfer is
+recorded by the profiler (bytes, time and throughput).
+For broadcasts to all nodes of a cluster (see `Cluster.broadcast`), an archive is uploaded once and then forwarded
+from node to node over the cluster's internal network.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import base64
+import os
+import shlex
+import shutil
+import time
+import tensorforce_client.utils as util
+from tensorforce_client.profiling import profiler
+from tensorforce_client.remote_script import MAX_COMMAND_LENGTH
+
+
+# compression name -> (compress command, decompress command)
+COMPRESSIONS = {
+    "zstd": ("zstd -q -c", "zstd -q -d -c"),
+    "gzip": ("gzip -c", "gzip -d -c"),
+    "none": (None, None)
+}
+# nodes on which a zstd transfer failed (-> use gzip for them from then on)
+_nodes_without_zstd = set()
+
+
+def default_compression():
+    """
+    Returns: The best compression available locally ("zstd" or "gzip"; "none" if neither is installed).
+    """
+    for compression in ["zstd", "gzip"]:
+        if shutil.which(compression):
+            return compression
+    return "none"
+
+
+def download(node, remote_dir, paths, local_dir, location=None, compression="gzip"):
+    """
+    Downloads files from a node into a local directory as one (compressed) tar stream. The files' relative paths
+    (incl. sub-directories) are kept. If zstd is not available on the node, falls back to gzip.
+
+    Args:
+        node (str): The name of the node.
+        remote_dir (str): The directory on the node the paths are relative to.
+        paths (List[str]): The (relative) paths of the files/directories to download ("." for everything).
+        local_dir (str): The local directory to extract the files into.
+        location (Optional[str]): The zone of the node.
+        compression (str): One of "zstd", "gzip" or "none".
+
+    Returns: The SyscallResult of the (last) transfer command.
+    """
+    if not os.path.isdir(local_dir):
+        os.makedirs(local_dir)
+    result = None
+    # long lists of paths are split up into several streams (the list is part of the remote command)
+    for chunk in _chunks(paths):
+        result = _with_fallback(node, compression, lambda c: _download(node, remote_dir, chunk, local_dir, location, c))
+    return result
+
+
+def upload(node, local_dir, paths, remote_dir, location=None, compression="gzip"):
+    """
+    Uploads local files/directories to a node as one (compressed) tar stream. The relative paths are kept.
+    If zstd is not available on the node, falls back to gzip.
+
+    Args:
+        node (str): The name of the node.
+        local_dir (str): The local directory the paths are relative to.
+        paths (List[str]): The (relative) paths of the files/directories to upload.
+        remote_dir (str): The directory on the node to extract the files into (created if it doesn't exist).
+        location (Optional[str]): The zone of the node.
+        compression (str): One of "zstd", "gzip" or "none".
+
+    Returns: The SyscallResult of the transfer command.
+    """
+    return _with_fallback(node, compression, lambda c: _upload(node, local_dir, paths, remote_dir, location, c))
+
+
+def upload_archive(node, local_dir, paths, archive, location=None):
+    """
+    Uploads local files/directories to a node as one gzipped tar archive, which is stored on the node (not
+    extracted; see `forward_archive` and `Cluster.broadcast`).
+
+    Args:
+        node (str): The name of the node.
+        local_dir (str): The local directory the paths are relative to.
+        paths (List[str]): The (relative) paths of the files/directories to upload.
+        archive (str): The path of the archive on the node (its directory is created if it doesn't exist).
+        location (Optional[str]): The zone of the node.
+
+    Returns: The SyscallResult of the transfer command.
+    """
+    local_input = "tar cf - -C {} {} | gzip -c".format(shlex.quote(local_dir), " ".join(shlex.quote(p) for p in paths))
+    command = "mkdir -p -m 700 {} && cat > {}".format(shlex.quote(os.path.dirname(archive)), shlex.quote(archive))
+    num_bytes = sum(local_size(os.path.join(local_dir, p)) for p in paths)
+    start = time.time()
+    result = util.cloud_provider().ssh_pipe(node, command, location=location, local_input=local_input)
+    profiler.record_transfer(node, "upload", len(paths), num_bytes, time.time() - start, "gzip")
+    return result
+
+
+def forward_archive(node, target_ip, files, location=None, key=None, num_bytes=0):
+    """
+    Copies files from one node to another one (given by its internal IP) with scp running on the source node.
+    The files keep their (absolute) paths; their directory must exist on the target node.
+
+    Args:
+        node (str): The name of the source node.
+        target_ip (str): The (internal) IP of the target node.
+        files (List[str]): The absolute paths of the files on the source node.
+        location (Optional[str]): The zone of the source node.
+        key (Optional[str]): The private key file (on the source node) to log into the target node with.
+        num_bytes (int): The number of (uncompressed) bytes the files hold (only for the profiler).
+
+    Returns: The SyscallResult of the ssh command.
+    """
+    command = "scp -q -oBatchMode=yes -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oLogLevel=ERROR" \
+              "{} {} {}:{}/".format(" -i " + shlex.quote(key) if key else "", " ".join(shlex.quote(f) for f in files),
+                                    target_ip, os.path.dirname(files[-1]))
+    start = time.time()
+    result = util.cloud_provider().ssh(node, command, location=location)
+    profiler.record_transfer("{} -> {}".format(node, target_ip), "forward", len(files), num_bytes,
+                             time.time() - start, "gzip")
+    return result
+
+
+def extract_archive_command(archive, remote_dir):
+    """
+    Returns: The (remote) shell command (str) extracting a gzipped tar archive (see `upload_archive`) into a
+        directory (created if it doesn't exist).
+    """
+    return "mkdir -p {d} && gzip -d -c {a} | tar xf - -C {d}".format(d=shlex.quote(remote_dir), a=shlex.quote(archive))
+
+
+def broadcast_rounds(source, nodes):
+    """
+    Plans a broadcast along a binomial tree: In each round, every node that already has the data sends it to one
+    node that doesn't, so the number of nodes holding the data doubles per round.
+
+    Args:
+        source (str): The node that has the data at the start.
+        nodes (List[str]): All nodes (may include `source`).
+
+    Returns: List of rounds, each a list of (from node, to node) tuples.
+    """
+    holders = [source]
+    remaining = [n for n in nodes if n != source]
+    rounds = []
+    while remaining:
+        pairs = list(zip(holders, remaining))
+        remaining = remaining[len(pairs):]
+        holders.extend(to for _, to in pairs)
+        rounds.append(pairs)
+    return rounds
+
+
+def _download(node, remote_dir, paths, local_dir, location, compression):
+    compress, decompress = COMPRESSIONS[compression]
+    # the list of paths is passed base64-encoded (no quoting issues with odd file names)
+    file_list = base64.b64encode("\0".join(paths).encode("utf-8")).decode("ascii")
+    command = "cd {} && echo {} | base64 -d | tar cf - --null -T -{}".format(
+        shlex.quote(remote_dir), file_list, " | " + compress if compress else "")
+    local_output = "{}tar xf - -C {}".format(decompress + " | " if decompress else "", shlex.quote(local_dir))
+    start = time.time()
+    result = util.cloud_provider().ssh_pipe(node, command, location=location, local_output=local_output)
+    num_bytes = sum(local_size(os.path.join(local_dir, p)) for p in paths)
+    profiler.record_transfer(node, "download", len(paths), num_bytes, time.time() - start, compression)
+    return result
+
+
+def _upload(node, local_dir, paths, remote_dir, location, compression):
+    compress, decompress = COMPRESSIONS[compression]
+    local_input = "tar cf - -C {} {}{}".format(shlex.quote(local_dir), " ".join(shlex.quote(p) for p in paths),
+                                               " | " + compress if compress else "")
+    command = "mkdir -p {d} && {}tar xf - -C {d}".format(decompress + " | " if decompress else "",
+                                                          d=shlex.quote(remote_dir))
+    num_bytes = sum(local_size(os.path.join(local_dir, p)) for p in paths)
+    start = time.time()
+    result = util.cloud_provider().ssh_pipe(node, command, location=location, local_input=local_input)
+    profiler.record_transfer(node, "upload", len(paths), num_bytes, time.time() - start, compression)
+    return result
+
+
+def _with_fallback(node, compression, transfer):
+    if compression == "zstd" and node in _nodes_without_zstd:
+        compression = "gzip"
+    try:
+        return transfer(compression)
+    except util.TFCliError:
+        if compression != "zstd":
+            raise
+    print("WARNING: zstd transfer from/to {} failed (zstd not installed on the node?). Using gzip.".format(node))
+    _nodes_without_zstd.add(node)
+    return transfer("gzip")
+
+
+def _chunks(paths):
+    chunk, length = [], 0
+    for path in paths:
+        # (base64 makes the list 4/3 longer, leave some room for the rest of the command)
+        if chunk and (length + len(path) + 1) * 4 // 3 > MAX_COMMAND_LENGTH - 1000:
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(path)
+        length += len(path) + 1
+    if chunk:
+        yield chunk
+
+
+def local_size(path):
+    """
+    Returns: The number of bytes in a local file or directory (incl. sub-directories).
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
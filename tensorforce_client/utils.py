@@ -18,13 +18,26 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
+import atexit
+import io
 import json
 import os.path
-import subprocess as sp
+import random
 import re
-import subprocess
+import threading
+import time
 import jinja2
-import shlex
+from tensorforce_client.cache import inventory_cache
+from tensorforce_client.engine import engine
+from tensorforce_client.profiling import Profiler
+
+
+# the Kubernetes node labels of the nodes of clusters with several node pools: the (tfcli) name of the node's pool
+# and the jobs to run on the pool (joined by ".", e.g. "ps.worker")
+NODE_POOL_LABEL = "tfcli-pool"
+NODE_POOL_JOBS_LABEL = "tfcli-jobs"
+# the version of configs/experiment.yaml.jinja this tfcli needs (templates without `template_version` are version 1)
+K8S_TEMPLATE_VERSION = 2
 
 
 class TFCliError(Exception):
@@ -68,30 +81,56 @@ def read_json_spec(file, typ_=None):
         return json.load(f)  # return object
 
 
-def write_project_file(name, remote_name, remote_id):
-    project = {"name": name, "remote_name": remote_name, "remote_id": remote_id, "cloud_provider": "google"}
+def write_project_file(name, remote_name, remote_id, cloud_provider="google"):
+    project = {"name": name, "remote_name": remote_name, "remote_id": remote_id, "cloud_provider": cloud_provider}
     with open(".tensorforce.json", "w") as f:
         json.dump(project, f)
 
 
-def write_kubernetes_yaml_file(experiment, file="experiment.yaml", gpus_per_container=0):
+def write_kubernetes_yaml_file(experiment, file="experiment.yaml", gpus_per_container=0, gpu_plan=None,
+                               node_pools=None, only_tasks=None, load=False):
     """
     Writes the yaml file (from our jinja2 template) to create the k8s Service based on the Experiment object passed in.
     Args:
         experiment (Experiment): The Experiment object containing all necessary information about the experiment to run.
         file (str): The yaml path+filename to write to.
-        gpus_per_container (int): The number of GPUs to set as limit per container.
+        gpus_per_container (int): The number of GPUs to set as limit per container (if no gpu_plan is given).
+        gpu_plan (Optional[dict]): The GPU settings by task name (see `GpuPlan.render`).
+        node_pools (Optional[dict]): The node pool to run each job on (by job name; see `Experiment.get_node_pool`).
+        only_tasks (Optional[List[str]]): Only write the Services and Jobs of these tasks ("[job]-[task index]",
+            default: all tasks).
+        load (bool): Whether the workers should restore the model from the latest checkpoint.
     """
+    gpu_plan = gpu_plan or {}
+    node_pools = {job: pool for job, pool in (node_pools or {}).items() if pool}
+    if "worker" in node_pools:
+        node_pools["demoworker"] = node_pools["worker"]
     env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath="./"))
     template = env.get_template("configs/experiment.yaml.jinja")
+    # templates of older projects would e.g. mount the wrong directory on the nodes (and may have been customized,
+    # so we don't just replace them)
+    with open(template.filename) as f:
+        match = re.search(r'set template_version = (\d+)', f.read())
+    version = int(match.group(1)) if match else 1
+    if version < K8S_TEMPLATE_VERSION:
+        raise TFCliError("ERROR: The project's configs/experiment.yaml.jinja is outdated (version {}, this tfcli "
+                         "needs version {}: per-experiment directories, GPU plans, node pools and recovering tasks). "
+                         "Copy {} into the project's configs directory (or merge your changes into it).".format(
+                             version, K8S_TEMPLATE_VERSION, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                         "configs", "experiment.yaml.jinja")))
+
+    # k8s resource requests per job (demo workers request the same as workers)
+    resources = {job: {"cpu": "{}m".format(int(r["cpu"] * 1000)), "memory": "{}Mi".format(int(r["memory"] * 1024))}
+                 for job, r in experiment.get_container_resources().items()}
+    resources["demoworker"] = resources["worker"]
 
     with open(file, "w") as f:
         f.write(
             template.render(
                 name=experiment.name_hyphenated,
                 experiment_spec="/experiment/"+experiment.running_json_file,
-                image="ducandu/tfcli_experiment:{}".
-                    format("gpu" if experiment.cluster.get("gpus_per_node", 0) > 0 else "cpu"),
+                image="ducandu/tfcli_experiment:{}".format(
+                    "gpu" if gpus_per_container > 0 or any(t["share"] > 0 for t in gpu_plan.values()) else "cpu"),
                 image_remote_env="" if not experiment.environment.get("remote", False)
                     else experiment.environment.get("image", "ducandu/ue4_alien_invaders:exec"),
                 num_workers=experiment.num_workers,
@@ -99,37 +138,50 @@ def write_kubernetes_yaml_file(experiment, file="experiment.yaml", gpus_per_cont
                 debug_logging=experiment.debug_logging,
                 run_mode=experiment.run_mode,
                 gpus_per_container=gpus_per_container,
+                gpu_plan=gpu_plan,
+                node_pools=node_pools,
+                only_tasks=only_tasks,
+                load=load,
+                resources=resources,
+                remote_dir=experiment.remote_dir.rstrip("/"),
                 repeat_actions=experiment.repeat_actions
             )
         )
 
 
+def cloud_provider():
+    """
+    Returns: The CloudProvider of the current project (see `tensorforce_client.providers`).
+    """
+    from tensorforce_client.providers import get_provider
+    return get_provider()
+
+
 def get_remote_projects():
     """
     Returns: A dict of project dicts by project name. Supported fields per project, see code below.
     """
     projects_by_name = {}
     projects_by_id = {}
-    out = syscall("gcloud projects list", return_outputs=True)
-    while True:
-        line = out.readline()
-        if line == b"":
-            break
-        mo = re.match(r'([\w\-.]+)\s+([\w\-.]+)\s+([\d.]+)', line.decode("latin-1"))
-        if mo:
-            id_ = mo.group(1)
-            name = mo.group(2)
-            if name in projects_by_name:
-                raise TFCliError("ERROR: At least 2 projects found with name {} in your google cloud account. "
-                                 "Please make sure project names (just like project IDs) are unique.")
-            projects_by_name[name] = {
-                "project-id": id_,
-                "project-number": mo.group(3)
-            }
-            projects_by_id[id_] = {
-                "project-name": name,
-                "project-number": mo.group(3)
-            }
+    provider = cloud_provider()
+    projects = inventory_cache.get("projects", provider.name)
+    if projects is None:
+        projects = provider.list_projects()
+        inventory_cache.set("projects", provider.name, projects)
+    for p in projects:
+        id_ = p.get("projectId")
+        name = p.get("name")
+        if name in projects_by_name:
+            raise TFCliError("ERROR: At least 2 projects found with name {} in your google cloud account. "
+                             "Please make sure project names (just like project IDs) are unique.".format(name))
+        projects_by_name[name] = {
+            "project-id": id_,
+            "project-number": p.get("projectNumber")
+        }
+        projects_by_id[id_] = {
+            "project-name": name,
+            "project-number": p.get("projectNumber")
+        }
     return projects_by_name, projects_by_id
 
 
@@ -138,26 +190,21 @@ def get_cluster_specs():
     Returns: A dict of cluster dicts by cluster name. Supported fields per cluster, see code below.
     """
     clusters = {}
-    out = syscall("gcloud container clusters list --format json", return_outputs=True)
-    try:
-        json_out = json.load(out)
-    except json.decoder.JSONDecodeError as e:
-        # raise as TFCli Error
-        print("ERROR: Could not load cluster list from cloud!")
-        raise e
-
-    if not isinstance(json_out, list):
-        raise TFCliError("ERROR: List of clusters is not a json-list!")
+    provider = cloud_provider()
+    json_out = inventory_cache.get("clusters", provider.name)
+    if json_out is None:
+        json_out = provider.list_clusters()
+        inventory_cache.set("clusters", provider.name, json_out)
 
     for c in json_out:
         node_config = c.get("nodeConfig", {})
-        gpus_per_node = 0
-        gpu_type = None
-        accelerators = node_config.get("accelerators")
-        if accelerators:
-            gpu_type = accelerators[0].get("acceleratorType")
-            if gpu_type == "nvidia-tesla-k80":  # or gpu_type == "nvidia-":
-                gpus_per_node = int(accelerators[0].get("acceleratorCount"))
+        # the current sizes of several node pools are only known from their nodes
+        instances = None
+        if len(c.get("nodePools") or []) > 1:
+            instances = list((get_compute_instance_specs(c.get("name"))[0] or {}).values())
+        node_pools = get_node_pools(c, instances)
+        # the cluster's GPUs are those of its (first) node pool with GPUs
+        gpu_pool = next((p for p in node_pools if p["gpus_per_node"] > 0), None)
         clusters[c.get("name")] = {
             "name": c.get("name"),
             "name_hyphenated": c.get("name"),
@@ -168,100 +215,435 @@ def get_cluster_specs():
             "node_version": c.get("currentMasterVersion"),
             "num_nodes": c.get("currentNodeCount"),
             "status": c.get("status"),
-            "gpus_per_node": gpus_per_node,
-            "gpu_type": gpu_type
+            "gpus_per_node": gpu_pool["gpus_per_node"] if gpu_pool else 0,
+            "gpu_type": gpu_pool["gpu_type"] if gpu_pool else None,
+            "num_gpus": sum(p["num_nodes"] * p["gpus_per_node"] for p in node_pools),
+            "node_pools": node_pools
         }
 
     return clusters
 
 
+def get_node_pools(cluster_json, instances=None):
+    """
+    Returns: A list of node pool dicts (fields: name (the pool's tfcli name, see `NODE_POOL_LABEL`), cloud_name
+        (the pool's name in the cloud), machine_type, num_nodes, min_nodes and max_nodes (the autoscaler's bounds,
+        None if not autoscaled), accelerators (number per node by accelerator type), gpus_per_node, gpu_type,
+        preemptible, jobs) of a cluster.
+
+    Args:
+        cluster_json (dict): The cluster's description (as returned by the cloud provider's `list_clusters`).
+        instances (Optional[List[dict]]): The cluster's nodes (see `get_compute_instance_specs`) to count the
+            current sizes of the node pools with. Without them, pools (of a cluster with several pools) report
+            their initial size, which is outdated after resizes (e.g. `Cluster.scale_to_zero`) or autoscaling.
+    """
+    pools = cluster_json.get("nodePools") or \
+        [{"name": "default-pool", "config": cluster_json.get("nodeConfig", {})}]
+    node_pools = []
+    for pool in pools:
+        config = pool.get("config", {})
+        accelerators = {}
+        for a in config.get("accelerators") or []:
+            accelerators[a.get("acceleratorType")] = \
+                accelerators.get(a.get("acceleratorType"), 0) + int(a.get("acceleratorCount", 0))
+        # all nvidia accelerators are GPUs (k80, p100, v100, ..)
+        gpus = {t: n for t, n in accelerators.items() if t and t.startswith("nvidia-")}
+        labels = config.get("labels") or {}
+        autoscaling = pool.get("autoscaling") or {}
+        # (with a single pool, the cluster's current node count is the pool's)
+        if len(pools) == 1:
+            num_nodes = cluster_json.get("currentNodeCount")
+        elif instances is not None and pool.get("instanceGroupUrls"):
+            num_nodes = sum(1 for i in instances if _in_instance_groups(i["name"], pool["instanceGroupUrls"]))
+        else:
+            num_nodes = pool.get("initialNodeCount")
+        node_pools.append({
+            "name": labels.get(NODE_POOL_LABEL) or pool.get("name"),
+            "cloud_name": pool.get("name"),
+            "machine_type": config.get("machineType"),
+            "num_nodes": num_nodes or 0,
+            "min_nodes": int(autoscaling.get("minNodeCount", 0)) if autoscaling.get("enabled") else None,
+            "max_nodes": int(autoscaling.get("maxNodeCount", 0)) if autoscaling.get("enabled") else None,
+            "accelerators": accelerators,
+            "gpus_per_node": sum(gpus.values()),
+            "gpu_type": max(sorted(gpus), key=lambda t: gpus[t]) if gpus else None,
+            "preemptible": bool(config.get("preemptible", False)),
+            "jobs": labels[NODE_POOL_JOBS_LABEL].split(".") if labels.get(NODE_POOL_JOBS_LABEL) else []
+        })
+    return node_pools
+
+
+def _in_instance_groups(instance, instance_group_urls):
+    # the nodes of a pool's instance group (".../instanceGroupManagers/[base name]-grp") are named "[base name]-[id]"
+    return any(instance.startswith(re.sub(r'^.*/|grp$', "", url)) for url in instance_group_urls)
+
+
 def get_disks():
     """
     Returns: A dict of Disk objects by disk name.
     """
     disks = {}
-    out = syscall("gcloud compute disks list", return_outputs=True)
-    while True:
-        line = out.readline()
-        if line == b"":
-            break
-        mo = re.match(r'([\w\-.]+)\s+([\w\-.]+)\s+(\d+)\s+([\w\-.]+)\s+([A-Z\-]+)',
-                      line.decode("latin-1"))
-        if mo:
-            disks[mo.group(1)] = Disk(mo.group(1), size=int(mo.group(3)), zone=mo.group(2),
-                                      type_=mo.group(4), status=mo.group(5))
+    provider = cloud_provider()
+    out = inventory_cache.get("disks", provider.name)
+    if out is None:
+        out = provider.list_disks()
+        inventory_cache.set("disks", provider.name, out)
+    for d in out:
+        disks[d["name"]] = Disk(d["name"], size=d["size"], zone=d["zone"], type_=d["type"], status=d["status"])
     return disks
 
 
 def get_compute_instance_specs(cluster):
     """
     Returns: A dict of compute instances (for a certain cluster name) by instance name.
-    Supported fields per cluster, see code below.
+    Supported fields per cluster, see `CloudProvider.list_instances`.
 
     Args:
         cluster (str): The name of the cluster to return instances for.
     """
-    nodes = {}
-    primary_name = None
-    out = syscall("gcloud compute instances list --format json", return_outputs=True)
-    json_out = json.load(out)
-
-    if not isinstance(json_out, list):
-        raise TFCliError("ERROR: List of nodes is not a json-list!")
+    provider = cloud_provider()
+    instances = inventory_cache.get("instances", provider.name + "/" + cluster)
+    if instances is None:
+        instances = provider.list_instances(cluster)
+        inventory_cache.set("instances", provider.name + "/" + cluster, instances)
 
-    for c in json_out:
-        name = c.get("name")
-        if not re.search(r'-{}-'.format(cluster[:20]), name):
-            continue
-        network = c.get("networkInterfaces")[0]
-        nodes[name] = {
-            "name": name,
-            "name_hyphenated": name,
-            "zone": re.sub(r'^.+/', "", c.get("zone")),
-            "machine_type": re.sub(r'^.+/', "", c.get("machineType")),
-            "internal-ip": network.get("networkIP"),
-            "external-ip": network.get("accessConfigs")[0].get("natIP"),
-            "status": c.get("status"),
-        }
-        if not primary_name:
-            primary_name = c.get("name")
+    nodes = {}
+    for node in instances:
+        nodes[node["name"]] = node
+    primary_name = instances[0]["name"] if len(instances) > 0 else None
 
     return None if len(nodes) == 0 else nodes, primary_name
 
 
-def syscall(command, return_outputs=False, merge_err=True):
+def syscall(command, return_outputs=False, merge_err=True, timeout=None):
     """
     Args:
         command (str): The command to execute in the shell.
         return_outputs (Union[bool|str]): True if we should capture and return outputs (stdout and stderr).
             Alternatively: set this to "as_str" if you want to get the outputs as whole strings rather than
             as BufferedReader object(s).
+            Or set this to "as_result" to get the full SyscallResult object (incl. exit code and duration).
         merge_err (bool): Whether to merge stderr with stdout.
+        timeout (Optional[float]): The max. number of seconds the command may run before it is killed.
 
     Returns:
         None OR (stdout/err) OR tuple(stdout, stderr) where stdout/err are either BufferedReader or strings depending
-        on the value of return_outputs.
-    """
-    if return_outputs:
-        if os.name == "nt":
-            out = sp.Popen("cmd /c {}".format(command),
-                           stdout=sp.PIPE, stderr=sp.STDOUT if merge_err else sp.PIPE)
-            if merge_err:
-                return out.stdout if return_outputs is True else out.stdout.raw.readall().decode("latin-1")
-            else:
-                return (out.stdout, out.stderr) if return_outputs is True \
-                    else (out.stdout.raw.readall().decode("latin-1"), out.stderr.raw.readall().decode("latin-1"))
-        else:
-            out = sp.Popen(shlex.split(command),
-                           stdout=sp.PIPE, stderr=sp.STDOUT if merge_err else sp.PIPE)
+        on the value of return_outputs OR a SyscallResult.
+    """
+    result = engine.run(command, capture=bool(return_outputs), merge_err=merge_err, timeout=timeout)
+    if not return_outputs:
+        return None
+    elif return_outputs == "as_result":
+        return result
+    elif return_outputs is True:
+        return _as_reader(result.stdout) if merge_err else (_as_reader(result.stdout), _as_reader(result.stderr))
+    else:
+        return result.output if merge_err else (result.output, result.error_output)
+
+
+def enable_gcloud_worker(size=1, sdk_root=None, python=None):
+    """
+    Routes all subsequent gcloud commands (issued via `syscall`, `syscalls`, etc..) through warm gcloud worker
+    processes instead of starting a new gcloud process for each of them. Falls back to normal subprocesses
+    if the workers can't be started.
+
+    Args:
+        size (int): The max. number of worker processes (= gcloud commands running at the same time).
+        sdk_root (Optional[str]): The root dir of the Cloud SDK. Default: Ask `gcloud info`.
+        python (Optional[str]): The python executable the SDK uses. Default: Ask `gcloud info`.
+
+    Returns: The GCloudWorkerPool in use.
+    """
+    from tensorforce_client.gcloud_worker import GCloudWorkerPool
+    if engine.gcloud_worker is not None:
+        engine.gcloud_worker.close()
+    engine.gcloud_worker = GCloudWorkerPool(size, sdk_root=sdk_root, python=python)
+    atexit.register(engine.gcloud_worker.close)
+    return engine.gcloud_worker
+
+
+def use_cassette(file, mode="record", latency=None):
+    """
+    Records all subsequent external commands into a cassette file (saved at exit) or replays them from one
+    (w/o executing anything). The persisted inventory cache is ignored in both modes, so that recording and
+    replaying issue the same commands.
 
-            if merge_err:
-                return out.stdout if return_outputs is True else out.stdout.read().decode("latin-1")
+    Args:
+        file (str): The cassette file.
+        mode (str): Either "record" or "replay".
+        latency (Optional[Union[float,dict]]): Replay mode only: The time (in sec) each command should take
+            (see `Cassette`). None for using each command's recorded duration.
+
+    Returns: The Cassette in use.
+    """
+    from tensorforce_client.cassette import Cassette
+    # use an absolute path (we may change into the project dir later)
+    engine.cassette = Cassette(os.path.abspath(file), mode=mode, latency=latency)
+    inventory_cache.persistent = False
+    atexit.register(engine.cassette.save)
+    return engine.cassette
+
+
+def syscalls(commands, return_outputs="as_result", merge_err=True, timeout=None):
+    """
+    Executes several independent commands concurrently (bounded by the engine's concurrency limit).
+
+    Args:
+        commands (List[str]): The commands to execute in the shell.
+        return_outputs (Union[bool|str]): See `syscall`.
+        merge_err (bool): Whether to merge stderr with stdout.
+        timeout (Optional[float]): The max. number of seconds each command may run before it is killed.
+
+    Returns:
+        List of return values (one per command, same order) as `syscall` would return them.
+    """
+    results = engine.run_many(commands, capture=bool(return_outputs), merge_err=merge_err, timeout=timeout)
+    if return_outputs == "as_result":
+        return results
+    elif not return_outputs:
+        return [None for _ in results]
+    elif return_outputs is True:
+        return [_as_reader(r.stdout) if merge_err else (_as_reader(r.stdout), _as_reader(r.stderr)) for r in results]
+    return [r.output if merge_err else (r.output, r.error_output) for r in results]
+
+
+class _RawBytes(io.RawIOBase):
+    """
+    Raw (unbuffered) stream over already captured bytes, so that callers can keep using the `.raw.readall()`
+    interface of the former pipe objects.
+    """
+    def __init__(self, data):
+        super(_RawBytes, self).__init__()
+        self.data = io.BytesIO(data or b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.data.readinto(b)
+
+
+def _as_reader(data):
+    return io.BufferedReader(_RawBytes(data))
+
+
+# failure classes of external commands (see `classify_failure`)
+SUCCESS = "success"
+TRANSIENT = "transient"
+RATE_LIMITED = "rate-limited"
+FATAL = "fatal"
+
+# output patterns indicating that the cloud API throttled us
+RATE_LIMIT_PATTERNS = [
+    r'rate ?limit', r'quota exceeded', r'QUOTA_EXCEEDED', r'RESOURCE_EXHAUSTED', r'Too Many Requests',
+    r'\b429\b', r'userRateLimitExceeded'
+]
+# output patterns indicating an error that may go away if we simply try again
+TRANSIENT_PATTERNS = [
+    r'\b50[0234]\b', r'UNAVAILABLE', r'DEADLINE_EXCEEDED', r'Internal error', r'backendError',
+    r'timed? ?out', r'Connection (reset|refused|closed)', r'connect to host .* port 22',
+    r'ssh_exchange_identification', r'try again', r'temporarily', r'operation .* is currently',
+    r'TLS handshake timeout', r'Unable to connect to the server'
+]
+
+
+class CircuitOpenError(TFCliError):
+    """
+    Raised when a command is not even tried because too many commands of its kind failed recently.
+    """
+    pass
+
+
+class CommandError(TFCliError):
+    """
+    Raised when an external command failed (after all retries).
+    """
+    def __init__(self, result, failure):
+        super(CommandError, self).__init__("ERROR: Command `{}` failed ({}, exit code {}):\n{}".
+                                           format(result.command, failure, result.returncode,
+                                                  (result.output + result.error_output).strip()))
+        self.result = result
+        self.failure = failure
+
+
+def classify_failure(result):
+    """
+    Classifies the outcome of an external command by its exit code and outputs.
+
+    Args:
+        result (SyscallResult): The result to classify.
+
+    Returns: One of SUCCESS, TRANSIENT, RATE_LIMITED or FATAL.
+    """
+    if result.ok:
+        return SUCCESS
+    elif result.timed_out:
+        return TRANSIENT
+    out = result.output + result.error_output
+    if any(re.search(p, out, re.IGNORECASE) for p in RATE_LIMIT_PATTERNS):
+        return RATE_LIMITED
+    elif any(re.search(p, out, re.IGNORECASE) for p in TRANSIENT_PATTERNS):
+        return TRANSIENT
+    # ssh reports connection problems with exit code 255
+    elif result.returncode == 255 and re.match(r'^gcloud compute (ssh|scp)|^ssh |^scp ', result.command):
+        return TRANSIENT
+    return FATAL
+
+
+class RetryPolicy(object):
+    """
+    Decides how often and after which delays a failed command is retried (exponential backoff with full jitter).
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, rate_limit_factor=4.0,
+                 retry_on=(TRANSIENT, RATE_LIMITED)):
+        """
+        Args:
+            max_attempts (int): The max. number of attempts (incl. the first one).
+            base_delay (float): The delay (in sec) before the first retry (before jittering).
+            max_delay (float): The max. delay (in sec) between two attempts.
+            rate_limit_factor (float): The factor by which delays are stretched after rate-limit errors.
+            retry_on (Iterable[str]): The failure classes to retry (all others are final).
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_factor = rate_limit_factor
+        self.retry_on = set(retry_on)
+
+    def delay(self, attempt, failure):
+        """
+        Returns: The (jittered) number of seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): The number of the attempt that just failed (starting with 1).
+            failure (str): The failure class of the attempt (TRANSIENT or RATE_LIMITED).
+        """
+        delay = self.base_delay * 2 ** (attempt - 1)
+        if failure == RATE_LIMITED:
+            delay *= self.rate_limit_factor
+        return random.uniform(0, min(delay, self.max_delay))
+
+    def call(self, func, breaker=None):
+        """
+        Calls `func` (which executes a command and returns its SyscallResult) until it succeeds, fails fatally or
+        the max. number of attempts is reached.
+
+        Args:
+            func (callable): The function to call (no args).
+            breaker (Optional[CircuitBreaker]): The circuit breaker guarding the command.
+
+        Returns: tuple(the last SyscallResult, its failure class).
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker:
+                breaker.before_call()
+            result = func()
+            failure = classify_failure(result)
+            if breaker:
+                breaker.after_call(failure)
+            if failure not in self.retry_on or attempt >= self.max_attempts:
+                return result, failure
+            delay = self.delay(attempt, failure)
+            print("+ Command `{}` failed ({}). Retrying in {:.1f}s ({}/{}).".
+                  format(Profiler.command_group(result.command), failure, delay, attempt, self.max_attempts - 1))
+            time.sleep(delay)
+
+
+class CircuitBreaker(object):
+    """
+    Stops issuing commands of a certain kind (e.g. gcloud) after too many consecutive transient or rate-limit
+    failures, so that we fail fast instead of hammering the cloud API. After `reset_timeout` seconds, one trial
+    command is let through again (half-open state) to see whether things have recovered.
+    """
+
+    def __init__(self, name, failure_threshold=8, reset_timeout=30.0):
+        """
+        Args:
+            name (str): The name of the breaker (e.g. the tool it guards).
+            failure_threshold (int): The number of consecutive failures that opens the circuit.
+            reset_timeout (float): The number of seconds after which an open circuit lets a trial command through.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is not None and time.time() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("ERROR: Too many failed {} commands in a row ({}). Not trying again for "
+                                       "another {:.0f}s.".format(self.name, self.failures,
+                                                                 self.reset_timeout - time.time() + self.opened_at))
+
+    def after_call(self, failure):
+        with self.lock:
+            # fatal errors are the command's fault, not the API's -> don't count these
+            if failure in [SUCCESS, FATAL]:
+                self.failures = 0
+                self.opened_at = None
             else:
-                return (out.stdout, out.stderr) if return_outputs is True \
-                    else (out.stdout.read().decode("latin-1"), out.stderr.read().decode("latin-1"))
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened_at = time.time()
+
+
+# the default retry policy
+retry_policy = RetryPolicy()
+# the retry policy for commands that aren't idempotent (e.g. ones creating something): a command that timed out or
+# failed with a server error may still have (partially) run, so only rate-limit errors (request rejected) are retried
+creation_retry_policy = RetryPolicy(retry_on=[RATE_LIMITED])
+# the kinds of commands with their own circuit breaker (first match wins, else the executable), so that e.g.
+# failing ssh connections to a node don't stop all cluster operations; patterns also match ssh pipeline stages
+CIRCUIT_BREAKER_KINDS = [
+    ("gcloud compute ssh", r'(^|\| )gcloud compute (ssh|scp) '),
+    ("ssh", r'(^|\| )(ssh|scp) '),
+    ("gcloud container", r'^gcloud container '),
+    ("gcloud compute", r'^gcloud compute '),
+]
+# circuit breakers by command kind
+circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(command):
+    """
+    Returns: The CircuitBreaker responsible for the given command (one per kind of command, see
+        `CIRCUIT_BREAKER_KINDS`, e.g. "gcloud container" or "kubectl").
+
+    Args:
+        command (str): The command to be executed.
+    """
+    kind = next((k for k, pattern in CIRCUIT_BREAKER_KINDS if re.search(pattern, command)),
+                command.split(" ", 1)[0])
+    with _circuit_breakers_lock:
+        if kind not in circuit_breakers:
+            circuit_breakers[kind] = CircuitBreaker(kind)
+        return circuit_breakers[kind]
+
 
-    args = ["cmd", "/c"] if os.name == 'nt' else []
-    args.extend(shlex.split(command))
-    subprocess.call(args)
+def syscall_with_retry(command, capture=True, merge_err=True, timeout=None, policy=None, raise_on_error=True):
+    """
+    Executes a command and retries it (see `retry_policy`) in case of transient or rate-limit errors.
 
+    Args:
+        command (str): The command to execute in the shell.
+        capture (bool): Whether to capture the outputs (if False, outputs go to our stdout and only the exit code
+            can be used to classify failures).
+        merge_err (bool): Whether to merge stderr with stdout.
+        timeout (Optional[float]): The max. number of seconds each attempt may run before it is killed.
+        policy (Optional[RetryPolicy]): The retry policy to use (default: `retry_policy`).
+        raise_on_error (bool): Whether to raise a CommandError if the command finally failed.
+
+    Returns: The SyscallResult of the last attempt.
+    """
+    policy = policy or retry_policy
+    result, failure = policy.call(lambda: engine.run(command, capture=capture, merge_err=merge_err, timeout=timeout),
+                                  get_circuit_breaker(command))
+    if raise_on_error and failure != SUCCESS:
+        raise CommandError(result, failure)
+    return result
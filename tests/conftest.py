@@ -0,0 +1,118 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import os
+import shlex
+import shutil
+import stat
+import time
+import pytest
+import tensorforce_client
+import tensorforce_client.utils as util
+from tensorforce_client.experiment import Experiment
+from tensorforce_client.providers import set_provider, FakeProvider
+
+
+class LocalProvider(FakeProvider):
+    """
+    A fake cloud whose nodes are all the local machine: Clusters are faked (see FakeProvider), but ssh commands and
+    ssh pipelines really run (locally, through the syscall engine), so that transfers can be tested end to end.
+    """
+
+    name = "local"
+
+    def ssh(self, node, command, location=None, capture=True):
+        self._call("ssh", node, command)
+        return util.syscall_with_retry("bash -c {}".format(shlex.quote(command)), capture=capture)
+
+    def ssh_pipe(self, node, command, location=None, local_input=None, local_output=None):
+        self._call("ssh_pipe", node, command, local_input, local_output)
+        ssh = "bash -c {}".format(shlex.quote(command))
+        return util.syscall_with_retry(" | ".join(c for c in [local_input, ssh, local_output] if c))
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    A project directory (the current working directory) with the packaged configs (as after `tfcli init`), no
+    cached inventory and a `kubectl` that only logs its arguments (into `kubectl.log`).
+    """
+    monkeypatch.chdir(tmp_path)
+    shutil.copytree(os.path.join(tensorforce_client.__path__[0], "configs"), str(tmp_path / "configs"))
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    kubectl = bin_dir / "kubectl"
+    kubectl.write_text("#!/bin/sh\necho \"$@\" >> {}\n".format(shlex.quote(str(tmp_path / "kubectl.log"))))
+    kubectl.chmod(kubectl.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    util.inventory_cache.invalidate()
+    yield tmp_path
+    util.inventory_cache.invalidate()
+
+
+@pytest.fixture
+def fake_provider(project):
+    provider = FakeProvider(state_file=str(project / ".tensorforce.fake.json"))
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+@pytest.fixture
+def local_provider(project):
+    provider = LocalProvider()
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+@pytest.fixture
+def make_experiment():
+    """
+    A factory for small Experiments (a gym environment, a ppo agent and a single dense layer), all other settings
+    as given, e.g. `make_experiment(cluster={"name": "c"}, run_mode="distributed")`.
+    """
+    def make(name="exp", **kwargs):
+        return Experiment(name=name, environment={"type": "gym"}, agent={"type": "ppo_agent"},
+                          network=[{"type": "dense", "size": 32}], **kwargs)
+    return make
+
+
+@pytest.fixture
+def write_file():
+    """
+    Writes (or appends, with mode "a") some content to a file, creating its directory first. An `age` (in sec)
+    backdates the file's modification time.
+    """
+    def write(path, content, mode="w", age=0):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, mode) as f:
+            f.write(content)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+    return write
+
+
+@pytest.fixture
+def read_file():
+    def read(path):
+        with open(path) as f:
+            return f.read()
+    return read
@@ -0,0 +1,142 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import json
+import os
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client.cluster import Cluster
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.experiment import Experiment
+
+
+@pytest.fixture
+def running_experiment(make_experiment):
+    """
+    Creates a (locally generated) running Experiment on a given Cluster.
+    """
+    def make(cluster, remote_dir="/tmp/exp/", run_mode="single"):
+        experiment = make_experiment(cluster=cluster.get_spec(), run_mode=run_mode, remote_dir=remote_dir,
+                                     status="running")
+        experiment.generate_locally()
+        experiment.write_json_file(experiment.path + experiment.running_json_file)
+        return experiment
+    return make
+
+
+def _running_json(experiment):
+    with open(experiment.path + experiment.running_json_file) as f:
+        return json.load(f)
+
+
+def test_autoscaling_bounds():
+    pool = Cluster(name="c", machine_type="n1-standard-1", num_nodes=2, max_nodes=5).node_pools[0]
+    assert (pool["min_nodes"], pool["max_nodes"]) == (0, 5)
+    pool = Cluster(name="c", machine_type="n1-standard-1", num_nodes=2, min_nodes=1).node_pools[0]
+    assert (pool["min_nodes"], pool["max_nodes"]) == (1, 2)
+    pool = Cluster(name="c", machine_type="n1-standard-1", num_nodes=2).node_pools[0]
+    assert (pool["min_nodes"], pool["max_nodes"]) == (None, None)
+    with pytest.raises(util.TFCliError):
+        Cluster(name="c", machine_type="n1-standard-1", num_nodes=6, max_nodes=5)
+
+
+def test_scale_to_zero_and_back(fake_provider):
+    cluster = Cluster(name="auto", machine_type="n1-standard-1", num_nodes=2, min_nodes=1, max_nodes=4)
+    cluster.create()
+    cluster.scale_to_zero()
+    spec = util.get_cluster_specs()["auto"]
+    assert spec["num_nodes"] == 0 and spec["node_pools"][0]["min_nodes"] == 0
+    cluster.scale_up()
+    spec = util.get_cluster_specs()["auto"]
+    assert spec["num_nodes"] == 2 and spec["node_pools"][0]["min_nodes"] == 1
+    assert len(cluster.instances) == 2 and cluster.primary_name in cluster.instances
+
+
+def test_node_pools_report_their_current_size(fake_provider):
+    cluster = Cluster(name="pools", node_pools=[
+        {"name": "cpu-pool", "machine_type": "n1-highmem-2", "num_nodes": 1},
+        {"name": "gpu-pool", "machine_type": "n1-standard-8", "num_nodes": 2, "gpus_per_node": 2,
+         "gpu_type": "nvidia-tesla-k80"}])
+    cluster.create()
+    spec = util.get_cluster_specs()["pools"]
+    assert [p["num_nodes"] for p in spec["node_pools"]] == [1, 2] and spec["num_gpus"] == 4
+    cluster.scale_to_zero()
+    spec = util.get_cluster_specs()["pools"]
+    assert [p["num_nodes"] for p in spec["node_pools"]] == [0, 0] and spec["num_gpus"] == 0
+    cluster.scale_up()
+    spec = util.get_cluster_specs()["pools"]
+    assert [p["num_nodes"] for p in spec["node_pools"]] == [1, 2] and spec["num_gpus"] == 4
+
+
+def test_pause_scales_down_after_downloading_everything(local_provider, project, running_experiment):
+    remote_dir = str(project / "node") + "/"
+    os.makedirs(remote_dir + "results")
+    with open(remote_dir + "results/checkpoint", "w") as f:
+        f.write('model_checkpoint_path: "model.ckpt-7"\n')
+    cluster = Cluster(name="exp", machine_type="n1-standard-1", num_nodes=1)
+    cluster.create()
+    experiment = running_experiment(cluster, remote_dir)
+    experiment.pause("project")
+    assert os.path.isfile(experiment.path + "results/checkpoint")
+    assert util.get_cluster_specs()["exp"]["num_nodes"] == 0
+    assert _running_json(experiment)["scaled_down"] is True
+
+
+def test_pause_keeps_the_nodes_if_results_are_missing(local_provider, project, monkeypatch, running_experiment):
+    remote_dir = str(project / "node") + "/"
+    os.makedirs(remote_dir + "results")
+    with open(remote_dir + "results/checkpoint", "w") as f:
+        f.write('model_checkpoint_path: "model.ckpt-7"\n')
+    cluster = Cluster(name="exp", machine_type="n1-standard-1", num_nodes=1)
+    cluster.create()
+    experiment = running_experiment(cluster, remote_dir)
+    # a download that "succeeds" without writing anything
+    monkeypatch.setattr(Experiment, "download", lambda self, **kwargs: None)
+    with pytest.warns(UserWarning, match="Keeping the nodes"):
+        experiment.pause("project")
+    assert util.get_cluster_specs()["exp"]["num_nodes"] == 1
+    assert _running_json(experiment)["scaled_down"] is False
+
+
+def test_resume_scales_up_and_restores_the_checkpoint(fake_provider, project, monkeypatch, running_experiment):
+    cluster = Cluster(name="exp", machine_type="n1-standard-1", num_nodes=2)
+    cluster.create()
+    experiment = running_experiment(cluster, run_mode="distributed")
+    cluster.scale_to_zero()
+    experiment.scaled_down = True
+    experiment.status = "paused"
+    commands = []
+
+    def syscall(command, **kwargs):
+        commands.append(command)
+        return SyscallResult(command, 0, b"")
+    monkeypatch.setattr(util, "syscall", syscall)
+    monkeypatch.setattr(util, "syscall_with_retry", syscall)
+    restored = []
+    monkeypatch.setattr(Experiment, "prepare_nodes", lambda self, c: None)
+    monkeypatch.setattr(Experiment, "restore_checkpoint", lambda self, c: restored.append(sorted(c.instances)))
+
+    plan = experiment.get_start_plan("project", resume=True)
+    assert "restore-checkpoint" in plan.steps_by_name
+    plan.run()
+    assert util.get_cluster_specs()["exp"]["num_nodes"] == 2
+    assert len(restored) == 1 and len(restored[0]) == 2
+    running = _running_json(experiment)
+    assert running["scaled_down"] is False
+    assert running["cluster"]["status"] == "RUNNING" and running["cluster"]["primary_name"]
+    assert any(c.startswith("kubectl create -f") for c in commands)
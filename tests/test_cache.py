@@ -0,0 +1,66 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import sys
+import time
+import tensorforce_client.utils as util
+from tensorforce_client import tfcli
+from tensorforce_client.cache import InventoryCache
+from tensorforce_client.cluster import Cluster
+
+
+def test_entries_expire(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = InventoryCache(ttls={"clusters": 10})
+    cache.set("clusters", "google", [{"name": "c"}])
+    assert cache.get("clusters", "google") == [{"name": "c"}]
+    assert cache.get("clusters", "other") is None
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("clusters", "google") is None
+
+
+def test_entries_are_shared_through_the_project_file(tmp_path, monkeypatch, write_file):
+    monkeypatch.chdir(tmp_path)
+    # outside of a project: in memory only
+    InventoryCache().set("disks", "", ["d"])
+    assert InventoryCache().get("disks") is None
+
+    write_file(str(tmp_path / ".tensorforce.json"), "{}")
+    InventoryCache().set("disks", "", ["d"])
+    assert InventoryCache().get("disks") == ["d"]
+    cache = InventoryCache()
+    cache.invalidate("disks")
+    assert InventoryCache().get("disks") is None
+    # a broken cache file is ignored
+    write_file(str(tmp_path / ".tensorforce.cache.json"), "{broken")
+    assert InventoryCache().get("disks") is None
+
+
+def test_refresh_fetches_the_inventory_once(fake_provider, project, monkeypatch, write_file):
+    write_file(str(project / ".tensorforce.json"), "{}")
+    Cluster(name="c", machine_type="n1-standard-1", num_nodes=1).create()
+    util.get_cluster_specs()
+    # a cluster created elsewhere (not in our cache)
+    c = fake_provider.state["clusters"]["c"]
+    fake_provider.state["clusters"]["other"] = dict(c, spec=dict(c["spec"], name="other"))
+    fake_provider.calls = []
+    monkeypatch.setattr(sys, "argv", ["tfcli", "--refresh", "cluster", "list"])
+    tfcli.main()
+    assert sorted(util.get_cluster_specs()) == ["c", "other"]
+    assert [c[0] for c in fake_provider.calls] == ["list_clusters"]
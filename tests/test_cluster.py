@@ -0,0 +1,123 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import glob
+import os
+import pytest
+import tensorforce_client.cluster
+import tensorforce_client.utils as util
+from tensorforce_client import transfer
+from tensorforce_client.cluster import Cluster, SSHParallelError
+from tensorforce_client.profiling import profiler
+from tensorforce_client.providers import GKEProvider
+
+
+@pytest.fixture
+def home(project, monkeypatch):
+    # the nodes' home directories (with their ~/.ssh/authorized_keys) are the local (temporary) one
+    monkeypatch.setenv("HOME", str(project))
+    os.makedirs(str(project / ".ssh"))
+    with open(str(project / ".ssh" / "authorized_keys"), "w") as f:
+        f.write("ssh-ed25519 AAAA user@laptop\n")
+    return project
+
+
+def _broadcast_leftovers(home):
+    with open(str(home / ".ssh" / "authorized_keys")) as f:
+        keys = f.read()
+    assert keys == "ssh-ed25519 AAAA user@laptop\n"
+    return glob.glob("/tmp/tfcli-broadcast-*")
+
+
+def test_broadcast_cleans_up(local_provider, home):
+    os.makedirs(str(home / "data"))
+    with open(str(home / "data" / "a.txt"), "w") as f:
+        f.write("A")
+    cluster = Cluster(name="bc", machine_type="n1-standard-1", num_nodes=1)
+    cluster.create()
+    leftovers = set(glob.glob("/tmp/tfcli-broadcast-*"))
+    cluster.broadcast("data", str(home / "node"))
+    with open(str(home / "node" / "data" / "a.txt")) as f:
+        assert f.read() == "A"
+    assert set(_broadcast_leftovers(home)) == leftovers
+
+
+def test_failed_broadcast_cleans_up(local_provider, home, monkeypatch):
+    os.makedirs(str(home / "data"))
+    cluster = Cluster(name="bc", machine_type="n1-standard-1", num_nodes=1)
+    cluster.create()
+    leftovers = set(glob.glob("/tmp/tfcli-broadcast-*"))
+    monkeypatch.setattr(transfer, "extract_archive_command", lambda archive, remote_dir: "exit 3")
+    with pytest.raises(SSHParallelError):
+        cluster.broadcast("data", str(home / "node"))
+    assert set(_broadcast_leftovers(home)) == leftovers
+
+
+def test_ssh_parallel_commands_belong_to_the_callers_phase(local_provider, monkeypatch):
+    for name, value in [("enabled", True), ("commands", []), ("phases", []), ("transfers", [])]:
+        monkeypatch.setattr(profiler, name, value)
+    cluster = Cluster(name="ph", machine_type="n1-standard-1", num_nodes=3)
+    cluster.create()
+    with profiler.phase("experiment.start"):
+        with profiler.phase("copy"):
+            cluster.ssh_parallel("true", "echo done")
+    assert len(profiler.commands) == 6
+    assert set(c["phase"] for c in profiler.commands) == {"experiment.start/copy"}
+    # the phase is only recorded once (by the calling thread)
+    assert [p["name"] for p in profiler.phases if p["name"].startswith("experiment.start")] == \
+        ["experiment.start/copy", "experiment.start"]
+
+
+def test_wait_ready_waits_for_the_operation_only_until_the_deadline(fake_provider, monkeypatch):
+    class Clock(object):
+        # every look at the clock takes 10s
+        now = 0.0
+
+        @classmethod
+        def time(cls):
+            cls.now += 10
+            return cls.now
+
+    class Operation(object):
+        timeouts = []
+
+        def wait(self, timeout=None):
+            self.timeouts.append(timeout)
+            raise util.TFCliError("ERROR: Operation did not finish within {}s!".format(timeout))
+
+    monkeypatch.setattr(tensorforce_client.cluster, "time", Clock)
+    cluster = Cluster(name="wr", machine_type="n1-standard-1", num_nodes=1)
+    cluster.operation = Operation()
+    with pytest.raises(util.TFCliError):
+        cluster.wait_ready(timeout=100)
+    assert Operation.timeouts == [90]
+
+
+def test_gke_operations_are_polled_until_the_timeout():
+    provider = GKEProvider("project")
+    calls = []
+
+    def call(method, host, path, body=None, policy=None):
+        # the operation never finishes
+        calls.append(path)
+        return {"name": "op-1", "status": "RUNNING"}
+    provider._call = call
+    with pytest.raises(util.TFCliError, match="op-1 did not finish within 0.05s"):
+        provider._wait_for_operation("europe-west1-d", {"name": "op-1", "status": "RUNNING"}, poll_interval=0.01,
+                                     timeout=0.05)
+    assert 1 <= len(calls) <= 5
@@ -0,0 +1,38 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import tensorforce_client.utils as util
+from tensorforce_client.engine import is_shell_command
+
+
+def test_pipelines_run_in_a_shell():
+    assert util.syscall("echo hello | tr a-z A-Z", return_outputs="as_str") == "HELLO\n"
+    # quoted operators are plain arguments
+    assert util.syscall("echo 'a | b'", return_outputs="as_str") == "a | b\n"
+
+
+def test_failing_pipeline_stage_fails_the_command():
+    assert not util.syscall("false | cat", return_outputs="as_result").ok
+    assert not util.syscall("echo x | gzip -d -c | cat", return_outputs="as_result").ok
+
+
+def test_is_shell_command():
+    assert is_shell_command("gcloud compute ssh n --command \"a | b\" | tar xf - -C '/tmp/x y'")
+    assert is_shell_command("a && b")
+    assert not is_shell_command("gcloud compute ssh n --command \"cd /x && a | b\"")
+    assert not is_shell_command("ssh -oControlPath=/tmp/x-1 n 'true'")
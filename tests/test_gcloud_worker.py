@@ -0,0 +1,101 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import sys
+import pytest
+from tensorforce_client.gcloud_worker import GCloudWorkerPool
+
+
+# a stand-in for the Cloud SDK's gcloud CLI: logs each executed command, `die` kills the worker process
+FAKE_GCLOUD_MAIN = """
+import os, sys
+
+
+class CLI(object):
+    def Execute(self, args):
+        with open(os.environ["FAKE_GCLOUD_LOG"], "a") as f:
+            f.write(" ".join(args) + "\\n")
+        if args[0] == "die":
+            os._exit(1)
+        if args[0] == "fail":
+            sys.stderr.write("failed\\n")
+            sys.exit(2)
+        print(" ".join(args))
+
+
+def CreateCLI(_):
+    return CLI()
+"""
+
+
+@pytest.fixture
+def sdk(tmp_path, monkeypatch):
+    package = tmp_path / "sdk" / "lib" / "googlecloudsdk"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text(u"")
+    (package / "gcloud_main.py").write_text(FAKE_GCLOUD_MAIN)
+    log = tmp_path / "gcloud.log"
+    monkeypatch.setenv("FAKE_GCLOUD_LOG", str(log))
+    return str(tmp_path / "sdk"), log
+
+
+@pytest.fixture
+def pool(sdk):
+    pool = GCloudWorkerPool(size=2, sdk_root=sdk[0], python=sys.executable)
+    yield pool
+    pool.close()
+
+
+def test_accepts_only_plain_gcloud_commands(pool):
+    assert pool.accepts("gcloud container clusters list --format json")
+    assert not pool.accepts("gcloud compute ssh node --command 'ls'")
+    assert not pool.accepts("gcloud container clusters list | grep x")
+    assert not pool.accepts("gcloud container clusters list", stdin=b"")
+    assert not pool.accepts("kubectl get pods")
+
+
+def test_workers_are_reused(pool):
+    result = pool.execute("gcloud container clusters list")
+    assert result.ok and result.output == "container clusters list\n"
+    result = pool.execute("gcloud fail now")
+    assert result.returncode == 2 and result.output == "failed\n"
+    assert len(pool.workers) == 1
+
+
+def test_died_worker_does_not_repeat_the_command(pool, sdk):
+    result = pool.execute("gcloud die --async")
+    assert result is not None and not result.ok and "gcloud worker died" in result.output
+    assert sdk[1].read_text() == u"die --async\n"
+    assert pool.workers == []
+    # the next command gets a new worker
+    assert pool.execute("gcloud container clusters list").ok
+
+
+def test_command_not_sent_falls_back_to_a_subprocess(pool, sdk):
+    assert pool.execute("gcloud container clusters list").ok
+    process = pool.workers[0].process
+    process.kill()
+    process.wait()
+    assert pool.execute("gcloud container clusters create x") is None
+    assert sdk[1].read_text() == u"container clusters list\n"
+
+
+def test_pool_disables_itself_if_the_workers_cannot_start(tmp_path):
+    pool = GCloudWorkerPool(sdk_root=str(tmp_path), python=sys.executable)
+    assert pool.execute("gcloud container clusters list") is None
+    assert pool.disabled and not pool.accepts("gcloud container clusters list")
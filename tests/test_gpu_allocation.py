@@ -0,0 +1,83 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client.gpu_allocation import plan_gpus
+
+
+def test_plan_gives_each_worker_whole_gpus():
+    plan = plan_gpus("distributed", num_workers=4, num_parameter_servers=2, num_nodes=2, gpus_per_node=4)
+    assert [plan.get("worker", i)["gpus"] for i in range(4)] == [2, 2, 2, 2]
+    assert plan.get("ps", 0)["gpus"] == 0
+    assert (plan.used_gpus, plan.idle_gpus, plan.shared_gpus) == (8, 0, 0)
+
+
+def test_plan_leaves_gpus_idle_if_workers_dont_fit_evenly():
+    plan = plan_gpus("distributed", num_workers=3, num_parameter_servers=1, num_nodes=1, gpus_per_node=4)
+    assert [plan.get("worker", i)["gpus"] for i in range(3)] == [1, 1, 1]
+    assert plan.idle_gpus == 1
+
+
+def test_plan_shares_gpus_round_robin_over_the_nodes():
+    plan = plan_gpus("distributed", num_workers=5, num_parameter_servers=1, num_nodes=2, gpus_per_node=1)
+    workers = [plan.get("worker", i) for i in range(5)]
+    assert [(w["node"], w["shared_gpu"]) for w in workers] == [(0, 0), (1, 0), (0, 0), (1, 0), (0, 0)]
+    assert all(w["gpus"] == 0 for w in workers)
+    assert [w["share"] for w in workers[:2]] == [pytest.approx(1 / 3), 0.5]
+    assert [w["memory_fraction"] for w in workers[:2]] == [0.31, 0.47]
+    assert (plan.used_gpus, plan.shared_gpus) == (2, 2)
+    assert plan.render(["n0", "n1"])["worker-1"]["node"] == "n1"
+
+
+def test_plan_gives_workers_alone_on_their_gpu_the_whole_gpu():
+    plan = plan_gpus("distributed", num_workers=3, num_parameter_servers=1, num_nodes=1, gpus_per_node=2)
+    workers = [plan.get("worker", i) for i in range(3)]
+    assert [(w["gpus"], w["shared_gpu"]) for w in workers] == [(0, 0), (1, None), (0, 0)]
+    assert workers[1]["memory_fraction"] is None and workers[1]["node"] is None
+    assert (plan.used_gpus, plan.shared_gpus) == (2, 1)
+
+
+def test_plan_for_fixed_gpus_and_single_container():
+    plan = plan_gpus("distributed", num_workers=3, num_parameter_servers=1, num_nodes=1, gpus_per_node=1,
+                     gpus_per_worker=0)
+    assert plan.used_gpus == 0 and plan.idle_gpus == 1
+    plan = plan_gpus("multi-threaded", num_workers=8, num_parameter_servers=0, num_nodes=1, gpus_per_node=2)
+    assert list(plan.tasks) == ["worker-0"] and plan.get("worker", 0)["gpus"] == 2
+
+
+def test_gpu_sharing_needs_opt_in_and_a_dedicated_cluster(make_experiment):
+    topology = {"num_nodes": 1, "gpus_per_node": 1}
+    experiment = make_experiment(cluster={"name": "gpu"}, num_workers=2)
+    with pytest.raises(util.TFCliError, match="allow_gpu_sharing"):
+        experiment.check_gpu_plan(experiment.get_gpu_plan(topology))
+
+    experiment = make_experiment(cluster={"name": "gpu"}, num_workers=2, allow_gpu_sharing=True)
+    experiment.check_gpu_plan(experiment.get_gpu_plan(topology))
+    experiment.has_dedicated_cluster = False
+    with pytest.raises(util.TFCliError, match="own cluster"):
+        experiment.check_gpu_plan(experiment.get_gpu_plan(topology))
+
+
+def test_idle_gpus_are_refused_on_request(make_experiment):
+    topology = {"num_nodes": 1, "gpus_per_node": 4}
+    with pytest.warns(UserWarning, match="only use 3 of the cluster's 4 GPUs"):
+        make_experiment(cluster={"name": "gpu"}, num_workers=3).check_gpu_plan(plan_gpus("distributed", 3, 1, 1, 4))
+    experiment = make_experiment(cluster={"name": "gpu"}, num_workers=3, allow_idle_gpus=False)
+    with pytest.raises(util.TFCliError, match="allow_idle_gpus"):
+        experiment.check_gpu_plan(experiment.get_gpu_plan(topology))
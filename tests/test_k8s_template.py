@@ -0,0 +1,46 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import re
+import pytest
+import tensorforce_client.utils as util
+
+
+@pytest.fixture
+def experiment(make_experiment):
+    return make_experiment(cluster={"name": "k8s"}, num_workers=2, remote_dir="/mnt/stateful_partition/experiment/exp/")
+
+
+def test_template_renders_only_the_given_tasks(project, experiment):
+    util.write_kubernetes_yaml_file(experiment, str(project / "exp.yaml"), only_tasks=["worker-1"], load=True)
+    with open(str(project / "exp.yaml")) as f:
+        yaml = f.read()
+    assert "name: exp-worker-1\n" in yaml and "name: exp-worker-0\n" not in yaml and "name: exp-ps-0\n" not in yaml
+    assert "/mnt/stateful_partition/experiment/exp" in yaml
+
+
+def test_outdated_template_is_not_used(project, experiment):
+    template = str(project / "configs" / "experiment.yaml.jinja")
+    with open(template) as f:
+        source = f.read()
+    # a (customized) template of an older project
+    with open(template, "w") as f:
+        f.write(re.sub(r'\{%- set template_version = \d+ -%\}', "", source).replace("only_tasks", "tasks_to_render"))
+    with pytest.raises(util.TFCliError, match="outdated \\(version 1, this tfcli needs version {}".
+                       format(util.K8S_TEMPLATE_VERSION)):
+        util.write_kubernetes_yaml_file(experiment, str(project / "exp.yaml"))
@@ -0,0 +1,65 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import os
+from tensorforce_client.merge import merge_directories, remove_staging_dirs, staging_dir
+
+
+def test_merge_keeps_the_newest_version_and_skips_duplicates(tmp_path, write_file, read_file):
+    local = str(tmp_path / "local")
+    n0, n1, n2 = [staging_dir(local, n) for n in ["n0", "n1", "n2"]]
+    write_file(os.path.join(n0, "only-n0.txt"), "0")
+    # identical on all nodes
+    for d in [n0, n1, n2]:
+        write_file(os.path.join(d, "same", "config.json"), "{}", age=50)
+    # different versions: the newest one wins, the others are kept as conflicts
+    write_file(os.path.join(n0, "model.ckpt"), "old", age=100)
+    write_file(os.path.join(n1, "model.ckpt"), "new", age=10)
+    write_file(os.path.join(n2, "model.ckpt"), "older", age=200)
+    # an existing local file gets overwritten
+    write_file(os.path.join(local, "only-n0.txt"), "stale")
+
+    conflicts = str(tmp_path / "conflicts")
+    stats = merge_directories([("n1", n1), ("n0", n0), ("n2", n2)], local, conflict_dir=conflicts)
+    assert (stats.files, stats.duplicates, stats.conflicts) == (3, 2, 2)
+    assert read_file(os.path.join(local, "model.ckpt")) == "new"
+    assert read_file(os.path.join(local, "only-n0.txt")) == "0"
+    assert read_file(os.path.join(local, "same", "config.json")) == "{}"
+    assert read_file(os.path.join(conflicts, "n0", "model.ckpt")) == "old"
+    assert read_file(os.path.join(conflicts, "n2", "model.ckpt")) == "older"
+    # the staging dirs are gone
+    assert not any(os.path.exists(d) for d in [n0, n1, n2])
+    remove_staging_dirs(local)
+    assert sorted(os.listdir(local)) == ["model.ckpt", "only-n0.txt", "same"]
+
+
+def test_merge_ties_go_to_the_first_node(tmp_path, write_file, read_file):
+    local = str(tmp_path / "local")
+    n0, n1 = [staging_dir(local, n) for n in ["n0", "n1"]]
+    write_file(os.path.join(n1, "a.txt"), "from n1", age=10)
+    write_file(os.path.join(n0, "a.txt"), "from n0", age=10)
+    os.utime(os.path.join(n1, "a.txt"), (0, os.path.getmtime(os.path.join(n0, "a.txt"))))
+    stats = merge_directories([("n1", n1), ("n0", n0)], local)
+    assert (stats.files, stats.conflicts) == (1, 1)
+    assert read_file(os.path.join(local, "a.txt")) == "from n0"
+
+
+def test_staging_dir_is_emptied(tmp_path, write_file):
+    local = str(tmp_path / "local")
+    write_file(os.path.join(staging_dir(local, "n0"), "left-over.txt"), "x")
+    assert os.listdir(staging_dir(local, "n0")) == []
@@ -0,0 +1,81 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import threading
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client.plan import Plan
+
+
+def test_steps_run_after_their_dependencies_and_independent_ones_concurrently():
+    plan = Plan("test")
+    order = []
+    # a and b only get past the barrier if they run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+
+    def step(name, wait=False):
+        def run():
+            if wait:
+                barrier.wait()
+            order.append(name)
+        return run
+    plan.add("a", step("a", wait=True))
+    plan.add("b", step("b", wait=True))
+    plan.add("c", step("c"), depends_on=["a", "b"])
+    plan.add("d", step("d"), depends_on=["c"])
+    plan.run()
+    assert sorted(order[:2]) == ["a", "b"] and order[2:] == ["c", "d"]
+    assert all(s.duration is not None for s in plan.steps)
+
+
+def test_failing_step_stops_the_plan():
+    plan = Plan("test")
+    ran = []
+
+    def fail():
+        raise util.TFCliError("ERROR: broken")
+    plan.add("a", fail)
+    plan.add("b", lambda: ran.append("b"), depends_on=["a"])
+    with pytest.raises(util.TFCliError, match="broken"):
+        plan.run()
+    assert ran == []
+
+
+def test_steps_must_be_unique_and_depend_on_known_steps():
+    plan = Plan("test")
+    plan.add("a", lambda: None)
+    with pytest.raises(util.TFCliError, match="already exists"):
+        plan.add("a", lambda: None)
+    with pytest.raises(util.TFCliError, match="unknown step"):
+        plan.add("b", lambda: None, depends_on=["x"])
+
+
+def test_critical_path():
+    plan = Plan("test")
+    plan.add("cluster", None, estimate=60.0)
+    plan.add("disk", None, estimate=10.0)
+    plan.add("upload", None, depends_on=["cluster", "disk"], estimate=5.0)
+    plan.add("local", None, estimate=1.0)
+    path, total = plan.critical_path()
+    assert [s.name for s in path] == ["cluster", "upload"] and total == 65.0
+    # measured durations replace the estimates
+    plan.steps_by_name["disk"].duration = 100.0
+    assert [s.name for s in plan.critical_path()[0]] == ["disk", "upload"]
+    assert plan.critical_path(measured=False)[1] == 65.0
+    assert "Critical path (est. 65.0s): cluster -> upload" in plan.describe()
+    assert Plan("empty").critical_path() == ([], 0.0)
@@ -0,0 +1,86 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import time
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client.cluster import Cluster
+from tensorforce_client.pool import ClusterPool, CREATION_TIMEOUT
+
+
+@pytest.fixture
+def pool(fake_provider, monkeypatch):
+    util.write_project_file("test", "test", "test-project")
+    pool = ClusterPool()
+    refills = []
+    monkeypatch.setattr(pool, "fill_in_background", lambda: refills.append(time.time()))
+    pool.refills = refills
+    return pool
+
+
+def _running(fake_provider):
+    util.inventory_cache.invalidate()
+    return sorted(name for name, spec in util.get_cluster_specs().items() if spec["status"] == "RUNNING")
+
+
+def test_claim_takes_a_matching_idle_cluster(pool, fake_provider):
+    pool.set_config("single_node_cluster", 2)
+    created = pool.fill()
+    assert len(created) == 2 and _running(fake_provider) == sorted(c.name_hyphenated for c in created)
+    assert all(e["status"] == "idle" for e in pool.list().values())
+    # already full
+    assert pool.fill() == []
+
+    # other settings -> nothing to claim
+    assert pool.claim(Cluster(file="small_cluster", name="exp-a"), "a") is None
+    first = pool.claim(Cluster(file="single_node_cluster", name="exp-a"), "a")
+    second = pool.claim(Cluster(file="single_node_cluster", name="exp-b"), "b")
+    assert first.started and {first.name_hyphenated, second.name_hyphenated} == set(c.name_hyphenated for c in created)
+    assert pool.claim(Cluster(file="single_node_cluster", name="exp-c"), "c") is None
+    assert pool.list() == {} and len(pool.refills) == 2
+
+
+def test_claim_skips_clusters_that_are_gone(pool, fake_provider):
+    pool.set_config("single_node_cluster", 1)
+    cluster = pool.fill()[0]
+    cluster.delete()
+    assert pool.claim(Cluster(file="single_node_cluster", name="exp-a"), "a") is None
+    assert pool.list() == {}
+
+
+def test_reap_deletes_expired_clusters(pool, fake_provider):
+    pool.set_config("single_node_cluster", 2, max_idle=600)
+    old, new = pool.fill()
+    with pool._state() as state:
+        state["clusters"][old.name_hyphenated]["since"] = time.time() - 601
+    assert pool.reap() == [old.name_hyphenated]
+    assert _running(fake_provider) == [new.name_hyphenated]
+
+    # clusters of specs no longer in the pool go as well
+    pool.set_config("single_node_cluster", 0)
+    assert pool.reap() == [new.name_hyphenated]
+    assert _running(fake_provider) == [] and pool.list() == {}
+
+
+def test_reap_deletes_clusters_whose_creation_failed(pool, fake_provider):
+    pool.set_config("single_node_cluster", 1)
+    with pool._state() as state:
+        state["clusters"]["pool-single-node-cluster-000000"] = {
+            "spec": "single_node_cluster", "key": "", "status": "creating", "since": time.time() - CREATION_TIMEOUT - 1,
+            "cluster": {"name": "pool-single-node-cluster-000000", "machine_type": "n1-standard-1", "num_nodes": 1}}
+    assert pool.reap() == ["pool-single-node-cluster-000000"]
@@ -0,0 +1,57 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import pytest
+from tensorforce_client.machine_types import load_price_table
+from tensorforce_client.recommender import recommend_clusters
+from tensorforce_client.scheduler import ClusterCapacity
+
+
+def test_recommend_clusters_picks_the_cheapest_shapes(make_experiment):
+    machine_types, gpu_types = load_price_table()
+    pods = make_experiment(cluster={"name": "exp"}, num_workers=4, resources={"worker": {"cpu": 1.5, "memory": 2.0}}).\
+        get_pods()
+    recommendations = recommend_clusters(pods, machine_types, gpu_types, num=3)
+    assert len(recommendations) == 3
+    assert [r.price for r in recommendations] == sorted(r.price for r in recommendations)
+    for r in recommendations:
+        assert r.gpus_per_node == 0
+        cpus, memory = machine_types[r.machine_type]["cpus"], machine_types[r.machine_type]["memory"]
+        assert ClusterCapacity(r.get_spec("check"), machine_resources=(cpus, memory)).fits(pods)
+        assert r.price == pytest.approx(r.num_nodes * machine_types[r.machine_type]["price"])
+
+
+def test_recommend_clusters_with_gpus(make_experiment):
+    machine_types, gpu_types = load_price_table()
+    pods = make_experiment(cluster={"name": "exp", "num_nodes": 2, "gpus_per_node": 1}, num_workers=2).get_pods()
+    assert [p["gpus"] for p in pods] == [1, 1, 0]
+    recommendations = recommend_clusters(pods, machine_types, gpu_types, gpu_type="nvidia-tesla-k80")
+    assert recommendations and all(r.gpu_type == "nvidia-tesla-k80" and r.num_nodes * r.gpus_per_node >= 2 and
+                                   r.machine_type.startswith("n1-") for r in recommendations)
+    assert recommendations[0].get_spec("gpu")["gpus_per_node"] == recommendations[0].gpus_per_node
+
+
+def test_recommend_clusters_for_pods_pinned_to_node_pools(make_experiment):
+    machine_types, gpu_types = load_price_table()
+    cluster = {"name": "al", "node_pools": [
+        {"name": "cpu-pool", "machine_type": "n1-highmem-2", "num_nodes": 1, "jobs": ["ps"]},
+        {"name": "gpu-pool", "machine_type": "n1-standard-8", "num_nodes": 2, "gpus_per_node": 2, "jobs": ["worker"]}]}
+    pods = make_experiment(cluster=cluster, num_workers=4).get_pods()
+    assert [p["node_pool"] for p in pods] == ["gpu-pool"] * 4 + ["cpu-pool"]
+    recommendations = recommend_clusters(pods, machine_types, gpu_types, gpu_type="nvidia-tesla-k80")
+    assert recommendations and all(r.num_nodes * r.gpus_per_node >= 4 for r in recommendations)
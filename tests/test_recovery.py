@@ -0,0 +1,114 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import json
+import os
+import shutil
+import time
+import tensorforce_client.utils as util
+from tensorforce_client import recovery
+from tensorforce_client.cluster import Cluster
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.experiment import Experiment
+
+
+def _timestamp(t):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+
+
+def _item(kind, name, job, task, created, status=None, **kwargs):
+    return dict({"kind": kind, "metadata": {"name": name, "creationTimestamp": _timestamp(created),
+                                            "labels": {"name": "exp", "job": job, "task": str(task)}},
+                 "status": status or {}}, **kwargs)
+
+
+def test_get_lost_tasks(monkeypatch, make_experiment):
+    now = time.time()
+    items = [_item("Job", "exp-worker-{}".format(i), "worker", i, now - 3600, {"active": 1}) for i in range(4)]
+    items += [
+        _item("Job", "exp-ps-0", "ps", 0, now - 3600, {"conditions": [{"type": "Failed", "status": "True",
+                                                                        "reason": "BackoffLimitExceeded"}]}),
+        _item("Job", "exp-worker-9", "worker", 9, now - 3600, {"conditions": [{"type": "Complete",
+                                                                             "status": "True"}]}),
+        # evicted
+        _item("Pod", "exp-worker-1-a", "worker", 1, now - 3600, {"phase": "Failed", "reason": "Evicted"},
+              spec={"nodeName": "n1"}),
+        # replacement of a pod lost along with its node
+        _item("Pod", "exp-worker-2-b", "worker", 2, now - 60, {"phase": "Running"}),
+        # the original pod
+        _item("Pod", "exp-worker-3-c", "worker", 3, now - 3590, {"phase": "Running"}),
+    ]
+    output = json.dumps({"items": items}).encode("utf-8")
+    monkeypatch.setattr(util, "syscall", lambda command, **kwargs: SyscallResult(command, 0, output))
+    lost, completed = recovery.get_lost_tasks(make_experiment(cluster={"name": "rec"}, remote_dir="/tmp/exp/"))
+    assert sorted(lost) == ["ps-0", "worker-1", "worker-2"]
+    assert "BackoffLimitExceeded" in lost["ps-0"] and "Evicted" in lost["worker-1"]
+    assert completed == {"worker-9"}
+
+
+def test_get_lost_tasks_without_kubectl(monkeypatch, make_experiment):
+    monkeypatch.setattr(util, "syscall", lambda command, **kwargs: SyscallResult(command, 1, b"not found"))
+    assert recovery.get_lost_tasks(make_experiment(cluster={"name": "rec"}, remote_dir="/tmp/exp/")) is None
+
+
+def test_find_latest_checkpoint(tmp_path):
+    for name, step, age in [("worker-0", 100, 300), ("worker-1", 200, 10)]:
+        os.makedirs(str(tmp_path / name))
+        file = str(tmp_path / name / "checkpoint")
+        with open(file, "w") as f:
+            f.write('model_checkpoint_path: "/experiment/{}/model.ckpt-{}"\n'.format(name, step))
+        os.utime(file, (time.time() - age, time.time() - age))
+    directory, step, _ = recovery.find_latest_checkpoint(str(tmp_path))
+    assert (directory, step) == (str(tmp_path / "worker-1"), 200)
+    assert recovery.find_latest_checkpoint(str(tmp_path / "worker-0" / "nothing")) is None
+
+
+def test_recover_rolls_back_to_the_synced_checkpoint(local_provider, project, monkeypatch, make_experiment):
+    # the node's disk is (just like the local one) a local directory
+    monkeypatch.setenv("HOME", str(project))
+    remote_dir = str(project / "node") + "/"
+    os.makedirs(remote_dir + "worker-0")
+    with open(remote_dir + "worker-0/checkpoint", "w") as f:
+        f.write('model_checkpoint_path: "/experiment/worker-0/model.ckpt-4200"\n')
+    with open(remote_dir + "worker-0/model.ckpt-4200.index", "w") as f:
+        f.write("variables")
+    os.utime(remote_dir + "worker-0/checkpoint", (time.time() - 300, time.time() - 300))
+
+    Cluster(name="rec", machine_type="n1-standard-1", num_nodes=1).create()
+    experiment = make_experiment(cluster={"name": "rec"}, remote_dir=remote_dir, num_workers=2, status="running")
+    experiment.generate_locally()
+    recreated = []
+    monkeypatch.setattr(Experiment, "prepare_nodes", lambda self, cluster: None)
+    monkeypatch.setattr(Experiment, "recreate_tasks",
+                        lambda self, cluster, tasks, load=True: recreated.append((tasks, load)))
+    # the node's files are lost after the sync (the broadcast has to bring the checkpoint back)
+    sync = recovery.RecoveryLoop.sync
+
+    def sync_and_lose_files(self):
+        sync(self)
+        shutil.rmtree(remote_dir + "worker-0")
+    monkeypatch.setattr(recovery.RecoveryLoop, "sync", sync_and_lose_files)
+
+    record = recovery.RecoveryLoop(experiment).recover({"ps-0": "pod exp-ps-0 Evicted on node n0"})
+    assert os.path.isfile(experiment.path + "results/worker-0/checkpoint")
+    assert os.path.isfile(remote_dir + "worker-0/model.ckpt-4200.index")
+    assert recreated == [(["worker-0", "worker-1", "ps-0"], True)]
+    assert record["checkpoint_step"] == 4200
+    assert 290 < record["lost_seconds"] < 400
+    with open(experiment.path + experiment.running_json_file) as f:
+        assert json.load(f)["recoveries"][0]["checkpoint_step"] == 4200
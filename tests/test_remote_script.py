@@ -0,0 +1,70 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import tensorforce_client.utils as util
+from tensorforce_client.remote_script import RemoteScript
+
+
+def _run(script):
+    result = util.syscall(script.command(), return_outputs="as_result")
+    return script.parse(result.output, result.returncode)
+
+
+def test_outputs_are_split_per_step():
+    script = RemoteScript()
+    script.add_command("a", "echo first")
+    script.add_command("b", "echo second; echo more")
+    results = _run(script)
+    assert [(item, returncode, output) for item, returncode, _, output in results] == \
+        [("a", 0, "first\n"), ("b", 0, "second\nmore\n")]
+    assert all(duration >= 0.0 for _, _, duration, _ in results)
+
+
+def test_output_without_trailing_newline():
+    script = RemoteScript()
+    script.add_command("a", "printf 'no newline'")
+    script.add_command("b", "echo second")
+    assert [(item, returncode, output) for item, returncode, _, output in _run(script)] == \
+        [("a", 0, "no newline"), ("b", 0, "second\n")]
+
+
+def test_script_stops_at_the_first_failing_step():
+    script = RemoteScript()
+    script.add_command("a", "echo failing; exit 3")
+    script.add_command("b", "echo never")
+    assert [(item, returncode, output) for item, returncode, _, output in _run(script)] == [("a", 3, "failing\n")]
+
+
+def test_upload(tmp_path):
+    source = tmp_path / "config.json"
+    source.write_text(u"{'it': \"s\"}\n")
+    target = tmp_path / "target dir"
+    target.mkdir()
+    script = RemoteScript()
+    script.add_upload("upload", str(source), str(target))
+    assert [returncode for _, returncode, _, _ in _run(script)] == [0]
+    assert (target / "config.json").read_text() == u"{'it': \"s\"}\n"
+
+
+def test_session_ending_within_a_step():
+    script = RemoteScript()
+    script.add_command("a", "echo first")
+    script.add_command("b", "echo second")
+    output = "{m} 0 start 1000000000\nfirst\n\n{m} 0 exit 0 3000000000\n{m} 1 start 3000000000\nsec".format(
+        m=RemoteScript.MARKER)
+    assert script.parse(output, 255) == [("a", 0, 2.0, "first\n"), ("b", 255, 0.0, "sec")]
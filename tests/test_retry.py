@@ -0,0 +1,100 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client.cluster import Cluster
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.providers import GCloudProvider
+from tensorforce_client.ssh import ssh_connections
+
+
+class Commands(list):
+    outputs = None
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    """
+    The commands run by the engine, which answers each one with the next of the outputs in `commands.outputs`
+    (a tuple of exit code and output; default: success).
+    """
+    commands = Commands()
+    commands.outputs = []
+    monkeypatch.setattr(util.retry_policy, "base_delay", 0.0)
+    monkeypatch.setattr(util.creation_retry_policy, "base_delay", 0.0)
+    monkeypatch.setattr(util, "circuit_breakers", {})
+
+    def run(command, **kwargs):
+        commands.append(command)
+        returncode, output = commands.outputs.pop(0) if commands.outputs else (0, "")
+        return SyscallResult(command, returncode, output.encode("utf-8"))
+    monkeypatch.setattr(util.engine, "run", run)
+    return commands
+
+
+def test_transient_failures_are_retried(commands):
+    commands.outputs = [(1, "503 Service Unavailable"), (1, "Connection reset by peer"), (0, "ok")]
+    assert util.syscall_with_retry("kubectl get pods").output == "ok"
+    assert len(commands) == 3
+
+
+def test_cluster_creation_is_not_retried_after_transient_failures(commands):
+    commands.outputs = [(1, "DEADLINE_EXCEEDED")]
+    with pytest.raises(util.CommandError):
+        GCloudProvider().create_cluster(Cluster(name="c", machine_type="n1-standard-1", num_nodes=1))
+    assert len(commands) == 1
+    # rate-limit errors reject the request (nothing was created) -> retried
+    del commands[:]
+    commands.outputs = [(1, "429 Too Many Requests")]
+    GCloudProvider().create_cluster(Cluster(name="c", machine_type="n1-standard-1", num_nodes=1))
+    assert len(commands) == 2 and all(c.startswith("gcloud container clusters create c ") for c in commands)
+
+
+def test_multiplexed_ssh_commands_are_not_repeated(commands, monkeypatch):
+    monkeypatch.setattr(ssh_connections, "enabled", True)
+    monkeypatch.setattr(ssh_connections, "connections", {"n0": "/tmp/tfcli-ssh-x/n0"})
+    # the remote command exited with 255, the master connection is fine
+    commands.outputs = [(255, "")]
+    with pytest.raises(util.CommandError):
+        GCloudProvider().ssh("n0", "echo key >> ~/.ssh/authorized_keys")
+    assert len(commands) == 2 and commands[1] == "ssh -oControlPath=/tmp/tfcli-ssh-x/n0 -O check n0"
+    # the master connection broke -> dropped, the command runs once more through gcloud
+    del commands[:]
+    commands.outputs = [(255, "Connection reset by peer"), (255, "")]
+    assert GCloudProvider().ssh("n0", "echo key >> ~/.ssh/authorized_keys").ok
+    assert [c.split()[0] for c in commands] == ["ssh", "ssh", "ssh", "gcloud"]
+    assert "n0" not in ssh_connections.connections
+
+
+def test_circuit_breakers_are_kept_per_kind_of_command(commands):
+    assert util.get_circuit_breaker("gcloud compute ssh n0 --command 'true'").name == "gcloud compute ssh"
+    assert util.get_circuit_breaker("tar cf - a | gcloud compute ssh n0 --command 'x'").name == "gcloud compute ssh"
+    assert util.get_circuit_breaker("ssh -oControlPath=/tmp/x n0 'true'").name == "ssh"
+    assert util.get_circuit_breaker("gcloud container clusters list").name == "gcloud container"
+    assert util.get_circuit_breaker("kubectl get pods").name == "kubectl"
+
+    # unreachable nodes open the ssh breaker, but cluster operations go on
+    commands.outputs = [(255, "ssh: connect to host 10.0.0.1 port 22: Connection refused")] * 10
+    for _ in range(2):
+        with pytest.raises(util.TFCliError):
+            util.syscall_with_retry("gcloud compute ssh n0 --command 'true'")
+    with pytest.raises(util.CircuitOpenError):
+        util.syscall_with_retry("gcloud compute ssh n1 --command 'true'")
+    commands.outputs = []
+    assert util.syscall_with_retry("gcloud container clusters list").ok
@@ -0,0 +1,71 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import pytest
+from tensorforce_client.scheduler import ClusterCapacity, Scheduler, SYSTEM_RESERVED_CPU
+
+
+def _cluster(name, num_nodes=2, machine_type="n1-standard-4", status="RUNNING", **kwargs):
+    return dict({"name": name, "machine_type": machine_type, "num_nodes": num_nodes, "status": status}, **kwargs)
+
+
+def test_capacity_places_biggest_pods_first():
+    # 1.75 allocatable vCPUs per node
+    capacity = ClusterCapacity(_cluster("c", num_nodes=2, machine_type="n1-standard-2"))
+    pods = [{"cpu": 0.5, "memory": 1.0, "gpus": 0}, {"cpu": 1.0, "memory": 1.0, "gpus": 0},
+            {"cpu": 1.0, "memory": 1.0, "gpus": 0}]
+    assert capacity.place(pods) == [0, 0, 1]
+    assert capacity.fits(pods + [{"cpu": 0.25, "memory": 0.5, "gpus": 0}])
+    assert not capacity.fits(pods + [{"cpu": 1.0, "memory": 0.5, "gpus": 0}])
+    assert not capacity.fits([{"cpu": 0.5, "memory": 1.0, "gpus": 1}])
+    # pods pinned to another node pool don't fit
+    assert not capacity.fits([{"cpu": 0.5, "memory": 1.0, "gpus": 0, "node_pool": "gpu-pool"}])
+
+
+def test_capacity_knows_node_pools():
+    capacity = ClusterCapacity({"name": "al", "node_pools": [
+        {"name": "cpu-pool", "machine_type": "n1-highmem-2", "num_nodes": 1},
+        {"name": "gpu-pool", "machine_type": "n1-standard-8", "num_nodes": 2, "gpus_per_node": 2}]})
+    assert [n["pool"] for n in capacity.nodes] == ["cpu-pool", "gpu-pool", "gpu-pool"]
+    assert capacity.nodes[0]["cpu"] == 2 - SYSTEM_RESERVED_CPU
+    pods = [{"cpu": 1.0, "memory": 1.0, "gpus": 0, "node_pool": "cpu-pool"},
+            {"cpu": 1.0, "memory": 1.0, "gpus": 2, "node_pool": "gpu-pool"},
+            {"cpu": 1.0, "memory": 1.0, "gpus": 2, "node_pool": "gpu-pool"}]
+    assert capacity.place(pods) == [0, 1, 2]
+
+
+def test_scheduler_packs_onto_the_fullest_cluster_first(make_experiment):
+    clusters = {"busy": _cluster("busy"), "empty": _cluster("empty"), "down": _cluster("down", status="PROVISIONING")}
+    running = [make_experiment("running", cluster={"name": "busy"}, num_workers=2, resources={"worker": {"cpu": 2.0}})]
+    scheduler = Scheduler(clusters, running)
+    assert [c.name for c in scheduler.clusters] == ["busy", "empty"]
+    assert scheduler.get_cluster("busy").experiments == ["running"]
+    assert scheduler.get_cluster("busy").utilization() == pytest.approx(4.25 / (2 * (4 - SYSTEM_RESERVED_CPU)))
+
+    small = make_experiment("small", cluster={"name": "small"}, num_workers=1, resources={"worker": {"cpu": 1.0}})
+    big = make_experiment("big", cluster={"name": "big"}, num_workers=2, resources={"worker": {"cpu": 3.0}})
+    huge = make_experiment("huge", cluster={"name": "empty", "machine_type": "n1-standard-8", "num_nodes": 2},
+                           num_workers=4, resources={"worker": {"cpu": 3.0}})
+    placements = scheduler.schedule([small, big, huge])
+    # biggest first: huge fits nowhere (-> a new cluster, renamed as "empty" exists), big only onto the empty
+    # cluster, small onto the fullest one (the new cluster)
+    assert [(p.experiment.name, p.cluster.name, p.fits) for p in placements] == \
+        [("small", "empty-huge", True), ("big", "empty", True), ("huge", "empty-huge", True)]
+    assert scheduler.get_cluster("empty-huge").experiments == ["huge", "small"]
+    assert placements[2].cluster.new and placements[2].cluster.owner is huge
+    assert "empty-huge (new)" in Scheduler.describe(placements)
@@ -0,0 +1,56 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import os
+import re
+import stat
+import tensorforce_client.utils as util
+from tensorforce_client.cassette import Cassette
+from tensorforce_client.engine import SyscallResult
+from tensorforce_client.ssh import SSHConnectionManager
+
+
+def test_control_dirs_are_private_and_removed(monkeypatch):
+    commands = []
+
+    def gcloud_ssh(command, **kwargs):
+        # leave a (fake) master connection's socket behind
+        open(re.search(r'ControlPath=(\S+)', command).group(1), "w").close()
+        return SyscallResult(command, 0, b"")
+    monkeypatch.setattr(util, "syscall_with_retry", gcloud_ssh)
+    monkeypatch.setattr(util, "syscalls", lambda c, **kwargs: commands.extend(c))
+
+    managers = [SSHConnectionManager(), SSHConnectionManager()]
+    paths = [m.connect("node-0") for m in managers]
+    control_dirs = [m.control_dir for m in managers]
+    # each process (manager) has its own dir (and thus its own masters), only accessible by its user
+    assert paths[0] != paths[1] and control_dirs[0] != control_dirs[1]
+    for control_dir in control_dirs:
+        st = os.lstat(control_dir)
+        assert st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+
+    managers[0].close_all()
+    assert commands == ["ssh -oControlPath={} -O exit node-0".format(paths[0])]
+    assert not os.path.exists(control_dirs[0]) and os.path.exists(paths[1])
+    managers[1].close_all()
+    assert not os.path.exists(control_dirs[1])
+
+
+def test_cassette_key_ignores_control_dirs():
+    assert Cassette.key("ssh -oControlPath=/tmp/tfcli-ssh-ab_12x/3f2a -oControlMaster=no  n \"x\"") == \
+        Cassette.key("ssh -oControlPath=/var/tmp/tfcli-ssh-q9z0/3f2a -oControlMaster=no n \"x\"")
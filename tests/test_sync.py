@@ -0,0 +1,110 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import os
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client import sync, transfer
+from tensorforce_client.cluster import Cluster
+
+
+@pytest.fixture
+def cluster(local_provider):
+    cluster = Cluster(name="sync", machine_type="n1-standard-1", num_nodes=1)
+    cluster.create()
+    return cluster
+
+
+def _downloads(provider):
+    return [args for method, args in provider.calls if method == "ssh_pipe"]
+
+
+def test_sync_transfers_only_new_and_changed_files(local_provider, cluster, tmp_path, write_file, read_file):
+    remote = str(tmp_path / "node") + "/"
+    local = str(tmp_path / "local")
+    write_file(remote + "a.txt", "A", age=100)
+    write_file(remote + "sub/b.txt", "B", age=100)
+    stats = sync.sync_directory(cluster, remote, local)
+    assert (stats.new, stats.changed, stats.unchanged) == (2, 0, 0)
+    assert read_file(os.path.join(local, "sub", "b.txt")) == "B"
+
+    # nothing changed -> the manifest says so (no transfer)
+    del local_provider.calls[:]
+    stats = sync.sync_directory(cluster, remote, local)
+    assert (stats.new, stats.changed, stats.unchanged) == (0, 0, 2)
+    assert not _downloads(local_provider)
+
+    # a new version of a file (same size) and a new file
+    write_file(remote + "a.txt", "X")
+    write_file(remote + "c.txt", "C")
+    stats = sync.sync_directory(cluster, remote, local)
+    assert (stats.new, stats.changed, stats.unchanged) == (1, 1, 1)
+    assert read_file(os.path.join(local, "a.txt")) == "X"
+    assert not os.path.isdir(os.path.join(local, ".staging"))
+
+
+def test_sync_skips_touched_files_with_the_same_md5(local_provider, cluster, tmp_path, write_file):
+    remote = str(tmp_path / "node") + "/"
+    local = str(tmp_path / "local")
+    write_file(remote + "a.txt", "A", age=100)
+    sync.sync_directory(cluster, remote, local)
+    os.utime(remote + "a.txt", None)
+    del local_provider.calls[:]
+    stats = sync.sync_directory(cluster, remote, local)
+    assert (stats.new, stats.changed, stats.unchanged) == (0, 0, 1)
+    assert not _downloads(local_provider)
+    # the new mtime is in the manifest now (-> only the listing, no more hashing)
+    del local_provider.calls[:]
+    assert sync.sync_directory(cluster, remote, local).unchanged == 1
+    assert len(local_provider.calls) == 1
+
+
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+def test_sync_appends_to_append_only_files(local_provider, cluster, tmp_path, compression, write_file,
+                                           read_file):
+    remote = str(tmp_path / "node") + "/"
+    local = str(tmp_path / "local")
+    write_file(remote + "train.log", "line 1\n", age=100)
+    sync.sync_directory(cluster, remote, local, compression=compression)
+    write_file(remote + "train.log", "line 2\n", mode="a")
+    del local_provider.calls[:]
+    stats = sync.sync_directory(cluster, remote, local, compression=compression)
+    assert (stats.appended, stats.bytes) == (1, len("line 2\n"))
+    assert not _downloads(local_provider)
+    assert read_file(os.path.join(local, "train.log")) == "line 1\nline 2\n"
+
+    # the local copy isn't a prefix of the remote file anymore -> downloaded again
+    write_file(remote + "train.log", "other 1\nother 2\nother 3\n")
+    stats = sync.sync_directory(cluster, remote, local, compression=compression)
+    assert (stats.appended, stats.changed) == (0, 1)
+    assert read_file(os.path.join(local, "train.log")) == "other 1\nother 2\nother 3\n"
+
+
+def test_sync_fails_if_files_were_not_transferred(local_provider, cluster, tmp_path, monkeypatch, write_file,
+                                                  read_file):
+    remote = str(tmp_path / "node") + "/"
+    local = str(tmp_path / "local")
+    write_file(remote + "a.txt", "A", age=100)
+    sync.sync_directory(cluster, remote, local)
+    write_file(remote + "a.txt", "X")
+    # a transfer that "succeeds" without writing anything
+    monkeypatch.setattr(transfer, "download", lambda *args, **kwargs: None)
+    with pytest.raises(util.TFCliError, match="not downloaded"):
+        sync.sync_directory(cluster, remote, local)
+    assert read_file(os.path.join(local, "a.txt")) == "A"
+    assert sync.Manifest(local).get("a.txt")["mtime"] != str(os.path.getmtime(remote + "a.txt"))
@@ -0,0 +1,62 @@
+# Copyright 2018 reinforce.io. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+import os
+import shlex
+import pytest
+import tensorforce_client.utils as util
+from tensorforce_client import transfer
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd", "none"])
+def test_upload_and_download_roundtrip(local_provider, tmp_path, compression, write_file, read_file):
+    if compression == "zstd" and transfer.default_compression() != "zstd":
+        pytest.skip("zstd not installed")
+    local = str(tmp_path / "local")
+    write_file(os.path.join(local, "a.txt"), "A")
+    write_file(os.path.join(local, "sub", "odd name's.txt"), "B" * 10000)
+    remote = str(tmp_path / "node") + "/"
+    transfer.upload("node-0", local, ["a.txt", "sub"], remote, compression=compression)
+    assert read_file(remote + "sub/odd name's.txt") == "B" * 10000
+
+    back = str(tmp_path / "back")
+    transfer.download("node-0", remote, ["."], back, compression=compression)
+    assert read_file(os.path.join(back, "a.txt")) == "A"
+    assert read_file(os.path.join(back, "sub", "odd name's.txt")) == "B" * 10000
+
+
+def test_download_of_missing_files_fails(local_provider, tmp_path):
+    with pytest.raises(util.TFCliError):
+        transfer.download("node-0", str(tmp_path / "nothing-here"), ["."], str(tmp_path / "back"),
+                          compression="gzip")
+
+
+def test_upload_and_extract_archive(local_provider, tmp_path, write_file, read_file):
+    local = str(tmp_path / "checkpoints")
+    write_file(os.path.join(local, "checkpoint"), "model_checkpoint_path: \"model.ckpt-1\"\n")
+    archive = str(tmp_path / "tmp" / "data.tar.gz")
+    transfer.upload_archive("node-0", str(tmp_path), ["checkpoints"], archive)
+    assert os.path.isfile(archive)
+    target = str(tmp_path / "node")
+    util.syscall_with_retry("bash -c {}".format(shlex.quote(transfer.extract_archive_command(archive, target))))
+    assert "model.ckpt-1" in read_file(os.path.join(target, "checkpoints", "checkpoint"))
+
+
+def test_broadcast_rounds_double_the_holders():
+    rounds = transfer.broadcast_rounds("n0", ["n0", "n1", "n2", "n3", "n4"])
+    assert rounds == [[("n0", "n1")], [("n0", "n2"), ("n1", "n3")], [("n0", "n4")]]